@@ -18,11 +18,13 @@ def import_species_data(csv_file_path: str) -> Dict[str, int]:
     return species_data
 
 
-def merge_datasets(species_name: str) -> pd.DataFrame | None:
+def merge_datasets(species_name: str, dna_format: str = "csv") -> pd.DataFrame | None:
     """Merge DNA and RNA data by transcript ID.
 
     Args:
         species_name (str)
+        dna_format (str): Format of the DNA feature table, "csv" or "parquet"
+                (see dna_feature_extraction.extract_dna_features).
 
     Returns:
         DataFrame: Merged DNA and RNA data for the all transcripts of the given species.
@@ -33,7 +35,7 @@ def merge_datasets(species_name: str) -> pd.DataFrame | None:
         OR None if one of the DNA or RNA data paths does not exist
     """
     # Specify CSV file paths of the DNA and RNA datasets
-    dna_dataset_path = f"dna/csv_files/ensembl_data_{species_name}.csv"
+    dna_dataset_path = f"dna/csv_files/ensembl_data_{species_name}.{dna_format}"
     rna_dataset_path = f"rna/median_expression_files/rna_expression_{species_name}.csv"  # median expression matrix
 
     # Check if both files exist
@@ -45,7 +47,10 @@ def merge_datasets(species_name: str) -> pd.DataFrame | None:
         return None
 
     # Read datasets into pandas DataFrames
-    dna_df = pd.read_csv(dna_dataset_path)
+    if dna_format == "parquet":
+        dna_df = pd.read_parquet(dna_dataset_path)
+    else:
+        dna_df = pd.read_csv(dna_dataset_path)
     rna_df = pd.read_csv(rna_dataset_path)
 
     # Merge datasets based on transcript ID
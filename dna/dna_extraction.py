@@ -1,9 +1,18 @@
 # Import the Ensembl API module
 import os
-from dna import ensembl_api, dna_feature_extraction
-
-
-def query_dna_sequences_from_ensembl(output_folder: str) -> None:
+from typing import Optional, List
+from dna import ensembl_api, ensembl_async, local_genome, dna_feature_extraction
+
+
+def query_dna_sequences_from_ensembl(
+    output_folder: str,
+    max_in_flight: Optional[int] = None,
+    fetch_mode: str = "sequential",
+    resume: bool = False,
+    genome_directory: Optional[str] = None,
+    update: bool = False,
+    fasta_directory: Optional[str] = None,
+) -> None:
     """Query and download DNA sequences for specified gene lists from the Ensembl database.
 
     Use pre-defined file paths to locate gene lists and download their respective
@@ -12,6 +21,20 @@ def query_dna_sequences_from_ensembl(output_folder: str) -> None:
     Args:
         output_folder (str): Path to the output folder where the extracted DNA
                             sequences will be stored.
+        max_in_flight (Optional[int]): Number of genes fetched concurrently per species.
+                            If None, genes are fetched one at a time.
+        fetch_mode (str): Ensembl query mode used when max_in_flight is None
+                            ("sequential", "batched" or "single_lookup", see ensembl_api.get_data_as_csv).
+        resume (bool): Whether to checkpoint the extraction and continue an interrupted one.
+        genome_directory (Optional[str]): Directory containing the genome FASTA and GFF3 files
+                            of each species. If set, the sequences are read from these files
+                            instead of being queried from Ensembl.
+        update (bool): Whether to append to the existing CSV files only the genes they have
+                            no row for, e.g. after the gene lists were updated.
+        fasta_directory (Optional[str]): Directory containing the genome FASTA file of each
+                            species. If set, the promoters, terminators and UTRs are read
+                            from these files, and only the lookups and CDS are queried from
+                            Ensembl (see ensembl_api.configure_local_fasta).
 
     Returns:
         None: This function does not return a value but outputs files to the specified directory.
@@ -30,25 +53,120 @@ def query_dna_sequences_from_ensembl(output_folder: str) -> None:
 
     print(file_paths)
 
-    # Call the function to get data from Ensembl API and save it as CSV files
-    ensembl_api.get_data_as_csv(file_paths, output_folder)
-
-
-def extract_dna_data() -> None:  # pragma: no cover, extracting dna data
+    # Read the genomic sequences of the species from their memory-mapped genome
+    species_names = [ensembl_api.get_species_name(file_path) for file_path in file_paths]
+    if fasta_directory is not None:
+        for species_name in species_names:
+            fasta_path = local_genome.find_fasta_file(fasta_directory, species_name)
+            if fasta_path is None:
+                print(
+                    f"Genome FASTA file of {species_name} not found in {fasta_directory}, "
+                    "its sequences are queried from Ensembl."
+                )
+            ensembl_api.configure_local_fasta(species_name, fasta_path)
+
+    try:
+        # Call the function to get data from Ensembl API and save it as CSV files
+        if genome_directory is not None:
+            local_genome.get_data_as_csv_local(
+                file_paths, output_folder, genome_directory, resume=resume, update=update
+            )
+        elif max_in_flight is None:
+            ensembl_api.get_data_as_csv(
+                file_paths, output_folder, fetch_mode=fetch_mode, resume=resume, update=update
+            )
+        else:
+            ensembl_async.get_data_as_csv_async(
+                file_paths,
+                output_folder,
+                max_in_flight=max_in_flight,
+                resume=resume,
+                update=update,
+            )
+    finally:
+        if fasta_directory is not None:
+            for species_name in species_names:
+                ensembl_api.configure_local_fasta(species_name, None)
+
+
+def extract_dna_data(
+    max_in_flight: Optional[int] = None,
+    fetch_mode: str = "sequential",
+    cache_path: Optional[str] = None,
+    offline: bool = False,
+    resume: bool = False,
+    genome_directory: Optional[str] = None,
+    workers: int = 1,
+    output_format: str = "csv",
+    incremental: bool = False,
+    kmer_sizes: Optional[List[int]] = None,
+    sequence_store: bool = False,
+    update: bool = False,
+    pool_size: int = ensembl_api.DEFAULT_POOL_SIZE,
+    fasta_directory: Optional[str] = None,
+) -> None:  # pragma: no cover, extracting dna data
     """Extract and process DNA genomic data.
 
     Query DNA sequences from the Ensembl database, compute necessary gene components
     and calculate codon frequency, GC content, and sequence length.
 
+    Args:
+        max_in_flight (Optional[int]): Number of genes fetched concurrently per species.
+                            If None, genes are fetched one at a time.
+        fetch_mode (str): Ensembl query mode used when max_in_flight is None
+                            ("sequential", "batched" or "single_lookup").
+        cache_path (Optional[str]): Path to the persistent cache of Ensembl responses.
+                            If None, responses are not cached.
+        offline (bool): Whether to serve Ensembl responses only from the cache.
+        resume (bool): Whether to continue an interrupted extraction from its checkpoint.
+        genome_directory (Optional[str]): Directory containing local genome FASTA and GFF3
+                            files to extract the sequences from instead of Ensembl.
+        workers (int): Number of processes computing the DNA features.
+        output_format (str): Format of the DNA feature tables ("csv" or "parquet").
+        incremental (bool): Whether to only compute the DNA features missing from the
+                            feature tables.
+        kmer_sizes (Optional[List[int]]): Sizes of the k-mers counted in the promoter,
+                            UTRs and terminator. If None, k-mers are not counted.
+        sequence_store (bool): Whether to pack the sequences into 2-bit sequence stores.
+        update (bool): Whether to only query the genes missing from the extracted CSV files.
+        pool_size (int): Number of keep-alive connections to Ensembl.
+        fasta_directory (Optional[str]): Directory containing the genome FASTA file of each
+                            species, to read the sequences of the Ensembl lookups from.
+
     Returns:
         None: This function does not return a value but outputs or modifies files in the specified directories.
     """
     # Extracting genomic data.
     extracted_dna_storage_folder = "dna/csv_files"
 
+    # Reuse the connections to Ensembl instead of connecting for every request
+    ensembl_api.configure_session(pool_size)
+
+    # Cache Ensembl responses so that re-runs do not download the sequences again
+    if cache_path is not None:
+        ensembl_api.configure_cache(cache_path, offline=offline)
+
     # Query sequences to gene components from Ensembl
-    query_dna_sequences_from_ensembl(extracted_dna_storage_folder)
+    query_dna_sequences_from_ensembl(
+        extracted_dna_storage_folder,
+        max_in_flight=max_in_flight,
+        fetch_mode=fetch_mode,
+        resume=resume,
+        genome_directory=genome_directory,
+        update=update,
+        fasta_directory=fasta_directory,
+    )
+    if cache_path is not None:
+        # Write the access times of the cached responses
+        ensembl_api.configure_cache(None)
 
     # Calculate genomic features
-    dna_feature_extraction.extract_dna_features(extracted_dna_storage_folder)
+    dna_feature_extraction.extract_dna_features(
+        extracted_dna_storage_folder,
+        workers=workers,
+        output_format=output_format,
+        incremental=incremental,
+        kmer_sizes=kmer_sizes,
+        sequence_store=sequence_store,
+    )
     print("\nExtraction of DNA features is now complete!\n")
@@ -2,98 +2,764 @@ import os
 import csv
 import tempfile
 import shutil
-from itertools import product
-from typing import List, Dict
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from functools import partial
+from itertools import islice, product, starmap
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dna.feature_manifest import FeatureManifest, hash_row
+from dna.feature_registry import FeatureBatch, FeatureRegistry
+from dna.kmer_features import (
+    KMER_REGIONS,
+    KmerMatrixWriter,
+    check_kmer_sizes,
+    count_kmers,
+)
+from dna.sequence_store import (
+    NUCLEOTIDE_CODES,
+    STORE_REGIONS,
+    SequenceStore,
+    SequenceStoreWriter,
+    pack_sequence_store,
+    read_store_row_hashes,
+)
 
+# Padding of sequences to a multiple of 3 nucleotides, by length modulo 3
+CODON_PADDING = ("", "NN", "N")
 
-def extract_dna_features(folder_path: str) -> None:
+# All 64 possible codons, in the order of the codon indices 16 * a + 4 * b + c
+CODONS = ["".join(combination) for combination in product("ACGT", repeat=3)]
+
+# Number of genes whose features are computed together
+DEFAULT_CHUNK_SIZE = 2000
+
+# Length and GC content features of the DNA components
+COMPONENT_FEATURES = [
+    "cds_length",
+    "utr5_length",
+    "utr3_length",
+    "utr5_gc",
+    "cds_gc",
+    "utr3_gc",
+    "cds_wobble2_gc",
+    "cds_wobble3_gc",
+]
+
+# Columns of the DNA components CSV files
+SEQUENCE_HEADER = [
+    "ensembl_gene_id",
+    "transcript_id",
+    "promoter",
+    "utr5",
+    "cds",
+    "utr3",
+    "terminator",
+]
+
+# Output formats of the DNA feature tables
+OUTPUT_FORMATS = ("csv", "parquet")
+
+# UTR and CDS columns of the DNA components tables, encoded together for the features
+ENCODED_COMPONENTS = ("utr5", "cds", "utr3")
+
+# Features of the DNA feature tables, in the order of their columns (registered below)
+FEATURE_REGISTRY = FeatureRegistry()
+
+
+def extract_dna_features(
+    folder_path: str,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    output_format: str = "csv",
+    incremental: bool = False,
+    kmer_sizes: Optional[Sequence[int]] = None,
+    sequence_store: bool = False,
+) -> None:
     """Extract and compute DNA features for each CSV file containing genomic sequences.
 
     Add new columns to the existing CSV files with computed codon frequencies, lengths of
     different DNA segments (utr5, cds, utr3), GC content in DNA segments, and GC content at
-    wobble positions.
+    wobble positions. In the parquet output format, the CSV files are left unchanged and
+    the sequences with their features are written to a Parquet file next to each of them
+    (see write_parquet_features).
+
+    Files are streamed: genes are read, computed and written by chunks, with a bounded
+    number of chunks in flight, so the memory used depends on the chunk size and the
+    number of workers but not on the size of the files.
+
+    In incremental mode, the features computed for each table are recorded in a manifest
+    next to it (see FeatureManifest). The features of the rows already in the table are
+    reused, and only new rows and features missing from the manifest are computed.
+
+    If k-mer sizes are given, the k-mers of the promoter, UTRs and terminator of each gene
+    are counted into a sparse k-mer matrix next to each table (see kmer_features).
+
+    With sequence_store, the sequences of each CSV file are also packed with 2 bits per
+    nucleotide into a sequence store next to it (see sequence_store), and the features are
+    computed on the packed sequences.
 
     Args:
         folder_path (str): The path to the folder containing genomic data CSV files.
+        workers (int): Number of processes computing the features of chunks of genes.
+        chunk_size (int): Number of genes in each chunk.
+        output_format (str): Format of the feature tables ("csv" or "parquet").
+        incremental (bool): Whether to reuse the features of the existing feature tables.
+        kmer_sizes (Optional[Sequence[int]]): Sizes of the k-mers to count, e.g. 1 to 6.
+                                              K-mers are not counted by default.
+        sequence_store (bool): Whether to write a packed sequence store of each CSV file.
 
     Returns:
         None: This function does not return a value but modifies the files in the specified directory.
     """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output format {output_format!r}, expected one of {OUTPUT_FORMATS}."
+        )
+    if kmer_sizes is not None:
+        kmer_sizes = check_kmer_sizes(kmer_sizes)
+
+    # Chunks are mapped in order, so the output does not depend on the number of workers.
+    # Workers are spawned rather than forked, as forking a multi-threaded process is unsafe.
+    executor = (
+        ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        if workers > 1
+        else None
+    )
+    map_chunks = (
+        partial(map_pending, executor, max_pending=2 * workers)
+        if executor is not None
+        else starmap
+    )
+
+    try:
+        extract_folder_features(
+            folder_path,
+            map_chunks,
+            chunk_size,
+            output_format,
+            incremental,
+            kmer_sizes,
+            sequence_store,
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def map_pending(
+    executor: Executor, function: Callable, tasks: Iterable[Tuple], max_pending: int
+) -> Iterator:
+    """Map a function over the arguments of tasks in an executor, yielding results in order.
+
+    Unlike Executor.map, tasks are read lazily, with at most max_pending tasks submitted
+    ahead of the results consumed.
+
+    Args:
+        executor (Executor): Executor running the tasks.
+        function (Callable): Function to call with the arguments of each task.
+        tasks (Iterable[Tuple]): Arguments of each task.
+        max_pending (int): Largest number of tasks submitted but not yet consumed.
+
+    Returns:
+        Iterator: Results of the tasks, in the order of the tasks.
+    """
+    pending: Deque[Future] = deque()
+    for task in tasks:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, *task))
+    while pending:
+        yield pending.popleft().result()
+
+
+def extract_folder_features(
+    folder_path: str,
+    map_chunks: Callable,
+    chunk_size: int,
+    output_format: str = "csv",
+    incremental: bool = False,
+    kmer_sizes: Optional[List[int]] = None,
+    sequence_store: bool = False,
+) -> None:
+    """Extract the DNA features of each CSV file of a folder (see extract_dna_features).
+
+    Args:
+        folder_path (str): The path to the folder containing genomic data CSV files.
+        map_chunks (Callable): Function mapping compute_chunk_features over the arguments
+                               of the chunks of genes, yielding results in order
+                               (starmap, or map_pending over a process pool).
+        chunk_size (int): Number of genes in each chunk.
+        output_format (str): Format of the feature tables ("csv" or "parquet").
+        incremental (bool): Whether to reuse the features of the existing feature tables.
+        kmer_sizes (Optional[List[int]]): Sizes of the k-mers to count, if any.
+        sequence_store (bool): Whether to write a packed sequence store of each CSV file.
+    """
     # Iterate over files in the directory
     for filename in os.listdir(folder_path):
         if filename.endswith(".csv") and filename != "sample_data_homo_sapiens.csv":
             file_path = os.path.join(folder_path, filename)
 
-            # Create a temporary file to write the modified data
-            temp_file = tempfile.NamedTemporaryFile(
-                mode="w", delete=False, newline="", encoding="utf-8"
+            # Read the header of the CSV file
+            with open(file_path, "r", newline="", encoding="utf-8") as infile:
+                header = next(csv.reader(infile), None)
+
+            # CSV files that already hold features are only extended in incremental mode
+            extends_features = (
+                incremental
+                and output_format == "csv"
+                and header is not None
+                and header[: len(SEQUENCE_HEADER)] == SEQUENCE_HEADER
+            )
+            if header != SEQUENCE_HEADER and not extends_features:
+                continue
+            print("Extracting DNA features from:", filename)
+
+            extract_file_features(
+                file_path,
+                map_chunks,
+                chunk_size,
+                output_format,
+                incremental,
+                kmer_sizes,
+                sequence_store,
+            )
+
+
+def read_row_chunks(file_path: str, chunk_size: int) -> Iterator[List[List[str]]]:
+    """Read the rows of a CSV file by chunks, skipping its header.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        chunk_size (int): Number of rows in each chunk.
+
+    Returns:
+        Iterator[List[List[str]]]: Chunks of rows, the last one possibly shorter.
+    """
+    with open(file_path, "r", newline="", encoding="utf-8") as infile:
+        rows = filter(None, csv.reader(infile))
+        next(rows, None)
+        while chunk := list(islice(rows, chunk_size)):
+            yield chunk
+
+
+def extract_file_features(
+    file_path: str,
+    map_chunks: Callable,
+    chunk_size: int,
+    output_format: str = "csv",
+    incremental: bool = False,
+    kmer_sizes: Optional[List[int]] = None,
+    sequence_store: bool = False,
+) -> None:
+    """Compute the features of the DNA components of a CSV file and write its feature table.
+
+    The rows of the file are streamed by chunks through map_chunks to the writer of the
+    feature table (and of the k-mer matrix and sequence store, if they are written), so only
+    the chunks in flight are held in memory, along with the IDs and hash of each row.
+
+    Args:
+        file_path (str): Path to the DNA components CSV file.
+        map_chunks (Callable): Function mapping compute_chunk_features over the chunks.
+        chunk_size (int): Number of genes in each chunk.
+        output_format (str): Format of the feature table ("csv" or "parquet").
+        incremental (bool): Whether to reuse the features already in the feature table.
+        kmer_sizes (Optional[List[int]]): Sizes of the k-mers to count, if any.
+        sequence_store (bool): Whether to write a packed sequence store of the file.
+    """
+    base_path = os.path.splitext(file_path)[0]
+    table_path = base_path + ".parquet" if output_format == "parquet" else file_path
+    matrix_path = base_path + ".kmers.npz"
+    store_path = base_path + ".seqstore"
+
+    with open(file_path, "r", newline="", encoding="utf-8") as infile:
+        header = next(csv.reader(infile))
+    feature_columns = FEATURE_REGISTRY.output_columns()
+    manifest = FeatureManifest(table_path)
+
+    # Features reused from the table, for the rows of the manifest
+    reused_features: List[str] = []
+    computed_rows: Set[str] = set()
+    write_table = True
+    write_kmers = kmer_sizes is not None
+    write_store = sequence_store
+    if incremental:
+        row_hashes, complete = scan_row_hashes(file_path, len(header))
+        computed_features, manifest_rows = manifest.load()
+        table_columns = read_table_columns(table_path) if computed_features else []
+        reused_features = [
+            feature
+            for feature in feature_columns
+            if feature in computed_features and feature in table_columns
+        ]
+        computed_rows = set(manifest_rows)
+
+        if reused_features == feature_columns and manifest_rows == row_hashes and complete:
+            print("DNA features are up to date:", table_path)
+            write_table = False
+        if write_kmers and kmer_matrix_is_up_to_date(matrix_path, kmer_sizes, row_hashes):
+            print("K-mer counts are up to date:", matrix_path)
+            write_kmers = False
+        if write_store and read_store_row_hashes(store_path) == row_hashes:
+            print("Sequence store is up to date:", store_path)
+            write_store = False
+        if not write_table and not write_kmers and not write_store:
+            return
+
+    new_features = [feature for feature in feature_columns if feature not in reused_features]
+    # Where each feature column is taken from: the reused values or the computed ones
+    column_sources = [
+        (True, reused_features.index(feature))
+        if feature in reused_features
+        else (False, new_features.index(feature))
+        for feature in feature_columns
+    ]
+
+    # Reused features are read from the rows of a CSV table, or from the Parquet table
+    if output_format == "parquet" and reused_features:
+        reused_table = pq.read_table(table_path, columns=reused_features)
+        table_positions = {row_hash: position for position, row_hash in enumerate(manifest_rows)}
+    else:
+        reused_positions = [header.index(feature) for feature in reused_features]
+
+    def get_reused_values(chunk: List[List[str]], chunk_hashes: List[str]) -> List[Optional[List]]:
+        if not reused_features:
+            return [None] * len(chunk)
+        if output_format == "parquet":
+            positions = [table_positions.get(row_hash) for row_hash in chunk_hashes]
+            reused_rows = [
+                row_hash in computed_rows and position is not None
+                for row_hash, position in zip(chunk_hashes, positions)
+            ]
+            if not any(reused_rows):
+                return [None] * len(chunk)
+            taken = reused_table.take(
+                pa.array([p for p, r in zip(positions, reused_rows) if r], type=pa.int64())
+            )
+            values = iter(zip(*[column.to_pylist() for column in taken.columns]))
+            return [list(next(values)) if r else None for r in reused_rows]
+        # Rows appended without their features are computed again
+        return [
+            [row[position] for position in reused_positions]
+            if row_hash in computed_rows and len(row) == len(header)
+            else None
+            for row, row_hash in zip(chunk, chunk_hashes)
+        ]
+
+    all_hashes: List[str] = []
+    transcript_ids: List[str] = []
+    prepared_chunks: Deque[Tuple[List[List[str]], List[Optional[List]]]] = deque()
+
+    def chunk_tasks() -> Iterator[Tuple]:
+        for chunk in read_row_chunks(file_path, chunk_size):
+            rows = [row[: len(SEQUENCE_HEADER)] for row in chunk]
+            chunk_hashes = [hash_row(row) for row in rows]
+            reused_values = get_reused_values(chunk, chunk_hashes)
+            all_hashes.extend(chunk_hashes)
+            transcript_ids.extend(row[1] for row in rows)
+            prepared_chunks.append((rows, reused_values))
+            yield (
+                rows,
+                [values is not None for values in reused_values],
+                feature_columns if write_table else [],
+                new_features if write_table else [],
+                kmer_sizes if write_kmers else None,
+                write_store,
             )
 
-            # Open the CSV file for reading
-            with open(
-                file_path, "r", newline="", encoding="utf-8"
-            ) as infile, temp_file:
-                reader = csv.DictReader(infile)
-
-                # Define the fieldnames for the output CSV
-                header = reader.fieldnames
-
-                if header != [
-                    "ensembl_gene_id",
-                    "transcript_id",
-                    "promoter",
-                    "utr5",
-                    "cds",
-                    "utr3",
-                    "terminator",
-                ]:
+    kmer_writer = KmerMatrixWriter(matrix_path, kmer_sizes) if write_kmers else None
+    store_writer = SequenceStoreWriter(store_path) if write_store else None
+
+    def feature_chunks() -> Iterator[Tuple[List[List[str]], List[List]]]:
+        for new_feature_rows, reused_feature_rows, kmer_counts, packed_rows in map_chunks(
+            compute_chunk_features, chunk_tasks()
+        ):
+            rows, reused_values = prepared_chunks.popleft()
+            if kmer_writer is not None:
+                kmer_writer.write(*kmer_counts)
+            if store_writer is not None:
+                store_writer.write(packed_rows)
+
+            new_feature_rows = iter(new_feature_rows)
+            reused_feature_rows = iter(reused_feature_rows)
+            feature_rows = []
+            for values in reused_values:
+                if values is None:
+                    feature_rows.append(next(new_feature_rows))
                     continue
-                print("Extracting DNA features from:", filename)
-
-                new_columns = []
-                codons = [
-                    "".join(combination) for combination in product("ACGT", repeat=3)
-                ]
-                new_columns.extend(codons)
-                new_columns.extend(
-                    [
-                        "cds_length",
-                        "utr5_length",
-                        "utr3_length",
-                        "utr5_gc",
-                        "cds_gc",
-                        "utr3_gc",
-                        "cds_wobble2_gc",
-                        "cds_wobble3_gc",
-                    ]
+                sources = (values, next(reused_feature_rows))
+                feature_rows.append(
+                    [sources[0 if reused else 1][index] for reused, index in column_sources]
                 )
-                header.extend(new_columns)
+            yield rows, feature_rows
+
+    if not write_table:
+        deque(feature_chunks(), maxlen=0)
+    elif output_format == "parquet":
+        write_parquet_features(table_path, feature_chunks())
+    else:
+        write_csv_features(table_path, feature_chunks())
+
+    if kmer_writer is not None:
+        kmer_writer.close(transcript_ids, all_hashes)
+    if store_writer is not None:
+        store_writer.close(all_hashes)
+    if incremental and write_table:
+        manifest.save(feature_columns, all_hashes)
+
+
+def compute_chunk_features(
+    rows: List[List[str]],
+    reused: List[bool],
+    feature_names: List[str],
+    new_features: List[str],
+    kmer_sizes: Optional[List[int]] = None,
+    pack_sequences: bool = False,
+) -> Tuple[
+    List[List],
+    List[List],
+    Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    Optional[SequenceStore],
+]:
+    """Compute the features of a chunk of genes (see extract_file_features).
+
+    Args:
+        rows (List[List[str]]): Rows of DNA components (ensembl_gene_id, transcript_id,
+                                promoter, utr5, cds, utr3, terminator).
+        reused (List[bool]): Whether the features of each row are reused from the table.
+        feature_names (List[str]): Features to compute for the rows that are not reused.
+        new_features (List[str]): Features to compute for the reused rows.
+        kmer_sizes (Optional[List[int]]): Sizes of the k-mers to count, if any.
+        pack_sequences (bool): Whether to pack the sequences of the rows, and compute the
+                               features of the chunk on the packed sequences if none of its
+                               rows are reused.
+
+    Returns:
+        Tuple[List[List], List[List], Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+        Optional[SequenceStore]]: Features of the rows that are not reused, new features of
+        the reused rows, the k-mer counts of all rows (see count_region_kmers) or None, and
+        the packed rows or None.
+    """
+    packed_rows = None
+    if pack_sequences:
+        packed_rows = pack_sequence_store(
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            {
+                region: [row[SEQUENCE_HEADER.index(region)] for row in rows]
+                for region in STORE_REGIONS
+            },
+        )
+
+    if packed_rows is not None and not any(reused):
+        new_feature_rows = compute_store_features(packed_rows, feature_names)
+        reused_feature_rows: List[List] = []
+    else:
+        new_feature_rows = compute_feature_rows(
+            [row for row, is_reused in zip(rows, reused) if not is_reused], feature_names
+        )
+        reused_feature_rows = compute_feature_rows(
+            [row for row, is_reused in zip(rows, reused) if is_reused], new_features
+        )
+
+    kmer_counts = None
+    if kmer_sizes is not None:
+        kmer_counts = count_region_kmers(
+            {
+                region: [row[SEQUENCE_HEADER.index(region)] for row in rows]
+                for region in KMER_REGIONS
+            },
+            kmer_sizes,
+        )
+    return new_feature_rows, reused_feature_rows, kmer_counts, packed_rows
+
+
+def scan_row_hashes(file_path: str, column_count: int) -> Tuple[List[str], bool]:
+    """Hash the rows of a DNA components CSV file (see feature_manifest.hash_row).
+
+    Args:
+        file_path (str): Path to the CSV file.
+        column_count (int): Number of columns of the file.
+
+    Returns:
+        Tuple[List[str], bool]: Hashes of the rows, and whether all rows have all columns.
+    """
+    row_hashes = []
+    complete = True
+    for chunk in read_row_chunks(file_path, DEFAULT_CHUNK_SIZE):
+        for row in chunk:
+            row_hashes.append(hash_row(row[: len(SEQUENCE_HEADER)]))
+            complete = complete and len(row) == column_count
+    return row_hashes, complete
+
+
+def read_table_columns(table_path: str) -> List[str]:
+    """Read the names of the columns of a feature table.
+
+    Args:
+        table_path (str): Path to the CSV or Parquet feature table.
+
+    Returns:
+        List[str]: Names of the columns, or an empty list if the table does not exist.
+    """
+    if not os.path.exists(table_path):
+        return []
+    if table_path.endswith(".parquet"):
+        return pq.read_schema(table_path).names
+    with open(table_path, "r", newline="", encoding="utf-8") as table_file:
+        return next(csv.reader(table_file), [])
+
+
+def kmer_matrix_is_up_to_date(
+    matrix_path: str, kmer_sizes: List[int], row_hashes: List[str]
+) -> bool:
+    """Check whether a k-mer matrix holds the counts of given genes and k-mer sizes.
+
+    Args:
+        matrix_path (str): Path to the .npz k-mer matrix.
+        kmer_sizes (List[int]): Sizes of the k-mers.
+        row_hashes (List[str]): Hashes of the rows of the genes.
+
+    Returns:
+        bool: True if the matrix exists with the same k-mer sizes and rows.
+    """
+    if not os.path.exists(matrix_path):
+        return False
+    with np.load(matrix_path, allow_pickle=False) as matrix:
+        return (
+            matrix["kmer_sizes"].tolist() == kmer_sizes
+            and matrix["row_hashes"].tolist() == row_hashes
+        )
+
+
+def write_csv_features(
+    file_path: str, feature_chunks: Iterable[Tuple[List[List[str]], List[List]]]
+) -> None:
+    """Replace a DNA components CSV file with its rows followed by their features.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        feature_chunks (Iterable[Tuple[List[List[str]], List[List]]]): Rows of the CSV file
+                    and their features (see compute_feature_rows), by chunks.
+    """
+    # Create a temporary file to write the modified data
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, newline="", encoding="utf-8"
+    ) as temp_file:
+        writer = csv.writer(temp_file)
+        writer.writerow(SEQUENCE_HEADER + FEATURE_REGISTRY.output_columns())
+
+        # Write each gene with its features to the temporary file
+        for chunk, feature_rows in feature_chunks:
+            for row, row_features in zip(chunk, feature_rows):
+                writer.writerow(row + row_features)
+
+    # Replace the original file with the temporary file
+    shutil.move(temp_file.name, file_path)
+
+
+def get_parquet_schema() -> pa.Schema:
+    """Get the schema of the Parquet DNA feature tables.
+
+    Sequences are strings, followed by the feature columns with the types declared by the
+    registered features (float32 for codon frequencies and GC contents, int32 for lengths).
+    Features that cannot be computed (e.g. GC content of empty sequences) are null.
+
+    Returns:
+        pa.Schema: Schema with the columns of the CSV feature tables.
+    """
+    return pa.schema(
+        [pa.field(column, pa.string()) for column in SEQUENCE_HEADER]
+        + list(FEATURE_REGISTRY.output_schema())
+    )
+
+
+def write_parquet_features(
+    parquet_path: str, feature_chunks: Iterable[Tuple[List[List[str]], List[List]]]
+) -> None:
+    """Write DNA components and their features to a Parquet file, one row group per chunk.
+
+    Pages are compressed with zstd. Sequence columns are not dictionary encoded, as their
+    values are almost all distinct, while the feature columns are.
+
+    Args:
+        parquet_path (str): Path to the Parquet file.
+        feature_chunks (Iterable[Tuple[List[List[str]], List[List]]]): Rows of the DNA
+                    components CSV file and their features (see compute_feature_rows),
+                    by chunks.
+    """
+    schema = get_parquet_schema()
+    sequence_columns = SEQUENCE_HEADER[2:]
+    dictionary_columns = [name for name in schema.names if name not in sequence_columns]
+
+    # Write to a temporary file so that an interrupted run does not leave a partial table
+    temp_path = parquet_path + ".tmp"
+    with pq.ParquetWriter(
+        temp_path, schema, compression="zstd", use_dictionary=dictionary_columns
+    ) as writer:
+        for chunk, feature_rows in feature_chunks:
+            sequence_arrays = [pa.array(column, type=pa.string()) for column in zip(*chunk)]
+            feature_arrays = [
+                pa.array([None if value == "" else value for value in column], type=field.type)
+                for column, field in zip(zip(*feature_rows), list(schema)[len(SEQUENCE_HEADER) :])
+            ]
+            writer.write_table(pa.table(sequence_arrays + feature_arrays, schema=schema))
+    os.replace(temp_path, parquet_path)
+
+
+def compute_feature_rows(
+    rows: List[List[str]], feature_names: Optional[List[str]] = None
+) -> List[List]:
+    """Compute the features of a chunk of genes in one pass over their sequences.
+
+    Args:
+        rows (List[List[str]]): Rows of a DNA components CSV file (ensembl_gene_id,
+                                transcript_id, promoter, utr5, cds, utr3, terminator).
+        feature_names (Optional[List[str]]): Feature columns to compute, by default all the
+                                             columns of FEATURE_REGISTRY.
+
+    Returns:
+        List[List]: Values of the features of each gene.
+    """
+    if feature_names is None:
+        feature_names = FEATURE_REGISTRY.output_columns()
+    if not rows or not feature_names:
+        return [[] for _ in rows]
+
+    input_columns = {
+        column: [row[SEQUENCE_HEADER.index(column)] for row in rows]
+        for column in FEATURE_REGISTRY.input_columns(feature_names)
+    }
+    features = FEATURE_REGISTRY.compute(input_columns, feature_names)
+    return [list(row_features) for row_features in zip(*features.values())]
+
+
+def compute_store_features(
+    store: SequenceStore, feature_names: Optional[List[str]] = None
+) -> List[List]:
+    """Compute the features of the genes of a sequence store on their packed sequences.
+
+    Gives the same values as compute_feature_rows for the rows the store was built from.
+    Large stores can be computed by chunks of genes with store.slice.
+
+    Args:
+        store (SequenceStore): Packed genes (see sequence_store).
+        feature_names (Optional[List[str]]): Feature columns to compute, by default all the
+                                             columns of FEATURE_REGISTRY.
+
+    Returns:
+        List[List]: Values of the features of each gene.
+    """
+    if feature_names is None:
+        feature_names = FEATURE_REGISTRY.output_columns()
+    if not store.gene_ids or not feature_names:
+        return [[] for _ in store.gene_ids]
+
+    batch = PackedFeatureBatch(store, FEATURE_REGISTRY.input_columns(feature_names))
+    features = FEATURE_REGISTRY.compute_batch(batch, feature_names)
+    return [list(row_features) for row_features in zip(*features.values())]
+
+
+class PackedFeatureBatch(FeatureBatch):
+    """Batch of the genes of a sequence store, computed on their packed sequences.
+
+    The lengths, GC counts and nucleotide codes of the UTRs and CDS are taken from the packed
+    sequences (see PACKED_INTERMEDIATES) instead of being computed from sequence strings. The
+    sequences of a column are only decoded if a feature reads them.
+    """
+
+    def __init__(self, store: SequenceStore, input_columns: List[str]):
+        """Create a batch from packed genes.
+
+        Args:
+            store (SequenceStore): Packed genes.
+            input_columns (List[str]): Input columns of the features of the batch.
+        """
+        super().__init__({})
+        self.store = store
+        self.packed_components = [
+            component for component in ENCODED_COMPONENTS if component in input_columns
+        ]
+
+    def __getitem__(self, column: str) -> List[str]:
+        if column not in self.columns:
+            self.columns[column] = self.store.regions[column].sequences()
+        return self.columns[column]
+
+    def shared(self, key: str, compute: Callable[[FeatureBatch], Any]) -> Any:
+        return super().shared(key, PACKED_INTERMEDIATES.get(key, compute))
+
+
+def get_packed_component_slices(batch: PackedFeatureBatch) -> Dict[str, slice]:
+    """Get the slices of the UTR and CDS sequences of a packed batch (see get_component_slices)."""
+    gene_count = len(batch.store.gene_ids)
+    return {
+        component: slice(number * gene_count, (number + 1) * gene_count)
+        for number, component in enumerate(batch.packed_components)
+    }
+
+
+def get_packed_component_lengths(batch: PackedFeatureBatch) -> Dict[str, np.ndarray]:
+    """Get the lengths of the UTR and CDS sequences of a packed batch (see get_component_lengths)."""
+    return {
+        component: batch.store.regions[component].lengths
+        for component in batch.packed_components
+    }
+
+
+def decode_packed_components(
+    batch: PackedFeatureBatch,
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, slice]]:
+    """Unpack the codes of the UTR and CDS sequences of a packed batch (see encode_components).
+
+    Sequences are padded to a multiple of SEQUENCE_ALIGNMENT rather than of 3 nucleotides,
+    which keeps their codons lined up.
+    """
+    regions = [batch.store.regions[component] for component in batch.packed_components]
+    region_offsets = np.cumsum([0] + [region.offsets[-1] for region in regions])
+    offsets = np.concatenate(
+        [region.offsets[:-1] + region_offset for region, region_offset in zip(regions, region_offsets)]
+        + [region_offsets[-1:]]
+    )
+    codes = np.concatenate([region.codes() for region in regions])
+    return codes, offsets, batch.shared("component_slices", get_packed_component_slices)
 
-                # Open the CSV file for writing
-                writer = csv.DictWriter(temp_file, fieldnames=header)
-                writer.writeheader()
 
-                # Compute features for each gene
-                for row in reader:
-                    # Add data for new columns (assuming new_columns is a list of values)
-                    utr5 = row.get("utr5")
-                    cds = row.get("cds")
-                    utr3 = row.get("utr3")
+def count_packed_component_gc(batch: PackedFeatureBatch) -> np.ndarray:
+    """Count the GC nucleotides at each codon position of the sequences of a packed batch.
 
-                    row.update(compute_cds_codon_frequencies(cds=cds, codons=codons))
-                    row.update(compute_lengths(cds=cds, utr5=utr5, utr3=utr3))
-                    row.update(
-                        compute_gc_content_sequence_components(
-                            utr5=utr5, cds=cds, utr3=utr3
-                        )
-                    )
-                    row.update(compute_gc_content_wobble_positions(cds))
+    The nucleotides are counted on the packed bytes (see PackedSequences.gc_counts), with the
+    same result as count_component_gc.
+    """
+    return np.concatenate(
+        [batch.store.regions[component].gc_counts() for component in batch.packed_components]
+    )
 
-                    # Write the modified row to the temporary file
-                    writer.writerow(row)
 
-            # Replace the original file with the temporary file
-            shutil.move(temp_file.name, file_path)
+# Intermediate results of the features computed on the packed sequences of PackedFeatureBatch
+PACKED_INTERMEDIATES = {
+    "component_slices": get_packed_component_slices,
+    "component_lengths": get_packed_component_lengths,
+    "encoded_components": decode_packed_components,
+    "component_gc_counts": count_packed_component_gc,
+}
 
 
 def compute_cds_codon_frequencies(cds: str, codons: List[str]) -> Dict[str, float]:
@@ -130,6 +796,407 @@ def compute_cds_codon_frequencies(cds: str, codons: List[str]) -> Dict[str, floa
     return codon_frequencies
 
 
+def encode_sequences(sequences: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode DNA sequences into one array of nucleotide codes.
+
+    A, C, G and T are coded 0 to 3 and any other character is coded 4. Every sequence is
+    padded with 4 to a multiple of 3, so that codons of all sequences line up with
+    codes.reshape(-1, 3).
+
+    Args:
+        sequences (List[str]): DNA sequences.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The uint8 codes of all sequences one after the other,
+        and the offsets of the sequences in the codes (sequence i and its padding are
+        codes[offsets[i]:offsets[i + 1]]).
+    """
+    padded_sequences = [
+        sequence + CODON_PADDING[len(sequence) % 3] for sequence in sequences
+    ]
+
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum([len(sequence) for sequence in padded_sequences], out=offsets[1:])
+
+    codes = "".join(padded_sequences).encode("ascii", errors="replace")
+    return np.frombuffer(codes.translate(NUCLEOTIDE_CODES), dtype=np.uint8), offsets
+
+
+def count_region_kmers(
+    region_sequences: Dict[str, List[str]], kmer_sizes: Sequence[int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Count the k-mers of the regions of a chunk of genes, as rows of the k-mer matrix.
+
+    Args:
+        region_sequences (Dict[str, List[str]]): Sequences of each of KMER_REGIONS.
+        kmer_sizes (Sequence[int]): Sizes of the k-mers, sorted (see check_kmer_sizes).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The counts and column indices of the rows,
+        one row after the other, and the number of counts of each row.
+    """
+    region_column_count = sum(4**k for k in kmer_sizes)
+    gene_count = len(region_sequences[KMER_REGIONS[0]])
+
+    blocks = []
+    for region_number, region in enumerate(KMER_REGIONS):
+        sequences = region_sequences[region]
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum([len(sequence) for sequence in sequences], out=offsets[1:])
+        codes = np.frombuffer(
+            "".join(sequences).encode("ascii", errors="replace").translate(NUCLEOTIDE_CODES),
+            dtype=np.uint8,
+        )
+
+        rows, columns, counts = count_kmers(codes, offsets, kmer_sizes)
+        blocks.append((rows, region_number * region_column_count + columns, counts))
+
+    rows, columns, counts = (np.concatenate(arrays) for arrays in zip(*blocks))
+    order = np.argsort(rows, kind="stable")
+    return counts[order], columns[order], np.bincount(rows, minlength=gene_count)
+
+
+def compute_codon_counts_batch(codes: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Count the codons of encoded CDS sequences.
+
+    Codons are read from the start of each sequence, an incomplete last codon is ignored,
+    and so are codons containing a character other than A, C, G or T.
+
+    Args:
+        codes (np.ndarray): Nucleotide codes of the sequences (see encode_sequences).
+        offsets (np.ndarray): Offsets of the sequences in the codes.
+
+    Returns:
+        np.ndarray: Array of shape (number of sequences, 64) with the count of each codon,
+        in the order of product("ACGT", repeat=3).
+    """
+    sequence_count = len(offsets) - 1
+    first, second, third = codes.reshape(-1, 3).T
+
+    # Codon index 16 * a + 4 * b + c, or 64 if the codon is incomplete or ambiguous
+    codon_indices = 16 * first + 4 * second + third
+    codon_indices[(first | second | third) > 3] = 64
+
+    # Offset the indices of each sequence by 65 to count all sequences with one bincount
+    index_type = np.int32 if 65 * sequence_count < 2**31 else np.int64
+    sequence_indices = np.repeat(
+        np.arange(0, 65 * sequence_count, 65, dtype=index_type), np.diff(offsets) // 3
+    )
+    sequence_indices += codon_indices
+
+    counts = np.bincount(sequence_indices, minlength=65 * sequence_count)
+    return counts.reshape(sequence_count, 65)[:, :64]
+
+
+def compute_cds_codon_frequencies_batch(
+    cds_sequences: List[str], codons: List[str]
+) -> List[Dict[str, float]]:
+    """Compute the frequency of every possible codon in many cds at once.
+
+    Gives the same result as compute_cds_codon_frequencies for each cds.
+
+    Args:
+        cds_sequences (List[str]): cds sequences
+
+        codons (List[str]): list of strings representing all 64 possible codons
+        e.g. "AGA"
+
+    Returns:
+        List[Dict[str, float]]: dictionary of codon frequencies of each cds, with codons as
+        keys and their frequencies as values.
+    """
+    codes, offsets = encode_sequences(cds_sequences)
+    frequencies = compute_codon_frequency_columns(
+        compute_codon_counts_batch(codes, offsets),
+        np.array([len(cds) for cds in cds_sequences], dtype=np.int64),
+        codons,
+    )
+
+    return [
+        dict(zip(codons, row_frequencies))
+        for row_frequencies in zip(*[frequencies[codon] for codon in codons])
+    ]
+
+
+def compute_codon_frequency_columns(
+    counts: np.ndarray, cds_lengths: np.ndarray, codons: List[str]
+) -> Dict[str, List[float]]:
+    """Turn codon counts into codon frequency columns.
+
+    Args:
+        counts (np.ndarray): Codon counts (see compute_codon_counts_batch).
+        cds_lengths (np.ndarray): Lengths of the cds.
+        codons (List[str]): Codons to compute the frequency of.
+
+    Returns:
+        Dict[str, List[float]]: Frequencies of each codon in every cds, as in
+        compute_cds_codon_frequencies (0 for all codons if the cds is too short).
+    """
+    codon_counts = cds_lengths // 3
+
+    # Columns of the codons in the counts, in the order of the given codons
+    columns = [
+        16 * "ACGT".index(codon[0]) + 4 * "ACGT".index(codon[1]) + "ACGT".index(codon[2])
+        for codon in codons
+    ]
+    frequency_columns = (
+        counts[:, columns] / np.maximum(codon_counts, 1)[:, np.newaxis]
+    ).T.tolist()
+
+    # Address situation in which the cds provided is too short
+    too_short = np.flatnonzero(codon_counts == 0).tolist()
+    for frequencies in frequency_columns:
+        for index in too_short:
+            frequencies[index] = 0
+
+    return dict(zip(codons, frequency_columns))
+
+
+def sum_segments(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Sum the values of consecutive segments of an array.
+
+    Args:
+        values (np.ndarray): Array to sum along its first axis.
+        offsets (np.ndarray): Offsets of the segments (segment i is values[offsets[i]:offsets[i + 1]]).
+
+    Returns:
+        np.ndarray: Sums of the segments, 0 for empty segments.
+    """
+    starts = offsets[:-1]
+    non_empty = offsets[1:] > starts
+
+    sums = np.zeros((len(starts),) + values.shape[1:], dtype=np.int64)
+    if non_empty.any():
+        # Empty segments end where the next one starts, so they can be left out
+        sums[non_empty] = np.add.reduceat(values, starts[non_empty], axis=0, dtype=np.int64)
+    return sums
+
+
+def divide_or_empty(numerators: np.ndarray, denominators: np.ndarray) -> List:
+    """Divide two count arrays, giving an empty string where the denominator is 0.
+
+    Args:
+        numerators (np.ndarray): Numerators.
+        denominators (np.ndarray): Denominators.
+
+    Returns:
+        List: Python floats, or "" where the denominator is 0.
+    """
+    ratios = (numerators / np.maximum(denominators, 1)).tolist()
+    return [
+        ratio if denominator != 0 else ""
+        for ratio, denominator in zip(ratios, denominators.tolist())
+    ]
+
+
+def get_component_lengths(batch: FeatureBatch) -> Dict[str, np.ndarray]:
+    """Get the lengths of the UTR and CDS sequences of a batch.
+
+    Args:
+        batch (FeatureBatch): Batch of genes.
+
+    Returns:
+        Dict[str, np.ndarray]: Lengths of the sequences of each component of the batch.
+    """
+    return {
+        component: np.array([len(sequence) for sequence in batch[component]], dtype=np.int64)
+        for component in ENCODED_COMPONENTS
+        if component in batch.columns
+    }
+
+
+def get_component_slices(batch: FeatureBatch) -> Dict[str, slice]:
+    """Get the slices of the UTR and CDS sequences of a batch in its encoded sequences.
+
+    Only the components that are input columns of the batch are encoded, in the order of
+    ENCODED_COMPONENTS.
+
+    Args:
+        batch (FeatureBatch): Batch of genes.
+
+    Returns:
+        Dict[str, slice]: Slice of the sequences of each component.
+    """
+    component_slices = {}
+    sequence_count = 0
+    for component in ENCODED_COMPONENTS:
+        if component in batch.columns:
+            component_slices[component] = slice(
+                sequence_count, sequence_count + len(batch[component])
+            )
+            sequence_count += len(batch[component])
+    return component_slices
+
+
+def encode_components(batch: FeatureBatch) -> Tuple[np.ndarray, np.ndarray, Dict[str, slice]]:
+    """Encode the UTR and CDS sequences of a batch into one array (see encode_sequences).
+
+    Args:
+        batch (FeatureBatch): Batch of genes.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, Dict[str, slice]]: The codes and offsets of the sequences,
+        and the slice of the sequences of each component (see get_component_slices).
+    """
+    component_slices = batch.shared("component_slices", get_component_slices)
+    sequences: List[str] = []
+    for component in component_slices:
+        sequences += batch[component]
+
+    codes, offsets = encode_sequences(sequences)
+    return codes, offsets, component_slices
+
+
+def count_component_gc(batch: FeatureBatch) -> np.ndarray:
+    """Count the G and C nucleotides at each codon position of the encoded sequences of a batch.
+
+    Args:
+        batch (FeatureBatch): Batch of genes.
+
+    Returns:
+        np.ndarray: Array of shape (number of sequences, 3) with the GC counts at codon
+        positions 1, 2 and 3 of each sequence (see encode_components for the sequence order).
+    """
+    codes, offsets, _ = batch.shared("encoded_components", encode_components)
+    # C is coded 1 and G is coded 2
+    return sum_segments(((codes == 1) | (codes == 2)).reshape(-1, 3), offsets // 3)
+
+
+def count_cds_codons(batch: FeatureBatch) -> np.ndarray:
+    """Count the codons of the CDS sequences of a batch (see compute_codon_counts_batch).
+
+    Args:
+        batch (FeatureBatch): Batch of genes.
+
+    Returns:
+        np.ndarray: Array of shape (number of genes, 64) with the count of each codon.
+    """
+    codes, offsets, component_slices = batch.shared("encoded_components", encode_components)
+    cds = component_slices["cds"]
+    return compute_codon_counts_batch(
+        codes[offsets[cds.start] : offsets[cds.stop]],
+        offsets[cds.start : cds.stop + 1] - offsets[cds.start],
+    )
+
+
+@FEATURE_REGISTRY.register(
+    "codon_frequencies", ["cds"], pa.schema([(codon, pa.float32()) for codon in CODONS])
+)
+def compute_codon_frequencies_feature(batch: FeatureBatch) -> Dict[str, List]:
+    """Frequency of every codon in the CDS (see compute_cds_codon_frequencies)."""
+    lengths = batch.shared("component_lengths", get_component_lengths)
+    return compute_codon_frequency_columns(
+        batch.shared("cds_codon_counts", count_cds_codons), lengths["cds"], CODONS
+    )
+
+
+@FEATURE_REGISTRY.register(
+    "lengths",
+    ["utr5", "cds", "utr3"],
+    pa.schema([(f"{component}_length", pa.int32()) for component in ("cds", "utr5", "utr3")]),
+)
+def compute_lengths_feature(batch: FeatureBatch) -> Dict[str, List]:
+    """Lengths of the CDS and UTRs (see compute_lengths)."""
+    lengths = batch.shared("component_lengths", get_component_lengths)
+    return {
+        f"{component}_length": [
+            length if length > 0 else "" for length in lengths[component].tolist()
+        ]
+        for component in ("cds", "utr5", "utr3")
+    }
+
+
+@FEATURE_REGISTRY.register(
+    "gc_content",
+    ["utr5", "cds", "utr3"],
+    pa.schema([(f"{component}_gc", pa.float32()) for component in ("utr5", "cds", "utr3")]),
+)
+def compute_gc_content_feature(batch: FeatureBatch) -> Dict[str, List]:
+    """GC content of the UTRs and CDS (see compute_gc_content_sequence_components)."""
+    lengths = batch.shared("component_lengths", get_component_lengths)
+    total_gc_counts = batch.shared("component_gc_counts", count_component_gc).sum(axis=1)
+    component_slices = batch.shared("component_slices", get_component_slices)
+    return {
+        f"{component}_gc": divide_or_empty(
+            total_gc_counts[component_slices[component]], lengths[component]
+        )
+        for component in ("utr5", "cds", "utr3")
+    }
+
+
+@FEATURE_REGISTRY.register(
+    "wobble_gc_content",
+    ["cds"],
+    pa.schema([("cds_wobble2_gc", pa.float32()), ("cds_wobble3_gc", pa.float32())]),
+)
+def compute_wobble_gc_content_feature(batch: FeatureBatch) -> Dict[str, List]:
+    """GC content at wobble positions 2 and 3 of the CDS (see compute_gc_content_wobble_positions)."""
+    cds_lengths = batch.shared("component_lengths", get_component_lengths)["cds"]
+    component_slices = batch.shared("component_slices", get_component_slices)
+    cds_gc_counts = batch.shared("component_gc_counts", count_component_gc)[
+        component_slices["cds"]
+    ]
+    # Wobble positions 2 and 3 hold len(cds[1::3]) and len(cds[2::3]) nucleotides
+    return {
+        "cds_wobble2_gc": divide_or_empty(cds_gc_counts[:, 1], (cds_lengths + 1) // 3),
+        "cds_wobble3_gc": divide_or_empty(cds_gc_counts[:, 2], cds_lengths // 3),
+    }
+
+
+def compute_dna_features_batch(
+    utr5_sequences: List[str],
+    cds_sequences: List[str],
+    utr3_sequences: List[str],
+    codons: List[str] = CODONS,
+    feature_names: Optional[List[str]] = None,
+) -> Dict[str, List]:
+    """Compute the codon frequencies, lengths and GC contents of many genes in one pass.
+
+    The features are computed with FEATURE_REGISTRY: the sequences are encoded once, and
+    the GC counts at the three codon positions of every sequence are shared by the GC
+    content and wobble GC content, so each sequence is scanned once for the GC contents,
+    and once more for the codon counts. Gives the same values as
+    compute_cds_codon_frequencies, compute_lengths, compute_gc_content_sequence_components
+    and compute_gc_content_wobble_positions.
+
+    Args:
+        utr5_sequences (List[str]): 5' UTR DNA sequences.
+        cds_sequences (List[str]): CDS DNA sequences.
+        utr3_sequences (List[str]): 3' UTR DNA sequences.
+        codons (List[str]): list of strings representing all 64 possible codons.
+        feature_names (Optional[List[str]]): Features to compute, by default all codons and
+                                             COMPONENT_FEATURES. Only the features producing
+                                             them are computed.
+
+    Returns:
+        Dict[str, List]: Values of every feature (codons and COMPONENT_FEATURES) for each gene.
+    """
+    if feature_names is None:
+        feature_names = codons + COMPONENT_FEATURES
+
+    return FEATURE_REGISTRY.compute(
+        {"utr5": utr5_sequences, "cds": cds_sequences, "utr3": utr3_sequences}, feature_names
+    )
+
+
+def compute_dna_features(
+    utr5: str, cds: str, utr3: str, codons: List[str] = CODONS
+) -> Dict[str, float]:
+    """Compute the codon frequencies, lengths and GC contents of one gene in one pass.
+
+    Args:
+        utr5 (str): 5' UTR DNA sequence.
+        cds (str): CDS DNA sequence.
+        utr3 (str): 3' UTR DNA sequence.
+        codons (List[str]): list of strings representing all 64 possible codons.
+
+    Returns:
+        Dict[str, float]: Value of every feature (codons and COMPONENT_FEATURES).
+    """
+    features = compute_dna_features_batch([utr5], [cds], [utr3], codons)
+    return {feature: values[0] for feature, values in features.items()}
+
+
 def compute_lengths(cds: str, utr5: str, utr3: str) -> Dict[str, int]:
     """Compute the length of the cds, utr3 and utr5 DNA sequences.
 
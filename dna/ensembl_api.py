@@ -1,10 +1,58 @@
 import os
 import csv
 import re
-import time
-from typing import Optional, List, Tuple, Dict
+from typing import Optional, List, Tuple, Dict, Any, Callable, TextIO
 import ensembl_rest
 import requests
+from requests.adapters import HTTPAdapter
+from dna.ensembl_cache import ResponseCache, CacheMissError, DEFAULT_MAX_SIZE_BYTES
+from dna.extraction_checkpoint import ExtractionCheckpoint
+from dna.fasta_index import IndexedFasta
+from dna.gene_id_loader import GeneIdList, check_gene_ids, read_extracted_gene_ids
+from dna.rate_limiter import RateLimiter
+
+ENSEMBL_REST_URL = "https://rest.ensembl.org"
+JSON_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+
+# Maximum number of IDs accepted by the Ensembl POST endpoints
+LOOKUP_POST_MAX_IDS = 1000
+SEQUENCE_POST_MAX_IDS = 50
+
+# Ways of querying Ensembl in get_data_as_csv
+FETCH_MODES = ("sequential", "batched", "single_lookup")
+
+# Persistent response cache shared by all Ensembl requests (see configure_cache)
+response_cache: Optional[ResponseCache] = None
+
+# Number of connections kept alive to Ensembl by default, at least the number of worker
+# threads of asyncio.to_thread so that concurrent requests do not open new connections
+DEFAULT_POOL_SIZE = 32
+
+# Token bucket shared by all Ensembl requests, adjusted to the rate limit headers of the
+# responses of both requests and ensembl_rest
+rate_limiter = RateLimiter()
+
+# HTTP sessions of the Ensembl requests made with requests and with ensembl_rest, sharing
+# a pool of keep-alive connections (see configure_session)
+session = requests.Session()
+ensembl_rest_session = ensembl_rest._default_client.rest_client.session
+for client_session in (session, ensembl_rest_session):
+    client_session.hooks["response"].append(rate_limiter.record_response)
+
+# Local genome FASTA files read instead of Ensembl sequence requests, keyed by species
+# name (see configure_local_fasta)
+local_fasta_files: Dict[str, IndexedFasta] = {}
+
+# Columns of the extracted DNA components CSV files
+CSV_HEADER = [
+    "ensembl_gene_id",
+    "transcript_id",
+    "promoter",
+    "utr5",
+    "cds",
+    "utr3",
+    "terminator",
+]
 
 
 def read_gene_ids_from_file(file_path: str) -> List[str]:
@@ -35,6 +83,209 @@ def read_gene_ids_from_file(file_path: str) -> List[str]:
         return []
 
 
+def configure_cache(
+    cache_path: Optional[str],
+    max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+    offline: bool = False,
+) -> None:
+    """Enables (or disables) the persistent cache of Ensembl responses.
+
+    Args:
+        cache_path (Optional[str]): Path to the SQLite cache file. None disables the cache.
+        max_size_bytes (int): Maximum size of the cached responses before LRU eviction.
+        offline (bool): Whether to serve only cached responses, without network requests.
+    """
+    global response_cache  # pylint: disable=global-statement
+
+    if response_cache is not None:
+        response_cache.close()
+
+    response_cache = (
+        ResponseCache(cache_path, max_size_bytes=max_size_bytes, offline=offline)
+        if cache_path is not None
+        else None
+    )
+
+
+def configure_local_fasta(species_name: str, fasta_path: Optional[str]) -> None:
+    """Reads the genomic sequences of a species from a local genome FASTA file.
+
+    Promoters, terminators and UTRs are then sliced out of the memory-mapped genome
+    instead of being requested from Ensembl (gene and transcript lookups still are).
+
+    Args:
+        species_name (str): Species name, e.g. "homo_sapiens".
+        fasta_path (Optional[str]): Path to the (optionally gzipped) genome FASTA file.
+                                    None goes back to Ensembl sequence requests.
+    """
+    if species_name in local_fasta_files:
+        local_fasta_files.pop(species_name).close()
+
+    if fasta_path is not None:
+        local_fasta_files[species_name] = IndexedFasta(fasta_path)
+
+
+def configure_session(pool_size: int = DEFAULT_POOL_SIZE) -> None:
+    """Sets the number of keep-alive connections of the Ensembl HTTP sessions.
+
+    Connections are set up once and reused by the next requests, instead of a new TCP
+    and TLS handshake for every request. The requests and ensembl_rest sessions share
+    the same connection pool.
+
+    Args:
+        pool_size (int): Maximum number of connections kept alive, at least the number
+                         of requests made at the same time.
+    """
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    for client_session in (session, ensembl_rest_session):
+        previous_adapter = client_session.adapters.get("https://")
+        client_session.mount("https://", adapter)
+        if previous_adapter is not None and previous_adapter is not adapter:
+            previous_adapter.close()
+
+
+# Keep-alive connections of the default size until configured otherwise
+configure_session()
+
+
+def cached_request(endpoint: str, params: Dict, fetch: Callable[[], Any]) -> Any:
+    """Serves an Ensembl request from the response cache, or performs and caches it.
+
+    Requests are made through the shared rate limiter, which retries them after rate
+    limit and transient server errors.
+
+    Args:
+        endpoint (str): Ensembl REST endpoint, e.g. "sequence/id".
+        params (Dict): Parameters identifying the request.
+        fetch (Callable[[], Any]): Function performing the request.
+
+    Returns:
+        Any: The (cached) response.
+
+    Raises:
+        CacheMissError: In offline mode, if the response is not cached.
+    """
+    if response_cache is None:
+        return rate_limiter.call(fetch)
+
+    value = response_cache.get(endpoint, params)
+    if value is not None:
+        return value
+    if response_cache.offline:
+        raise CacheMissError(f"Offline mode: {endpoint} {params} is not cached.")
+
+    value = rate_limiter.call(fetch)
+    response_cache.set(endpoint, params, value)
+    return value
+
+
+def get_cached_ids(
+    endpoint: str, ids: List[str], make_params: Callable[[str], Dict]
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Splits the IDs of a batch request into cached responses and IDs to request.
+
+    Args:
+        endpoint (str): Ensembl REST endpoint of the single ID requests.
+        ids (List[str]): IDs of the batch request.
+        make_params (Callable[[str], Dict]): Builds the request parameters of one ID.
+
+    Returns:
+        Tuple[Dict[str, Any], List[str]]: Cached responses by ID, and the IDs that still
+        have to be requested (none in offline mode).
+    """
+    if response_cache is None:
+        return {}, ids
+
+    cached = {}
+    missing = []
+    for identifier in ids:
+        value = response_cache.get(endpoint, make_params(identifier))
+        if value is not None:
+            cached[identifier] = value
+        elif not response_cache.offline:
+            missing.append(identifier)
+
+    return cached, missing
+
+
+def set_cached_ids(
+    endpoint: str, values: Dict[str, Any], make_params: Callable[[str], Dict]
+) -> None:
+    """Stores the per ID responses of a batch request in the response cache.
+
+    Args:
+        endpoint (str): Ensembl REST endpoint of the single ID requests.
+        values (Dict[str, Any]): Responses by ID.
+        make_params (Callable[[str], Dict]): Builds the request parameters of one ID.
+    """
+    if response_cache is None:
+        return
+
+    for identifier, value in values.items():
+        response_cache.set(endpoint, make_params(identifier), value)
+
+
+def request_fasta_sequence(address: str) -> str:
+    """Requests a FASTA sequence from Ensembl and keeps only its nucleotides.
+
+    Args:
+        address (str): REST API URL of the sequence.
+
+    Returns:
+        str: The nucleotide sequence formatted into a single string.
+    """
+    # Make a GET request to the Ensembl REST API
+    r = session.get(address, headers={"Content-Type": "text/x-fasta"}, timeout=30)
+
+    # Ensure that there are no issues with the sequence request
+    r.raise_for_status()
+
+    # Extract only the nucleotide sequence and format into a single string
+    raw_output = r.text
+    pattern = re.compile("(?:^|\n)[ATGC]+")
+    matches = pattern.findall(raw_output)
+    return "".join(matches).replace("\n", "")
+
+
+def post_request(url: str, **kwargs) -> requests.Response:
+    """Makes a POST request to Ensembl through the shared rate limiter and session.
+
+    Args:
+        url (str): REST API URL of the endpoint.
+        **kwargs: Keyword arguments passed to session.post (headers, params, json, timeout).
+
+    Returns:
+        requests.Response: The successful response.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails, after the retries.
+    """
+
+    def post() -> requests.Response:
+        r = session.post(url, **kwargs)
+        r.raise_for_status()
+        return r
+
+    return rate_limiter.call(post)
+
+
+def lookup_gene(gene_id: str, species: str) -> Dict:
+    """Looks up a gene in Ensembl (through the response cache).
+
+    Args:
+        gene_id (str): Ensembl gene ID.
+        species (str): Species of the gene, e.g. "homo sapiens".
+
+    Returns:
+        Dict: The gene lookup data.
+    """
+    return cached_request(
+        "lookup/id",
+        {"id": gene_id, "species": species},
+        lambda: ensembl_rest.lookup(species=species, id=gene_id),
+    )
+
+
 def get_cds(transcript_id: str) -> str:
     """Retrieves the coding sequence (CDS) for a given Ensembl transcript ID.
 
@@ -49,17 +300,11 @@ def get_cds(transcript_id: str) -> str:
     address = f"https://rest.ensembl.org/sequence/id/{transcript_id}?multiple_sequences=1;type=cds"
 
     try:
-        # Make a GET request to the Ensembl REST API
-        r = requests.get(address, headers={"Content-Type": "text/x-fasta"}, timeout=30)
-
-        # Ensure that there are no issues with the sequence request
-        r.raise_for_status()
-
-        # Extract only the nucleotide sequence and format into a single string
-        raw_output = r.text
-        pattern = re.compile("(?:^|\n)[ATGC]+")
-        matches = pattern.findall(raw_output)
-        cds_sequence = "".join(matches).replace("\n", "")
+        cds_sequence = cached_request(
+            "sequence/id",
+            {"id": transcript_id, "type": "cds"},
+            lambda: request_fasta_sequence(address),
+        )
 
         return cds_sequence
 
@@ -73,6 +318,7 @@ def get_promoter_terminator(
     transcript_id: str,
     promoter_length: Optional[int] = 1000,
     terminator_length: Optional[int] = 500,
+    species: Optional[str] = None,
 ) -> Tuple[str, str]:
     """Retrieves the promoter and terminator sequences for a given Ensembl transcript ID.
 
@@ -80,25 +326,32 @@ def get_promoter_terminator(
         transcript_id (str): Ensembl transcript ID for the target gene.
         promoter_length (Optional[int]): Length of the promoter sequence (default is 1000).
         terminator_length (Optional[int]): Length of the terminator sequence (default is 500).
+        species (Optional[str]): Species name, e.g. "homo_sapiens". If a local genome FASTA
+                                 file is configured for it, the sequence is read from that file.
 
     Returns:
         Tuple[str, str]: A tuple containing the promoter and terminator sequences as strings.
     """
+    if species in local_fasta_files:
+        return get_local_promoter_terminator(
+            transcript_id, species, promoter_length, terminator_length
+        )
+
     # Construct the REST API URL for retrieving genomic sequence with specified 5' and 3' expansions
     address = f"https://rest.ensembl.org/sequence/id/{transcript_id}?type=genomic;expand_5prime=1000;expand_3prime=500"
 
     try:
-        # Make a GET request to the Ensembl REST API
-        r = requests.get(address, headers={"Content-Type": "text/x-fasta"}, timeout=30)
-
-        # Ensure that there are no issues with the sequence request
-        r.raise_for_status()
-
-        # Remove unwanted characters to produce only the nucleotide sequence and format into a single string
-        raw_output = r.text
-        pattern = re.compile("(?:^|\n)[ATGC]+")
-        matches = pattern.findall(raw_output)
-        sequence = "".join(matches).replace("\n", "")
+        # Retrieve the nucleotide sequence of the transcript and its flanks as a single string
+        sequence = cached_request(
+            "sequence/id",
+            {
+                "id": transcript_id,
+                "type": "genomic",
+                "expand_5prime": 1000,
+                "expand_3prime": 500,
+            },
+            lambda: request_fasta_sequence(address),
+        )
 
         # Extract the promoter and terminator sequence from the entire sequence
         promoter_sequence = sequence[:promoter_length]
@@ -112,6 +365,55 @@ def get_promoter_terminator(
         return "", ""
 
 
+def get_local_promoter_terminator(
+    transcript_id: str,
+    species: str,
+    promoter_length: int = 1000,
+    terminator_length: int = 500,
+) -> Tuple[str, str]:
+    """Slices the promoter and terminator of a transcript out of the local genome FASTA file.
+
+    Args:
+        transcript_id (str): Ensembl transcript ID for the target gene.
+        species (str): Species name with a configured local genome FASTA file.
+        promoter_length (int): Length of the promoter sequence (default is 1000).
+        terminator_length (int): Length of the terminator sequence (default is 500).
+
+    Returns:
+        Tuple[str, str]: A tuple containing the promoter and terminator sequences as strings.
+    """
+    # The transcript coordinates come from the same lookup as the UTRs
+    transcript_data = request_with_retry(transcript_id)
+    if transcript_data == {}:
+        return "", ""
+
+    fasta = local_fasta_files[species]
+    chromosome = transcript_data["seq_region_name"]
+    strand = transcript_data["strand"]
+    if strand == 1:
+        start = transcript_data["start"] - promoter_length
+        end = transcript_data["end"] + terminator_length
+    else:
+        start = transcript_data["start"] - terminator_length
+        end = transcript_data["end"] + promoter_length
+    # The flanks cannot reach past the ends of the chromosome
+    start, end = max(1, start), min(end, fasta.get_length(chromosome))
+
+    sequence = clean_fasta_sequence(fasta.fetch(chromosome, start, end, strand))
+    return slice_flanks(
+        sequence,
+        *get_flank_lengths(
+            strand,
+            transcript_data["start"],
+            transcript_data["end"],
+            start,
+            end,
+            promoter_length,
+            terminator_length,
+        ),
+    )
+
+
 def extract_utr_information(
     data: dict,
 ) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], Optional[str], Optional[int]]:
@@ -165,20 +467,20 @@ def get_utr_sequence(
 
     Returns:
         str: The nucleotide sequence of the specified UTR.
+
+    Raises:
+        ensembl_rest.core.restclient.HTTPError: If the request fails, after the retries.
     """
+    if species in local_fasta_files:
+        return local_fasta_files[species].fetch(chromosome, start, end, strand)
+
     # Use Ensembl REST API to retrieve UTR sequence for the specified region
     region = f"{chromosome}:{start}..{end}:{strand}"
-    try:
-        utr_sequence = ensembl_rest.sequence_region(region=region, species=species)[
-            "seq"
-        ]
-    except ensembl_rest.core.restclient.HTTPError as e:
-        if e.response.status_code == 429:  # Check for rate limit exceeded error
-            print("Rate limit exceeded. Waiting before retrying...")
-            time.sleep(1)
-            utr_sequence = get_utr_sequence(chromosome, strand, start, end, species)
-
-    return utr_sequence
+    return cached_request(
+        "sequence/region",
+        {"region": region, "species": species},
+        lambda: ensembl_rest.sequence_region(region=region, species=species)["seq"],
+    )
 
 
 def get_full_utr_sequence(
@@ -230,126 +532,746 @@ def get_species_name(file_path: str) -> str:
 
 
 def request_with_retry(transcript_id: str) -> Dict:
-    """Retries the request for a transcript ID
+    """Looks up a transcript with its UTRs, retrying the request after rate limit errors.
 
     Args:
         transcript_id (str): Ensembl transcript ID for the target gene.
 
     Returns:
-        dict: A dictionary containing information about the transcript.
+        dict: A dictionary containing information about the transcript, empty if the
+              request failed.
     """
-    while True:
-        try:
-            transcript_data = ensembl_rest.lookup(
+    try:
+        return cached_request(
+            "lookup/id",
+            {"id": transcript_id, "expand": 1, "utr": 1},
+            lambda: ensembl_rest.lookup(
                 id=transcript_id, params={"expand": True, "utr": True}
+            ),
+        )
+    except ensembl_rest.core.restclient.HTTPError as e:
+        print(f"Error with the request for {transcript_id}: {e}")
+        return {}
+
+
+def split_into_batches(items: List[str], batch_size: int) -> List[List[str]]:
+    """Splits a list of IDs into consecutive batches of at most batch_size items.
+
+    Args:
+        items (List[str]): List of IDs to split.
+        batch_size (int): Maximum number of IDs in a batch.
+
+    Returns:
+        List[List[str]]: A list of batches, in the original order.
+    """
+    return [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def parse_fasta_records(raw_output: str) -> Dict[str, str]:
+    """Extracts the nucleotide sequence of each record of a multi-record FASTA text.
+
+    Each sequence is cleaned in the same way as in get_cds, and keyed by the record
+    ID without its version suffix.
+
+    Args:
+        raw_output (str): FASTA formatted text returned by the Ensembl REST API.
+
+    Returns:
+        Dict[str, str]: A dictionary with record IDs as keys and sequences as values.
+    """
+    pattern = re.compile("(?:^|\n)[ATGC]+")
+    sequences = {}
+
+    for record in raw_output.split(">")[1:]:
+        header, _, body = record.partition("\n")
+        record_id = header.split()[0].split(".")[0] if header.split() else ""
+        matches = pattern.findall("\n" + body)
+        sequences[record_id] = "".join(matches).replace("\n", "")
+
+    return sequences
+
+
+def post_lookup_ids(
+    ids: List[str],
+    species: Optional[str] = None,
+    expand: bool = False,
+    utr: bool = False,
+) -> Dict[str, Dict]:
+    """Looks up many Ensembl IDs with the POST lookup/id endpoint.
+
+    Args:
+        ids (List[str]): Ensembl gene or transcript IDs.
+        species (Optional[str]): Species of the IDs (speeds up the lookup).
+        expand (bool): Whether to include the child features (transcripts, exons, translation).
+        utr (bool): Whether to include the UTR features (requires expand).
+
+    Returns:
+        Dict[str, Dict]: A dictionary with the IDs as keys and the lookup data as values.
+                         IDs that could not be found are left out.
+    """
+    params = {}
+    if expand:
+        params["expand"] = 1
+    if utr:
+        params["utr"] = 1
+
+    def make_params(identifier: str) -> Dict:
+        # Same cache key as the single ID lookups (lookup_gene, request_with_retry)
+        single_params = {"id": identifier, **params}
+        if species is not None:
+            single_params["species"] = species
+        return single_params
+
+    lookups, ids = get_cached_ids("lookup/id", ids, make_params)
+    for batch in split_into_batches(ids, LOOKUP_POST_MAX_IDS):
+        body = {"ids": batch}
+        if species is not None:
+            body["species"] = species
+
+        try:
+            r = post_request(
+                f"{ENSEMBL_REST_URL}/lookup/id",
+                headers=JSON_HEADERS,
+                params=params,
+                json=body,
+                timeout=120,
             )
-            return transcript_data
-        except ensembl_rest.core.restclient.HTTPError as e:
-            if e.response.status_code == 429:  # Check for rate limit exceeded error
-                print("Rate limit exceeded. Waiting before retrying...")
-                time.sleep(1)
-                continue
+            batch_lookups = {key: value for key, value in r.json().items() if value}
+            set_cached_ids("lookup/id", batch_lookups, make_params)
+            lookups.update(batch_lookups)
 
-            print(f"Error with the request for {transcript_id}: {e}")
-            return {}
+        except requests.exceptions.RequestException as e:
+            print(f"Error with the batch lookup request for {batch[0]}...: {e}")
 
+    return lookups
+
+
+def post_sequence_ids(
+    ids: List[str],
+    sequence_type: str,
+    expand_5prime: Optional[int] = None,
+    expand_3prime: Optional[int] = None,
+) -> Dict[str, str]:
+    """Retrieves the sequences of many Ensembl IDs with the POST sequence/id endpoint.
+
+    Args:
+        ids (List[str]): Ensembl transcript IDs.
+        sequence_type (str): Type of sequence, e.g. "cds" or "genomic".
+        expand_5prime (Optional[int]): Number of bases to add upstream of the sequence.
+        expand_3prime (Optional[int]): Number of bases to add downstream of the sequence.
 
-def get_data_as_csv(file_paths: List[str], output_directory: str) -> None:
+    Returns:
+        Dict[str, str]: A dictionary with the IDs as keys and the nucleotide sequences as values.
+                        IDs that could not be retrieved are left out.
+    """
+    def make_params(identifier: str) -> Dict:
+        # Same cache key as the single ID requests (get_cds, get_promoter_terminator)
+        single_params = {"id": identifier, "type": sequence_type}
+        if expand_5prime is not None:
+            single_params["expand_5prime"] = expand_5prime
+        if expand_3prime is not None:
+            single_params["expand_3prime"] = expand_3prime
+        return single_params
+
+    sequences, ids = get_cached_ids("sequence/id", ids, make_params)
+    for batch in split_into_batches(ids, SEQUENCE_POST_MAX_IDS):
+        body = {"ids": batch, "type": sequence_type}
+        if expand_5prime is not None:
+            body["expand_5prime"] = expand_5prime
+        if expand_3prime is not None:
+            body["expand_3prime"] = expand_3prime
+
+        try:
+            r = post_request(
+                f"{ENSEMBL_REST_URL}/sequence/id",
+                headers={"Content-Type": "application/json", "Accept": "text/x-fasta"},
+                json=body,
+                timeout=120,
+            )
+            batch_sequences = parse_fasta_records(r.text)
+            set_cached_ids("sequence/id", batch_sequences, make_params)
+            sequences.update(batch_sequences)
+
+        except requests.exceptions.RequestException as e:
+            print(f"Error with the batch sequence request for {batch[0]}...: {e}")
+
+    return sequences
+
+
+def post_sequence_regions(regions: List[str], species: str) -> Dict[str, str]:
+    """Retrieves the sequences of many genomic regions with the POST sequence/region endpoint.
+
+    Args:
+        regions (List[str]): Regions formatted as "chromosome:start..end:strand".
+        species (str): Species of the regions.
+
+    Returns:
+        Dict[str, str]: A dictionary with the regions as keys and the sequences as values.
+    """
+    def make_params(region: str) -> Dict:
+        # Same cache key as the single region requests (get_utr_sequence)
+        return {"region": region, "species": species}
+
+    sequences, regions = get_cached_ids("sequence/region", regions, make_params)
+    for batch in split_into_batches(regions, SEQUENCE_POST_MAX_IDS):
+        try:
+            r = post_request(
+                f"{ENSEMBL_REST_URL}/sequence/region/{species}",
+                headers=JSON_HEADERS,
+                json={"regions": batch},
+                timeout=120,
+            )
+            batch_sequences = {entry["query"]: entry["seq"] for entry in r.json()}
+            set_cached_ids("sequence/region", batch_sequences, make_params)
+            sequences.update(batch_sequences)
+
+        except requests.exceptions.RequestException as e:
+            print(f"Error with the batch region request for {batch[0]}...: {e}")
+
+    return sequences
+
+
+def get_rows_batched(gene_ids: List[str], species_name: str) -> List[List[str]]:
+    """Retrieves the DNA components of many genes using the Ensembl batch endpoints.
+
+    The genes are looked up together, then the CDS, flanking and UTR sequences of all
+    canonical transcripts are fetched in batches, instead of several requests per gene.
+
+    Args:
+        gene_ids (List[str]): Ensembl gene IDs (at most LOOKUP_POST_MAX_IDS recommended).
+        species_name (str): Species name, e.g. "homo_sapiens".
+
+    Returns:
+        List[List[str]]: Rows of the CSV file (see CSV_HEADER), in the order of gene_ids.
+                         Genes whose components could not be retrieved are left out.
+    """
+    species = " ".join(species_name.split("_"))
+
+    # Look up the canonical transcript of every gene
+    gene_data = post_lookup_ids(gene_ids, species=species)
+    transcript_ids = {
+        gene_id: gene_data[gene_id]["canonical_transcript"].split(".")[0]
+        for gene_id in gene_ids
+        if gene_id in gene_data and gene_data[gene_id].get("canonical_transcript")
+    }
+    transcripts = list(transcript_ids.values())
+
+    # Retrieve CDS, promoter and terminator sequences
+    cds_sequences = post_sequence_ids(transcripts, "cds")
+    transcripts = [t for t in transcripts if cds_sequences.get(t, "") != ""]
+    genomic_sequences = post_sequence_ids(
+        transcripts, "genomic", expand_5prime=1000, expand_3prime=500
+    )
+
+    # Retrieve UTR coordinates, then all UTR sequences
+    transcript_data = post_lookup_ids(transcripts, expand=True, utr=True)
+    utr_regions = {}
+    for transcript_id, data in transcript_data.items():
+        utr5_coord_list, utr3_coord_list, chromosome, strand = extract_utr_information(
+            data
+        )
+        utr_regions[transcript_id] = (
+            [f"{chromosome}:{start}..{end}:{strand}" for start, end in utr5_coord_list],
+            [f"{chromosome}:{start}..{end}:{strand}" for start, end in utr3_coord_list],
+        )
+    all_regions = [
+        region
+        for utr5_regions, utr3_regions in utr_regions.values()
+        for region in utr5_regions + utr3_regions
+    ]
+    region_sequences = post_sequence_regions(all_regions, species_name)
+
+    rows = []
+    for gene_id in gene_ids:
+        transcript_id = transcript_ids.get(gene_id)
+        if transcript_id is None or cds_sequences.get(transcript_id, "") == "":
+            continue
+        if transcript_id not in utr_regions:
+            continue
+
+        genomic_sequence = genomic_sequences.get(transcript_id, "")
+        utr5_regions, utr3_regions = utr_regions[transcript_id]
+        rows.append(
+            [
+                gene_id,
+                transcript_id,
+                genomic_sequence[:1000],
+                "".join(region_sequences.get(region, "") for region in utr5_regions),
+                cds_sequences[transcript_id],
+                "".join(region_sequences.get(region, "") for region in utr3_regions),
+                genomic_sequence[-500:],
+            ]
+        )
+
+    return rows
+
+
+def get_gene_row(gene_id: str, species_name: str) -> Optional[List[str]]:
+    """Retrieves the DNA components of one gene from Ensembl.
+
+    Args:
+        gene_id (str): Ensembl gene ID.
+        species_name (str): Species name, e.g. "homo_sapiens".
+
+    Returns:
+        Optional[List[str]]: Row of the CSV file (see CSV_HEADER), or None if the
+                             components of the gene could not be retrieved.
+    """
+    species = " ".join(species_name.split("_"))
+    print(f"Extracting data for gene ID : {gene_id}")
+
+    try:
+        gene_data = lookup_gene(gene_id, species)
+    except ensembl_rest.core.restclient.HTTPError as e:
+        print(f"Error with the request for {gene_id}: {e}")
+        return None
+
+    # Get transcript ID
+    transcript_id = gene_data["canonical_transcript"].split(".")[0]
+
+    # Retrieve promoter, CDS, and terminator sequences
+    cds_sequence = get_cds(transcript_id)
+    if cds_sequence == "":
+        return None
+    promoter_sequence, terminator_sequence = get_promoter_terminator(
+        transcript_id, species=species_name
+    )
+
+    # Retrieve UTR sequences
+    transcript_data = request_with_retry(transcript_id)
+    if transcript_data == {}:
+        return None
+
+    utr5_coord_list, utr3_coord_list, chromosome, strand = extract_utr_information(
+        transcript_data
+    )
+    try:
+        utr5_sequence = get_full_utr_sequence(
+            utr5_coord_list, chromosome, strand, species=species_name
+        )
+        utr3_sequence = get_full_utr_sequence(
+            utr3_coord_list, chromosome, strand, species=species_name
+        )
+    except ensembl_rest.core.restclient.HTTPError as e:
+        print(f"Error with the UTR requests for {transcript_id}: {e}")
+        return None
+
+    return [
+        gene_id,
+        transcript_id,
+        promoter_sequence,
+        utr5_sequence,
+        cds_sequence,
+        utr3_sequence,
+        terminator_sequence,
+    ]
+
+
+def clean_fasta_sequence(sequence: str, line_width: int = 60) -> str:
+    """Cleans a raw sequence the same way get_cds cleans the Ensembl FASTA output.
+
+    The Ensembl FASTA output is wrapped every 60 bases and only the leading A/T/G/C
+    bases of each line are kept, so ambiguous bases (e.g. N) are dropped in the same way.
+
+    Args:
+        sequence (str): Raw nucleotide sequence.
+        line_width (int): Line width of the Ensembl FASTA output.
+
+    Returns:
+        str: The cleaned nucleotide sequence.
+    """
+    pattern = re.compile("[ATGC]*")
+    return "".join(
+        pattern.match(sequence, i, i + line_width).group()
+        for i in range(0, len(sequence), line_width)
+    )
+
+
+def derive_component_coordinates(
+    gene_data: Dict,
+    promoter_length: int = 1000,
+    terminator_length: int = 500,
+) -> Dict:
+    """Derives the coordinates of all DNA components from an expanded gene lookup.
+
+    Args:
+        gene_data (Dict): Gene lookup data retrieved with expand=1 and utr=1.
+        promoter_length (int): Length of the promoter sequence (default is 1000).
+        terminator_length (int): Length of the terminator sequence (default is 500).
+
+    Returns:
+        Dict: Transcript ID, chromosome, strand, the genomic region spanning the transcript
+              and its flanks (starting at 1 at most), the transcript start and end, and the
+              (start, end) coordinates of the 5' UTR, CDS and 3' UTR pieces in transcript
+              order. Empty if the canonical transcript is not coding.
+    """
+    canonical_transcript = gene_data.get("canonical_transcript", "").split(".")[0]
+    transcript = next(
+        (
+            t
+            for t in gene_data.get("Transcript", [])
+            if t.get("id", "").split(".")[0] == canonical_transcript
+        ),
+        None,
+    )
+    if transcript is None or not transcript.get("Translation"):
+        return {}
+
+    strand = transcript["strand"]
+    start, end = transcript["start"], transcript["end"]
+
+    # The promoter is upstream and the terminator downstream of the transcript
+    if strand == 1:
+        region_start = max(1, start - promoter_length)
+        region_end = end + terminator_length
+    else:
+        region_start = max(1, start - terminator_length)
+        region_end = end + promoter_length
+
+    utr5_coord_list, utr3_coord_list, _, _ = extract_utr_information(transcript)
+
+    # The CDS is the part of the exons covered by the translation, in transcript order
+    translation = transcript["Translation"]
+    exons = sorted(
+        transcript.get("Exon", []), key=lambda exon: exon["start"], reverse=strand == -1
+    )
+    cds_coord_list = [
+        (max(exon["start"], translation["start"]), min(exon["end"], translation["end"]))
+        for exon in exons
+        if exon["end"] >= translation["start"] and exon["start"] <= translation["end"]
+    ]
+
+    return {
+        "transcript_id": canonical_transcript,
+        "chromosome": transcript["seq_region_name"],
+        "strand": strand,
+        "region_start": region_start,
+        "region_end": region_end,
+        "start": start,
+        "end": end,
+        "utr5": utr5_coord_list,
+        "cds": cds_coord_list,
+        "utr3": utr3_coord_list,
+    }
+
+
+def get_flank_lengths(
+    strand: int,
+    start: int,
+    end: int,
+    region_start: int,
+    region_end: int,
+    promoter_length: int = 1000,
+    terminator_length: int = 500,
+) -> Tuple[int, int]:
+    """Gets the lengths of the promoter and terminator within the region of a transcript.
+
+    Args:
+        strand (int): 1 for the forward strand, -1 for the reverse strand.
+        start (int): Start position of the transcript.
+        end (int): End position of the transcript.
+        region_start (int): Start position of the region, clipped to the chromosome.
+        region_end (int): End position of the region, clipped to the chromosome.
+        promoter_length (int): Length of the promoter sequence (default is 1000).
+        terminator_length (int): Length of the terminator sequence (default is 500).
+
+    Returns:
+        Tuple[int, int]: Lengths of the promoter and terminator, shorter than requested
+                         where the region reaches an end of the chromosome.
+    """
+    # The promoter is upstream and the terminator downstream of the transcript
+    if strand == 1:
+        upstream, downstream = start - region_start, region_end - end
+    else:
+        upstream, downstream = region_end - end, start - region_start
+    return (
+        max(0, min(promoter_length, upstream)),
+        max(0, min(terminator_length, downstream)),
+    )
+
+
+def slice_flanks(
+    sequence: str, promoter_length: int, terminator_length: int
+) -> Tuple[str, str]:
+    """Slices the promoter and terminator out of the sequence of a transcript region.
+
+    Args:
+        sequence (str): Sequence of the region, on the strand of the transcript.
+        promoter_length (int): Length of the promoter at the start of the sequence.
+        terminator_length (int): Length of the terminator at the end of the sequence.
+
+    Returns:
+        Tuple[str, str]: The promoter and terminator sequences.
+    """
+    return sequence[:promoter_length], sequence[len(sequence) - terminator_length :]
+
+
+def slice_components(
+    region_sequence: str,
+    coordinates: Dict,
+    promoter_length: int = 1000,
+    terminator_length: int = 500,
+) -> Tuple[str, str, str, str, str]:
+    """Slices the DNA components out of the genomic region of a transcript.
+
+    The promoter and terminator are shorter than requested when the region of the
+    transcript is clipped to the chromosome, e.g. for genes at the start of a chromosome.
+
+    Args:
+        region_sequence (str): Sequence of the region described by the coordinates,
+                               on the strand of the transcript.
+        coordinates (Dict): Output of derive_component_coordinates, whose region_end may be
+                            clipped to the length of the chromosome.
+        promoter_length (int): Length of the promoter sequence (default is 1000).
+        terminator_length (int): Length of the terminator sequence (default is 500).
+
+    Returns:
+        Tuple[str, str, str, str, str]: promoter, utr5, cds, utr3 and terminator sequences.
+    """
+    strand = coordinates["strand"]
+    region_start = coordinates["region_start"]
+    region_end = coordinates["region_end"]
+
+    def get_piece(start: int, end: int) -> str:
+        # Convert genomic coordinates to positions in the strand oriented sequence
+        if strand == 1:
+            return region_sequence[start - region_start : end - region_start + 1]
+        return region_sequence[region_end - end : region_end - start + 1]
+
+    utr5_sequence = "".join(get_piece(start, end) for start, end in coordinates["utr5"])
+    utr3_sequence = "".join(get_piece(start, end) for start, end in coordinates["utr3"])
+    cds_sequence = clean_fasta_sequence(
+        "".join(get_piece(start, end) for start, end in coordinates["cds"])
+    )
+
+    # Promoter and terminator are taken from the cleaned region, as in get_promoter_terminator
+    cleaned_region = clean_fasta_sequence(region_sequence)
+    promoter_sequence, terminator_sequence = slice_flanks(
+        cleaned_region,
+        *get_flank_lengths(
+            strand,
+            coordinates["start"],
+            coordinates["end"],
+            region_start,
+            region_end,
+            promoter_length,
+            terminator_length,
+        ),
+    )
+
+    return (
+        promoter_sequence,
+        utr5_sequence,
+        cds_sequence,
+        utr3_sequence,
+        terminator_sequence,
+    )
+
+
+def get_gene_row_single_lookup(gene_id: str, species_name: str) -> Optional[List[str]]:
+    """Retrieves the DNA components of one gene with one lookup and one sequence request.
+
+    The expanded gene lookup carries the coordinates of the transcript, exons, UTRs
+    and translation, so only the genomic region of the canonical transcript and its
+    flanks has to be fetched; every component is then sliced locally.
+
+    Args:
+        gene_id (str): Ensembl gene ID.
+        species_name (str): Species name, e.g. "homo_sapiens".
+
+    Returns:
+        Optional[List[str]]: Row of the CSV file (see CSV_HEADER), or None if the
+                             components of the gene could not be retrieved.
+    """
+    species = " ".join(species_name.split("_"))
+    print(f"Extracting data for gene ID : {gene_id}")
+
+    try:
+        gene_data = cached_request(
+            "lookup/id",
+            {"id": gene_id, "species": species, "expand": 1, "utr": 1},
+            lambda: ensembl_rest.lookup(
+                species=species, id=gene_id, params={"expand": True, "utr": True}
+            ),
+        )
+    except ensembl_rest.core.restclient.HTTPError as e:
+        print(f"Error with the request for {gene_id}: {e}")
+        return None
+
+    coordinates = derive_component_coordinates(gene_data)
+    if not coordinates:
+        return None
+
+    region = (
+        f"{coordinates['chromosome']}:{coordinates['region_start']}.."
+        f"{coordinates['region_end']}:{coordinates['strand']}"
+    )
+    try:
+        region_sequence = cached_request(
+            "sequence/region",
+            {"region": region, "species": species_name},
+            lambda: ensembl_rest.sequence_region(region=region, species=species_name)[
+                "seq"
+            ],
+        )
+    except ensembl_rest.core.restclient.HTTPError as e:
+        # e.g. the flanks reach past the end of the chromosome: use the per-component requests
+        print(f"Error with the region request for {gene_id}: {e}")
+        return get_gene_row(gene_id, species_name)
+
+    promoter, utr5, cds, utr3, terminator = slice_components(region_sequence, coordinates)
+    if cds == "":
+        return None
+
+    return [gene_id, coordinates["transcript_id"], promoter, utr5, cds, utr3, terminator]
+
+
+def open_csv_file(
+    filename: str, gene_id_list: GeneIdList, resume: bool = False, update: bool = False
+) -> Tuple[TextIO, Optional[ExtractionCheckpoint], List[str]]:
+    """Open the CSV file of a species, resuming an interrupted extraction if requested.
+
+    Args:
+        filename (str): Path to the CSV file.
+        gene_id_list (GeneIdList): Checked IDs of the genes to extract (see check_gene_ids).
+        resume (bool): Whether to keep a checkpoint journal next to the CSV file and
+                       continue from it if it exists. Otherwise, the journal of an
+                       earlier run is removed.
+        update (bool): Whether to append to an existing CSV file the genes it has no row
+                       for, e.g. after genes were added to the gene list. Genes without
+                       a row (e.g. without a CDS) are queried again.
+
+    Returns:
+        Tuple[TextIO, Optional[ExtractionCheckpoint], List[str]]: The open CSV file, its
+        checkpoint (None if resume is False), and the IDs of the genes left to extract,
+        in the order of the gene list.
+    """
+    checkpoint = ExtractionCheckpoint(filename) if resume else None
+
+    if checkpoint is not None and checkpoint.exists():
+        completed_gene_ids = checkpoint.resume()
+        csv_file = open(filename, "a", newline="", encoding="utf-8")
+        print(f"Resuming extraction, {len(completed_gene_ids)} genes already extracted.")
+        return (
+            csv_file,
+            checkpoint,
+            [
+                gene_id
+                for gene_id in gene_id_list.in_list_order()
+                if gene_id not in completed_gene_ids
+            ],
+        )
+
+    if update and os.path.exists(filename):
+        extracted_gene_ids = read_extracted_gene_ids(filename)
+        gene_id_list = gene_id_list.exclude(extracted_gene_ids)
+        csv_file = open(filename, "a", newline="", encoding="utf-8")
+        print(
+            f"Updating extraction, {len(extracted_gene_ids)} genes already extracted, "
+            f"{len(gene_id_list.gene_ids)} new genes."
+        )
+    else:
+        csv_file = open(filename, "w", newline="", encoding="utf-8")
+
+        # Write the header to the CSV file
+        csv.writer(csv_file).writerow(CSV_HEADER)
+
+    if checkpoint is not None:
+        checkpoint.start(csv_file)
+    else:
+        # A journal of an earlier run does not describe the rewritten or updated file
+        ExtractionCheckpoint(filename).remove()
+
+    return csv_file, checkpoint, gene_id_list.in_list_order()
+
+
+def get_data_as_csv(
+    file_paths: List[str],
+    output_directory: str,
+    fetch_mode: str = "sequential",
+    resume: bool = False,
+    update: bool = False,
+) -> None:
     """Retrieves data for gene IDs from Ensembl, processes it, and saves it as CSV files.
 
     Args:
         file_paths (List[str]): List of file paths containing gene IDs.
         output_directory (str): Directory where CSV files will be saved.
+        fetch_mode (str): "sequential" to query Ensembl gene by gene, "batched" to
+                          group genes and transcripts into Ensembl POST batch requests, or
+                          "single_lookup" to derive all components of a gene from one
+                          expanded lookup and one genomic region request.
+        resume (bool): Whether to checkpoint the extraction of each species and, after an
+                       interruption, append only the genes that are not extracted yet.
+        update (bool): Whether to append to existing CSV files only the genes they have no
+                       row for (see open_csv_file).
 
     Returns:
         None: This function does not return a value but outputs files to the specified directory.
     """
+    if fetch_mode not in FETCH_MODES:
+        raise ValueError(
+            f"Unknown fetch mode '{fetch_mode}'. Choose one of {', '.join(FETCH_MODES)}."
+        )
+
     # Create the directory if it doesn't exist
     os.makedirs(output_directory, exist_ok=True)
 
     for file_path in file_paths:
-        # Read gene IDs from the file
-        gene_ids = read_gene_ids_from_file(file_path)
-
         # Generate output filename and species name
-        filename = "ensembl_data_" + get_species_name(file_path) + ".csv"
-        species = " ".join(get_species_name(file_path).split("_"))
+        species_name = get_species_name(file_path)
+
+        # Read gene IDs from the file, dropping invalid and duplicate IDs
+        gene_id_list = check_gene_ids(
+            read_gene_ids_from_file(file_path), species_name, f"'{file_path}'"
+        )
+        filename = "ensembl_data_" + species_name + ".csv"
+        species = " ".join(species_name.split("_"))
 
         print(f"Starting data extraction for {species}.")
 
         # Initialize a CSV writer
         filename = os.path.join(output_directory, filename)
-        csv_file = open(filename, "w", newline="", encoding="utf-8")
+        csv_file, checkpoint, gene_ids = open_csv_file(filename, gene_id_list, resume, update)
         csv_writer = csv.writer(csv_file)
-
-        # Write the header to the CSV file
-        csv_writer.writerow(
-            [
-                "ensembl_gene_id",
-                "transcript_id",
-                "promoter",
-                "utr5",
-                "cds",
-                "utr3",
-                "terminator",
-            ]
-        )
-
-        # Loop through each gene ID and retrieve the data
-        for gene_id in gene_ids:
-            time.sleep(2)
-            print(f"Extracting data for gene ID : {gene_id}")
-
-            try:
-                gene_data = ensembl_rest.lookup(species=species, id=gene_id)
-
-            except ensembl_rest.core.restclient.HTTPError as e:
-                if e.response.status_code == 429:  # Check for rate limit exceeded error
-                    print("Rate limit exceeded. Waiting before retrying...")
-                    time.sleep(1)
-                    gene_data = ensembl_rest.lookup(species=species, id=gene_id)
-
-            # Get transcript ID
-            transcript_id = gene_data["canonical_transcript"].split(".")[0]
-
-            # Retrieve promoter, CDS, and terminator sequences
-            cds_sequence = get_cds(transcript_id)
-            if cds_sequence == "":
-                continue
-            promoter_sequence, terminator_sequence = get_promoter_terminator(
-                transcript_id
-            )
-
-            # Retrieve UTR sequences
-            transcript_data = request_with_retry(transcript_id)
-            if transcript_data == {}:
-                continue
-
-            utr5_coord_list, utr3_coord_list, chromosome, strand = (
-                extract_utr_information(transcript_data)
-            )
-            utr5_sequence = get_full_utr_sequence(
-                utr5_coord_list, chromosome, strand, species=get_species_name(file_path)
-            )
-            utr3_sequence = get_full_utr_sequence(
-                utr3_coord_list, chromosome, strand, species=get_species_name(file_path)
+        missed_gene_ids: List[str] = []
+
+        if fetch_mode == "batched":
+            # Retrieve the data for up to LOOKUP_POST_MAX_IDS genes at a time
+            for gene_id_batch in split_into_batches(gene_ids, LOOKUP_POST_MAX_IDS):
+                print(f"Extracting data for {len(gene_id_batch)} genes.")
+                csv_writer.writerows(get_rows_batched(gene_id_batch, species_name))
+                if checkpoint is not None:
+                    checkpoint.record(gene_id_batch, csv_file)
+        else:
+            get_row = (
+                get_gene_row_single_lookup
+                if fetch_mode == "single_lookup"
+                else get_gene_row
             )
 
-            # Write the row to the CSV file
-            csv_writer.writerow(
-                [
-                    gene_id,
-                    transcript_id,
-                    promoter_sequence,
-                    utr5_sequence,
-                    cds_sequence,
-                    utr3_sequence,
-                    terminator_sequence,
-                ]
-            )
+            # Loop through each gene ID and retrieve the data (the requests are spaced
+            # by the shared rate limiter)
+            for gene_id in gene_ids:
+                try:
+                    row = get_row(gene_id, species_name)
+                except CacheMissError as e:
+                    # Genes missing from the cache are not checkpointed, so they are
+                    # fetched when the extraction is resumed online
+                    print(e)
+                    missed_gene_ids.append(gene_id)
+                    continue
+
+                # Write the row to the CSV file
+                if row is not None:
+                    csv_writer.writerow(row)
+                if checkpoint is not None:
+                    checkpoint.record([gene_id], csv_file)
 
         # Close the CSV file
         csv_file.close()
+        if checkpoint is not None and not missed_gene_ids:
+            checkpoint.remove()
 
         print(f"Data extraction for {species} is now complete.")
 
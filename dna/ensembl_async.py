@@ -0,0 +1,223 @@
+import os
+import csv
+import asyncio
+from collections import deque
+from typing import Optional, List, Callable, Any, Deque, Tuple
+import ensembl_rest
+from dna import ensembl_api
+from dna.ensembl_cache import CacheMissError
+from dna.gene_id_loader import check_gene_ids
+
+
+async def call_ensembl(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking Ensembl request in a worker thread.
+
+    The requests are spaced by the shared rate limiter of ensembl_api (see
+    ensembl_api.cached_request), which also retries rate limit errors, so the worker
+    threads of all species together run at the rate allowed by Ensembl.
+
+    Args:
+        function (Callable): Blocking function performing Ensembl requests through
+                             ensembl_api.cached_request.
+        *args: Positional arguments passed to the function.
+        **kwargs: Keyword arguments passed to the function.
+
+    Returns:
+        Any: The value returned by the function.
+    """
+    return await asyncio.to_thread(function, *args, **kwargs)
+
+
+async def fetch_gene_row(gene_id: str, species_name: str) -> Optional[List[str]]:
+    """Retrieve the DNA components of one gene from Ensembl.
+
+    Args:
+        gene_id (str): Ensembl gene ID.
+        species_name (str): Species name, e.g. "homo_sapiens".
+
+    Returns:
+        Optional[List[str]]: Row of the CSV file (see ensembl_api.CSV_HEADER),
+        or None if the components of the gene could not be retrieved.
+    """
+    species = " ".join(species_name.split("_"))
+    print(f"Extracting data for gene ID : {gene_id}")
+
+    try:
+        gene_data = await call_ensembl(ensembl_api.lookup_gene, gene_id, species)
+    except ensembl_rest.core.restclient.HTTPError as e:
+        print(f"Error with the request for {gene_id}: {e}")
+        return None
+
+    # Get transcript ID
+    transcript_id = gene_data["canonical_transcript"].split(".")[0]
+
+    # Retrieve promoter, CDS, and terminator sequences
+    cds_sequence = await call_ensembl(ensembl_api.get_cds, transcript_id)
+    if cds_sequence == "":
+        return None
+    promoter_sequence, terminator_sequence = await call_ensembl(
+        ensembl_api.get_promoter_terminator, transcript_id, species=species_name
+    )
+
+    # Retrieve UTR sequences
+    transcript_data = await call_ensembl(ensembl_api.request_with_retry, transcript_id)
+    if transcript_data == {}:
+        return None
+
+    utr5_coord_list, utr3_coord_list, chromosome, strand = (
+        ensembl_api.extract_utr_information(transcript_data)
+    )
+    try:
+        utr5_parts = await asyncio.gather(
+            *[
+                call_ensembl(
+                    ensembl_api.get_utr_sequence,
+                    chromosome,
+                    strand,
+                    start,
+                    end,
+                    species_name,
+                )
+                for start, end in utr5_coord_list
+            ]
+        )
+        utr3_parts = await asyncio.gather(
+            *[
+                call_ensembl(
+                    ensembl_api.get_utr_sequence,
+                    chromosome,
+                    strand,
+                    start,
+                    end,
+                    species_name,
+                )
+                for start, end in utr3_coord_list
+            ]
+        )
+    except ensembl_rest.core.restclient.HTTPError as e:
+        print(f"Error with the UTR requests for {transcript_id}: {e}")
+        return None
+
+    return [
+        gene_id,
+        transcript_id,
+        promoter_sequence,
+        "".join(utr5_parts),
+        cds_sequence,
+        "".join(utr3_parts),
+        terminator_sequence,
+    ]
+
+
+async def write_species_csv(
+    file_path: str,
+    output_directory: str,
+    max_in_flight: int,
+    resume: bool = False,
+    update: bool = False,
+) -> None:
+    """Fetch the DNA components of all genes of one species concurrently.
+
+    Rows are written in the order of the gene list, so the CSV file is the same
+    as the one produced by ensembl_api.get_data_as_csv. Genes are only scheduled up to
+    2 * max_in_flight genes ahead of the last written row, so the rows waiting for a
+    slow gene to be written stay bounded.
+
+    Args:
+        file_path (str): Path to the file containing the gene IDs of the species.
+        output_directory (str): Directory where the CSV file will be saved.
+        max_in_flight (int): Maximum number of genes fetched at the same time.
+        resume (bool): Whether to checkpoint the extraction and continue an interrupted one.
+        update (bool): Whether to append to an existing CSV file only the genes it has no row for.
+
+    Returns:
+        None: This function does not return a value but outputs a file to the specified directory.
+    """
+    species_name = ensembl_api.get_species_name(file_path)
+    gene_id_list = check_gene_ids(
+        ensembl_api.read_gene_ids_from_file(file_path), species_name, f"'{file_path}'"
+    )
+    print(f"Starting data extraction for {' '.join(species_name.split('_'))}.")
+
+    filename = os.path.join(output_directory, f"ensembl_data_{species_name}.csv")
+    csv_file, checkpoint, gene_ids = ensembl_api.open_csv_file(
+        filename, gene_id_list, resume, update
+    )
+
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def fetch_with_limit(gene_id: str) -> Optional[List[str]]:
+        async with semaphore:
+            return await fetch_gene_row(gene_id, species_name)
+
+    # Genes scheduled and not written yet, in gene list order; the semaphore bounds
+    # how many of them are in flight
+    pending: Deque[Tuple[str, asyncio.Task]] = deque()
+    window = 2 * max_in_flight
+    missed_gene_ids: List[str] = []
+
+    with csv_file:
+        csv_writer = csv.writer(csv_file)
+
+        async def write_next_row() -> None:
+            gene_id, task = pending.popleft()
+            try:
+                row = await task
+            except CacheMissError as e:
+                # Genes missing from the cache are not checkpointed, so they are fetched
+                # when the extraction is resumed online
+                print(e)
+                missed_gene_ids.append(gene_id)
+                return
+            if row is not None:
+                csv_writer.writerow(row)
+            if checkpoint is not None:
+                checkpoint.record([gene_id], csv_file)
+
+        # Write rows in gene list order as soon as they are available
+        for gene_id in gene_ids:
+            pending.append((gene_id, asyncio.create_task(fetch_with_limit(gene_id))))
+            if len(pending) >= window:
+                await write_next_row()
+        while pending:
+            await write_next_row()
+    if checkpoint is not None and not missed_gene_ids:
+        checkpoint.remove()
+
+    print(f"Data extraction for {' '.join(species_name.split('_'))} is now complete.")
+
+
+def get_data_as_csv_async(
+    file_paths: List[str],
+    output_directory: str,
+    max_in_flight: int = 10,
+    resume: bool = False,
+    update: bool = False,
+) -> None:
+    """Retrieve data for gene IDs from Ensembl concurrently and save it as CSV files.
+
+    All species are processed at the same time and share the rate limiter of ensembl_api,
+    so the throughput is bounded by the Ensembl rate limit rather than by latency.
+
+    Args:
+        file_paths (List[str]): List of file paths containing gene IDs.
+        output_directory (str): Directory where CSV files will be saved.
+        max_in_flight (int): Maximum number of genes fetched at the same time per species.
+        resume (bool): Whether to checkpoint the extraction and continue interrupted ones.
+        update (bool): Whether to append to existing CSV files only the genes they have no row for.
+
+    Returns:
+        None: This function does not return a value but outputs files to the specified directory.
+    """
+    # Create the directory if it doesn't exist
+    os.makedirs(output_directory, exist_ok=True)
+
+    async def run_all_species() -> None:
+        await asyncio.gather(
+            *[
+                write_species_csv(file_path, output_directory, max_in_flight, resume, update)
+                for file_path in file_paths
+            ]
+        )
+
+    asyncio.run(run_all_species())
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Optional, Dict, Any
+import ensembl_rest
+import requests
+
+# Default maximum size of the cached responses (10 GB)
+DEFAULT_MAX_SIZE_BYTES = 10 * 1024**3
+
+# Number of cache hits whose access times are buffered before being written at once
+ACCESS_FLUSH_COUNT = 1000
+
+
+class CacheMissError(requests.exceptions.RequestException):
+    """Raised in offline mode when a response is not in the cache.
+
+    Subclass of RequestException, so callers handle it like a failed request.
+    """
+
+
+class ResponseCache:
+    """Persistent SQLite cache of Ensembl REST API responses.
+
+    Responses are keyed by a hash of the Ensembl release, the endpoint and the request
+    parameters. When the cache grows past its maximum size, the least recently used
+    responses are evicted. In offline mode, only cached responses are served.
+
+    The access times of the cache hits are buffered in memory and written in batches
+    (see flush_access_times), so that reading cached responses does not write to the
+    database for every request.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+        release: Optional[str] = None,
+        offline: bool = False,
+    ):
+        """Open (or create) the cache database.
+
+        Args:
+            path (str): Path to the SQLite database file.
+            max_size_bytes (int): Maximum total size of the cached responses.
+            release (Optional[str]): Ensembl release the responses belong to. If None, the
+                                     current release is queried from Ensembl (or, in offline
+                                     mode, the release of the last online run is used).
+            offline (bool): Whether to serve only cached responses.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        # Last access time of the responses read since the last flush, by key
+        self.access_times: Dict[str, float] = {}
+
+        # The cache is shared by the worker threads of the asyncio fetch engine
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self.total_size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+        self.release = release if release is not None else self.get_release()
+
+    def get_release(self) -> str:
+        """Get the Ensembl release used to key the cached responses.
+
+        Returns:
+            str: The current Ensembl release, or the release stored by the last online run.
+        """
+        row = self.connection.execute(
+            "SELECT value FROM metadata WHERE name = 'release'"
+        ).fetchone()
+        if self.offline:
+            return row[0] if row else ""
+
+        try:
+            release = str(ensembl_rest.data()["releases"][0])
+        except (ensembl_rest.core.restclient.HTTPError, requests.exceptions.RequestException) as e:
+            print(f"Error with the Ensembl release request: {e}")
+            return row[0] if row else ""
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO metadata (name, value) VALUES ('release', ?)",
+                (release,),
+            )
+        return release
+
+    def make_key(self, endpoint: str, params: Dict) -> str:
+        """Build the content address of a request.
+
+        Args:
+            endpoint (str): Ensembl REST endpoint, e.g. "sequence/id".
+            params (Dict): Parameters of the request.
+
+        Returns:
+            str: SHA-256 hash of the release, endpoint and parameters.
+        """
+        request = json.dumps([self.release, endpoint, params], sort_keys=True)
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, endpoint: str, params: Dict) -> Optional[Any]:
+        """Get a cached response.
+
+        Args:
+            endpoint (str): Ensembl REST endpoint.
+            params (Dict): Parameters of the request.
+
+        Returns:
+            Optional[Any]: The cached response, or None if the request is not cached.
+        """
+        key = self.make_key(endpoint, params)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.access_times[key] = time.time()
+            if len(self.access_times) >= ACCESS_FLUSH_COUNT:
+                with self.connection:
+                    self.flush_access_times()
+        return json.loads(row[0])
+
+    def flush_access_times(self) -> None:
+        """Write the buffered access times of the cache hits to the database.
+
+        Must be called with the lock held, within a transaction.
+        """
+        if self.access_times:
+            self.connection.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(access_time, key) for key, access_time in self.access_times.items()],
+            )
+            self.access_times.clear()
+
+    def set(self, endpoint: str, params: Dict, value: Any) -> None:
+        """Store a response and evict the least recently used ones if the cache is full.
+
+        Args:
+            endpoint (str): Ensembl REST endpoint.
+            params (Dict): Parameters of the request.
+            value (Any): JSON serialisable response.
+        """
+        key = self.make_key(endpoint, params)
+        serialised_value = json.dumps(value)
+        size = len(serialised_value)
+
+        with self.lock, self.connection:
+            # Evict by the latest access times
+            self.flush_access_times()
+            row = self.connection.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.total_size -= row[0]
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, serialised_value, size, time.time()),
+            )
+            self.total_size += size
+
+            # Evict the least recently used responses
+            while self.total_size > self.max_size_bytes:
+                oldest = self.connection.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access LIMIT 100"
+                ).fetchall()
+                if not oldest:
+                    self.total_size = 0
+                    break
+                for oldest_key, oldest_size in oldest:
+                    self.connection.execute(
+                        "DELETE FROM responses WHERE key = ?", (oldest_key,)
+                    )
+                    self.total_size -= oldest_size
+                    if self.total_size <= self.max_size_bytes:
+                        break
+
+    def close(self) -> None:
+        """Write the buffered access times and close the cache database."""
+        with self.lock:
+            with self.connection:
+                self.flush_access_times()
+            self.connection.close()
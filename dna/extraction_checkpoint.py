@@ -0,0 +1,89 @@
+import os
+from typing import List, Set, TextIO
+
+
+class ExtractionCheckpoint:
+    """Sidecar journal of the genes already extracted to a DNA components CSV file.
+
+    Each journal line holds a gene ID and the size of the CSV file once the gene was
+    processed. On restart, the CSV file is truncated to the last journaled size, so rows
+    written after the last checkpoint are dropped and the resumed file is identical to
+    the one of an uninterrupted run.
+
+    The journal is removed once the extraction is complete, or when the CSV file is
+    written again without checkpoints, so that it never describes another file.
+    """
+
+    def __init__(self, csv_path: str):
+        """Create the checkpoint of a CSV file.
+
+        Args:
+            csv_path (str): Path to the DNA components CSV file.
+        """
+        self.csv_path = csv_path
+        self.journal_path = csv_path + ".journal"
+
+    def exists(self) -> bool:
+        """Check whether an extraction to the CSV file can be resumed.
+
+        Returns:
+            bool: True if both the CSV file and its journal exist.
+        """
+        return os.path.exists(self.journal_path) and os.path.exists(self.csv_path)
+
+    def resume(self) -> Set[str]:
+        """Read the journal and truncate the CSV file to the last checkpoint.
+
+        Returns:
+            Set[str]: IDs of the genes already processed.
+        """
+        completed_gene_ids = set()
+        csv_size = None
+
+        with open(self.journal_path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                # Skip a partially written last line
+                if not line.endswith("\n"):
+                    break
+                gene_id, _, size = line.rstrip("\n").partition("\t")
+                if not size.isdigit():
+                    break
+                if gene_id:
+                    completed_gene_ids.add(gene_id)
+                csv_size = int(size)
+
+        if csv_size is not None:
+            with open(self.csv_path, "r+b") as csv_file:
+                csv_file.truncate(csv_size)
+
+        return completed_gene_ids
+
+    def start(self, csv_file: TextIO) -> None:
+        """Start a new journal once the CSV header has been written.
+
+        Args:
+            csv_file (TextIO): The CSV file being written.
+        """
+        with open(self.journal_path, "w", encoding="utf-8"):
+            pass
+        self.record([""], csv_file)
+
+    def record(self, gene_ids: List[str], csv_file: TextIO) -> None:
+        """Record processed genes once their rows are safely written to the CSV file.
+
+        Args:
+            gene_ids (List[str]): IDs of the genes processed since the last checkpoint.
+            csv_file (TextIO): The CSV file being written.
+        """
+        # Make sure the rows are on disk before they are marked as completed
+        csv_file.flush()
+        os.fsync(csv_file.fileno())
+        csv_size = os.path.getsize(self.csv_path)
+
+        with open(self.journal_path, "a", encoding="utf-8") as journal:
+            journal.writelines(f"{gene_id}\t{csv_size}\n" for gene_id in gene_ids)
+
+    def remove(self) -> None:
+        """Remove the journal, e.g. once all the genes are extracted."""
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
@@ -0,0 +1,199 @@
+import os
+import gzip
+import mmap
+import shutil
+from typing import Dict, NamedTuple
+
+# Upper case and reverse complement translation tables (IUPAC nucleotide codes)
+UPPER_CASE = bytes.maketrans(b"acgtnrykmswbdhv", b"ACGTNRYKMSWBDHV")
+COMPLEMENT = bytes.maketrans(
+    b"ACGTNRYKMSWBDHVacgtnrykmswbdhv", b"TGCANYRMKSWVHDBTGCANYRMKSWVHDB"
+)
+
+
+class FastaIndexEntry(NamedTuple):
+    """One line of a faidx (.fai) index."""
+
+    length: int  # Number of bases of the sequence
+    offset: int  # Byte offset of the first base in the FASTA file
+    line_bases: int  # Number of bases per line
+    line_width: int  # Number of bytes per line, including the line break
+
+
+def build_fasta_index(fasta_path: str, index_path: str) -> None:
+    """Builds a samtools faidx compatible index of an uncompressed FASTA file.
+
+    Args:
+        fasta_path (str): Path to the FASTA file.
+        index_path (str): Path to the .fai index file to write.
+
+    Raises:
+        ValueError: If the lines of a sequence do not all have the same length
+                    (except the last one), which prevents random access.
+    """
+    entries = []
+    name = None
+    offset = 0
+
+    with open(fasta_path, "rb") as file:
+        for line in file:
+            if line.startswith(b">"):
+                if name is not None:
+                    entries.append((name, length, sequence_offset, line_bases, line_width))
+                name = line[1:].split()[0].decode("utf-8")
+                sequence_offset = offset + len(line)
+                length = 0
+                line_bases = line_width = 0
+                last_line_seen = False
+            elif name is not None:
+                bases = len(line.rstrip(b"\r\n"))
+                if (last_line_seen and bases) or (line_bases and bases > line_bases):
+                    raise ValueError(
+                        f"Different line length in sequence '{name}' of {fasta_path}."
+                    )
+                if line_bases == 0:
+                    line_bases, line_width = bases, len(line)
+                elif bases != line_bases:
+                    last_line_seen = True
+                length += bases
+            offset += len(line)
+
+    if name is not None:
+        entries.append((name, length, sequence_offset, line_bases, line_width))
+
+    with open(index_path, "w", encoding="utf-8") as index_file:
+        for entry in entries:
+            index_file.write("\t".join(str(value) for value in entry) + "\n")
+
+
+def read_fasta_index(index_path: str) -> Dict[str, FastaIndexEntry]:
+    """Reads a faidx (.fai) index.
+
+    Args:
+        index_path (str): Path to the .fai index file.
+
+    Returns:
+        Dict[str, FastaIndexEntry]: Index entries keyed by sequence name.
+    """
+    index = {}
+    with open(index_path, "r", encoding="utf-8") as index_file:
+        for line in index_file:
+            columns = line.rstrip("\n").split("\t")
+            index[columns[0]] = FastaIndexEntry(*(int(value) for value in columns[1:5]))
+    return index
+
+
+def decompress_fasta(fasta_path: str) -> str:
+    """Decompresses a gzipped FASTA file next to it, once, so it can be memory-mapped.
+
+    Args:
+        fasta_path (str): Path to the (optionally gzipped) FASTA file.
+
+    Returns:
+        str: Path to the uncompressed FASTA file.
+    """
+    if not fasta_path.endswith(".gz"):
+        return fasta_path
+
+    uncompressed_path = fasta_path[:-3]
+    if not os.path.exists(uncompressed_path):
+        print(f"Decompressing {fasta_path}.")
+        with gzip.open(fasta_path, "rb") as compressed_file, open(
+            uncompressed_path + ".tmp", "wb"
+        ) as uncompressed_file:
+            shutil.copyfileobj(compressed_file, uncompressed_file, 16 * 1024**2)
+        os.replace(uncompressed_path + ".tmp", uncompressed_path)
+
+    return uncompressed_path
+
+
+class IndexedFasta:
+    """Random access to the sequences of a FASTA file through its faidx index.
+
+    The FASTA file is memory-mapped, so a region is read with one slice of the mapped
+    file and only the pages it spans are loaded from disk.
+    """
+
+    def __init__(self, fasta_path: str):
+        """Open a FASTA file, decompressing and indexing it first if needed.
+
+        Args:
+            fasta_path (str): Path to the (optionally gzipped) FASTA file. The index is
+                              stored next to the uncompressed file, with a .fai extension.
+        """
+        self.fasta_path = decompress_fasta(fasta_path)
+        self.index_path = self.fasta_path + ".fai"
+
+        # (Re)build the index if it is missing or older than the FASTA file
+        if not os.path.exists(self.index_path) or os.path.getmtime(
+            self.index_path
+        ) < os.path.getmtime(self.fasta_path):
+            build_fasta_index(self.fasta_path, self.index_path)
+        self.index = read_fasta_index(self.index_path)
+
+        with open(self.fasta_path, "rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get_length(self, name: str) -> int:
+        """Gets the length of a sequence.
+
+        Args:
+            name (str): Sequence name, e.g. a chromosome.
+
+        Returns:
+            int: Number of bases of the sequence.
+        """
+        return self.index[name].length
+
+    def fetch(self, name: str, start: int, end: int, strand: int = 1) -> str:
+        """Gets the sequence of a region, like the Ensembl sequence/region endpoint.
+
+        Args:
+            name (str): Sequence name, e.g. a chromosome.
+            start (int): Start position of the region (1-based, inclusive).
+            end (int): End position of the region (1-based, inclusive), clipped to the
+                       length of the sequence.
+            strand (int): 1 for the forward strand, -1 for the reverse complement.
+
+        Returns:
+            str: Upper case sequence of the region on the given strand.
+        """
+        entry = self.index[name]
+        start = max(start, 1) - 1
+        end = min(end, entry.length)
+        if start >= end:
+            return ""
+
+        def byte_offset(position: int) -> int:
+            # Byte offset of a 0-based position, skipping the line breaks before it
+            line, column = divmod(position, entry.line_bases)
+            return entry.offset + line * entry.line_width + column
+
+        sequence = self.mmap[byte_offset(start) : byte_offset(end - 1) + 1]
+        if entry.line_width != entry.line_bases:
+            sequence = sequence.replace(b"\n", b"").replace(b"\r", b"")
+
+        if strand == -1:
+            return sequence.translate(COMPLEMENT)[::-1].decode("ascii")
+        return sequence.translate(UPPER_CASE).decode("ascii")
+
+    def fetch_region(self, region: str) -> str:
+        """Gets the sequence of a region given in the Ensembl format.
+
+        Args:
+            region (str): Region, e.g. "1:1000..2000:-1" (the strand defaults to 1).
+
+        Returns:
+            str: Upper case sequence of the region on the given strand.
+        """
+        name, _, coordinates = region.rpartition(":")
+        strand = 1
+        if ".." not in coordinates:
+            strand = int(coordinates)
+            name, _, coordinates = name.rpartition(":")
+        start, end = coordinates.split("..")
+        return self.fetch(name, int(start), int(end), strand)
+
+    def close(self) -> None:
+        """Close the memory-mapped FASTA file."""
+        self.mmap.close()
@@ -0,0 +1,75 @@
+import os
+import json
+import hashlib
+from typing import List, Tuple
+
+
+def hash_row(sequence_values: List[str]) -> str:
+    """Hash the gene ID, transcript ID and sequences of a row of a DNA components table.
+
+    Args:
+        sequence_values (List[str]): Values of the row in the sequence columns
+                                     (ensembl_gene_id, transcript_id, promoter, utr5, cds,
+                                     utr3, terminator).
+
+    Returns:
+        str: Hexadecimal digest identifying the row.
+    """
+    return hashlib.blake2b(
+        "\0".join(sequence_values).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+class FeatureManifest:
+    """Sidecar manifest of the features computed in a DNA feature table.
+
+    The manifest holds the names of the feature columns and the hashes of the rows (see
+    hash_row) whose features were computed when the table was last written. Incremental
+    extractions reuse the values of these features for these rows, and only compute the
+    features of new rows and the features missing from the manifest.
+    """
+
+    def __init__(self, table_path: str):
+        """Create the manifest of a feature table.
+
+        Args:
+            table_path (str): Path to the CSV or Parquet feature table.
+        """
+        self.table_path = table_path
+        self.manifest_path = table_path + ".features.json"
+
+    def exists(self) -> bool:
+        """Check whether the features of the table can be reused.
+
+        Returns:
+            bool: True if both the table and its manifest exist.
+        """
+        return os.path.exists(self.manifest_path) and os.path.exists(self.table_path)
+
+    def load(self) -> Tuple[List[str], List[str]]:
+        """Read the manifest.
+
+        Returns:
+            Tuple[List[str], List[str]]: Names of the computed features and hashes of the rows
+                                         they were computed for, in the order of the rows of
+                                         the table (both empty if the table or its manifest
+                                         is missing).
+        """
+        if not self.exists():
+            return [], []
+
+        with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        return manifest["features"], manifest["rows"]
+
+    def save(self, features: List[str], row_hashes: List[str]) -> None:
+        """Record the features computed for the rows of the table once it is written.
+
+        Args:
+            features (List[str]): Names of the computed features.
+            row_hashes (List[str]): Hashes of the rows of the table.
+        """
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump({"features": features, "rows": row_hashes}, manifest_file)
+        os.replace(temp_path, self.manifest_path)
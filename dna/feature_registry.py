@@ -0,0 +1,194 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import pyarrow as pa
+
+
+class Feature(NamedTuple):
+    """A feature computed from the columns of a DNA components table."""
+
+    # Name of the feature
+    name: str
+    # Columns of the DNA components table the feature is computed from
+    input_columns: Tuple[str, ...]
+    # Columns computed by the feature and their types in Parquet feature tables
+    output_schema: pa.Schema
+    # Vectorized implementation, computing the output columns of a whole batch of genes
+    compute: Callable[["FeatureBatch"], Dict[str, List]]
+
+
+class FeatureBatch:
+    """Input columns of a batch of genes and the intermediate results shared by its features.
+
+    Features get intermediate results (e.g. encoded sequences or nucleotide counts) with
+    shared, so each intermediate result is computed once per batch however many features
+    use it.
+    """
+
+    def __init__(self, columns: Dict[str, List[str]]):
+        """Create a batch from the values of its input columns.
+
+        Args:
+            columns (Dict[str, List[str]]): Values of each input column, keyed by column name.
+        """
+        self.columns = columns
+        self.intermediates: Dict[str, Any] = {}
+
+    def __getitem__(self, column: str) -> List[str]:
+        return self.columns[column]
+
+    def shared(self, key: str, compute: Callable[["FeatureBatch"], Any]) -> Any:
+        """Get an intermediate result, computing it on first use.
+
+        Args:
+            key (str): Name of the intermediate result.
+            compute (Callable[[FeatureBatch], Any]): Function computing it from the batch.
+
+        Returns:
+            Any: The intermediate result.
+        """
+        if key not in self.intermediates:
+            self.intermediates[key] = compute(self)
+        return self.intermediates[key]
+
+
+class FeatureRegistry:
+    """Registry of the features of DNA feature tables.
+
+    Feature columns are ordered as the features were registered. A batch of genes is
+    computed with a plan of the features producing the requested columns: only their input
+    columns are read, and all of them run on one FeatureBatch, sharing its intermediate
+    results.
+    """
+
+    def __init__(self):
+        """Create an empty registry."""
+        self.features: Dict[str, Feature] = {}
+        self.column_features: Dict[str, Feature] = {}
+
+    def register(
+        self, name: str, input_columns: List[str], output_schema: pa.Schema
+    ) -> Callable:
+        """Decorator registering the batch implementation of a feature.
+
+        Args:
+            name (str): Name of the feature.
+            input_columns (List[str]): Columns of the DNA components table it is computed from.
+            output_schema (pa.Schema): Columns it computes and their types.
+
+        Returns:
+            Callable: Decorator of a function computing a dictionary of output column values
+                      from a FeatureBatch, which is returned unchanged.
+
+        Raises:
+            ValueError: If the feature or one of its output columns is already registered.
+        """
+
+        def decorator(compute: Callable[[FeatureBatch], Dict[str, List]]) -> Callable:
+            if name in self.features:
+                raise ValueError(f"Feature {name} is already registered.")
+            for column in output_schema.names:
+                if column in self.column_features:
+                    raise ValueError(
+                        f"Column {column} is already computed by feature "
+                        f"{self.column_features[column].name}."
+                    )
+
+            feature = Feature(name, tuple(input_columns), output_schema, compute)
+            self.features[name] = feature
+            for column in output_schema.names:
+                self.column_features[column] = feature
+            return compute
+
+        return decorator
+
+    def output_columns(self) -> List[str]:
+        """Get the columns of all registered features.
+
+        Returns:
+            List[str]: Names of the feature columns, in registration order.
+        """
+        return list(self.column_features)
+
+    def output_schema(self) -> pa.Schema:
+        """Get the schema of the columns of all registered features.
+
+        Returns:
+            pa.Schema: Feature columns with their types, in registration order.
+        """
+        return pa.schema(
+            [field for feature in self.features.values() for field in feature.output_schema]
+        )
+
+    def plan(self, columns: List[str]) -> List[Feature]:
+        """Find the features to compute to get some feature columns.
+
+        Args:
+            columns (List[str]): Requested feature columns.
+
+        Returns:
+            List[Feature]: Features producing the columns, each once, in registration order.
+
+        Raises:
+            KeyError: If a column is not computed by any registered feature.
+        """
+        for column in columns:
+            if column not in self.column_features:
+                raise KeyError(f"No registered feature computes column {column}.")
+
+        planned_names = {self.column_features[column].name for column in columns}
+        return [feature for name, feature in self.features.items() if name in planned_names]
+
+    def input_columns(self, columns: List[str]) -> List[str]:
+        """Find the input columns needed to compute some feature columns.
+
+        Args:
+            columns (List[str]): Requested feature columns.
+
+        Returns:
+            List[str]: Input columns of the planned features.
+        """
+        input_columns: List[str] = []
+        for feature in self.plan(columns):
+            input_columns += [c for c in feature.input_columns if c not in input_columns]
+        return input_columns
+
+    def compute(
+        self, input_columns: Dict[str, List[str]], columns: Optional[List[str]] = None
+    ) -> Dict[str, List]:
+        """Compute feature columns for a batch of genes.
+
+        Args:
+            input_columns (Dict[str, List[str]]): Values of the input columns of the batch.
+            columns (Optional[List[str]]): Feature columns to compute, all by default.
+
+        Returns:
+            Dict[str, List]: Values of each requested column, in the requested order.
+        """
+        if columns is None:
+            columns = self.output_columns()
+
+        # Only the input columns of the planned features are read
+        batch = FeatureBatch(
+            {column: input_columns[column] for column in self.input_columns(columns)}
+        )
+        return self.compute_batch(batch, columns)
+
+    def compute_batch(
+        self, batch: FeatureBatch, columns: Optional[List[str]] = None
+    ) -> Dict[str, List]:
+        """Compute feature columns for a batch of genes holding the inputs of their features.
+
+        Args:
+            batch (FeatureBatch): Batch of genes, e.g. a batch of packed sequences.
+            columns (Optional[List[str]]): Feature columns to compute, all by default.
+
+        Returns:
+            Dict[str, List]: Values of each requested column, in the requested order.
+        """
+        if columns is None:
+            columns = self.output_columns()
+
+        values: Dict[str, List] = {}
+        for feature in self.plan(columns):
+            values.update(feature.compute(batch))
+
+        return {column: values[column] for column in columns}
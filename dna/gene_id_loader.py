@@ -0,0 +1,135 @@
+import os
+import re
+import csv
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+
+# Formats of the gene IDs of the gene lists, by species name
+GENE_ID_PATTERNS: Dict[str, str] = {
+    "homo_sapiens": r"ENSG\d{11}",
+    "chlamydomonas_reinhardtii": r"CHLRE_\d+g\d+v\d+|ENSRNA\d+",
+    "cyanidioschyzon_merolae": r"CM[A-Z]\d+[A-Z]",
+    "galdieria_sulphuraria": r"Gasu_(nc)?\d+|EBG\d+",
+    # Systematic ORF names, tRNA genes and other non-coding RNA genes
+    "saccharomyces_cerevisiae": r"Y[A-P][LR]\d{3}[WC](-[A-Z])?|t[A-Z]\([ACGUX]{3}\)[A-Z]\d*"
+    r"|Q\d{4}|[A-Za-z]{2,4}\d+[A-Za-z]?(-[A-Z0-9]+)?",
+}
+
+# Format of the gene IDs of species without a pattern in GENE_ID_PATTERNS
+DEFAULT_GENE_ID_PATTERN = r"\S+"
+
+# Number of rejected gene IDs shown in the warnings of check_gene_ids
+SHOWN_GENE_ID_COUNT = 5
+
+
+class GeneIdList(NamedTuple):
+    """Gene IDs of a gene list, checked and deduplicated."""
+
+    # Valid gene IDs, sorted and without duplicates
+    gene_ids: np.ndarray
+    # Position in the gene list of the first occurrence of each gene ID
+    list_positions: np.ndarray
+    # Number of duplicates of valid gene IDs dropped from the list
+    duplicate_count: int
+    # Gene IDs not matching the format of the species, in the order of the list
+    invalid_ids: List[str]
+
+    def exclude(self, gene_ids: np.ndarray) -> "GeneIdList":
+        """Drop gene IDs from the list, e.g. the IDs of the genes already extracted.
+
+        Args:
+            gene_ids (np.ndarray): Sorted gene IDs without duplicates (see
+                                   read_extracted_gene_ids).
+
+        Returns:
+            GeneIdList: The list without the gene IDs.
+        """
+        kept = ~np.isin(self.gene_ids, gene_ids, assume_unique=True)
+        return self._replace(gene_ids=self.gene_ids[kept], list_positions=self.list_positions[kept])
+
+    def in_list_order(self) -> List[str]:
+        """Get the gene IDs in the order of the gene list.
+
+        Returns:
+            List[str]: The gene IDs, ordered as their first occurrence in the gene list.
+        """
+        return self.gene_ids[np.argsort(self.list_positions)].tolist()
+
+
+def check_gene_ids(
+    gene_ids: Sequence[str], species_name: Optional[str] = None, source: str = "gene list"
+) -> GeneIdList:
+    """Check the gene IDs of a gene list against the format of the species and deduplicate them.
+
+    Blank IDs, IDs not matching the format of the species (see GENE_ID_PATTERNS) and
+    duplicates are dropped, so that each gene is fetched once, and warnings are printed.
+
+    Args:
+        gene_ids (Sequence[str]): Gene IDs of the list, e.g. from read_gene_ids_from_file.
+        species_name (Optional[str]): Name of the species, e.g. "homo_sapiens". Gene IDs
+                                      of species without a pattern are not checked.
+        source (str): Name of the gene list in the warnings, e.g. its file path.
+
+    Returns:
+        GeneIdList: The valid gene IDs, sorted, with the position of their first occurrence.
+    """
+    pattern = re.compile(GENE_ID_PATTERNS.get(species_name, DEFAULT_GENE_ID_PATTERN))
+    gene_ids = [gene_id for gene_id in gene_ids if gene_id]
+
+    is_valid = np.array([bool(pattern.fullmatch(gene_id)) for gene_id in gene_ids], dtype=bool)
+    positions = np.flatnonzero(is_valid)
+    valid_ids = np.array(gene_ids, dtype=str)[positions]
+    # np.unique returns the index of the first occurrence of each sorted gene ID
+    unique_ids, first_indices = np.unique(valid_ids, return_index=True)
+    invalid_ids = [gene_id for gene_id, valid in zip(gene_ids, is_valid) if not valid]
+
+    gene_id_list = GeneIdList(
+        unique_ids, positions[first_indices], len(valid_ids) - len(unique_ids), invalid_ids
+    )
+    if gene_id_list.duplicate_count:
+        print(f"Dropped {gene_id_list.duplicate_count} duplicate gene IDs from {source}.")
+    if invalid_ids:
+        print(
+            f"Dropped {len(invalid_ids)} invalid gene IDs from {source}: "
+            f"{', '.join(invalid_ids[:SHOWN_GENE_ID_COUNT])}"
+            f"{', ...' if len(invalid_ids) > SHOWN_GENE_ID_COUNT else ''}"
+        )
+    return gene_id_list
+
+
+def load_gene_ids(file_path: str, species_name: Optional[str] = None) -> GeneIdList:
+    """Load the gene IDs of a gene list file, skipping its header line.
+
+    Args:
+        file_path (str): Path to the gene list file.
+        species_name (Optional[str]): Name of the species, e.g. "homo_sapiens".
+
+    Returns:
+        GeneIdList: The valid gene IDs, sorted and without duplicates (see check_gene_ids).
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        # Skip the header line
+        next(file, None)
+        gene_ids = [line.strip() for line in file]
+
+    return check_gene_ids(gene_ids, species_name, f"'{file_path}'")
+
+
+def read_extracted_gene_ids(csv_path: str) -> np.ndarray:
+    """Read the IDs of the genes already extracted to a DNA components CSV file.
+
+    Args:
+        csv_path (str): Path to the CSV file (see ensembl_api.CSV_HEADER).
+
+    Returns:
+        np.ndarray: IDs of the genes with a row in the file, sorted and without duplicates
+                    (empty if the file does not exist).
+    """
+    if not os.path.exists(csv_path):
+        return np.array([], dtype=str)
+
+    with open(csv_path, "r", newline="", encoding="utf-8") as csv_file:
+        rows = csv.reader(csv_file)
+        # Skip the header
+        next(rows, None)
+        return np.unique(np.array([row[0] for row in rows if row], dtype=str))
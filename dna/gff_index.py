@@ -0,0 +1,245 @@
+from typing import Optional, List, Dict
+import numpy as np
+
+# GFF3 feature types of the parts of a transcript, stored as their position in this tuple.
+# The coding sequence is stored as the translation start and end of the transcript.
+PART_TYPES = ("exon", "five_prime_UTR", "three_prime_UTR")
+
+
+class GffIndex:
+    """Array-backed index of the canonical transcript of each gene of a GFF3 annotation.
+
+    Transcripts are stored in NumPy arrays sorted by chromosome and start position, with
+    their exon and UTR intervals in transcript order in flat arrays (one slice per
+    transcript). Genes are found by binary search on their sorted IDs, and the index is
+    saved to a .npz file to be reloaded without parsing the GFF3 file again.
+    """
+
+    # Version of the saved index, changed when the meaning of its arrays changes
+    FORMAT_VERSION = 2
+
+    ARRAY_NAMES = (
+        "chromosomes",
+        "chromosome_offsets",
+        "gene_ids",
+        "transcript_ids",
+        "chromosome_indices",
+        "starts",
+        "ends",
+        "strands",
+        "translation_starts",
+        "translation_ends",
+        "part_offsets",
+        "part_types",
+        "part_starts",
+        "part_ends",
+        "gene_order",
+    )
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        """Create the index from its arrays (see from_genes and load).
+
+        Args:
+            arrays (Dict[str, np.ndarray]): Arrays of the index keyed by name (see ARRAY_NAMES).
+        """
+        for name in self.ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.sorted_gene_ids = self.gene_ids[self.gene_order]
+        self.max_transcript_length = int((self.ends - self.starts).max(initial=0))
+
+    @classmethod
+    def from_genes(cls, genes: Dict[str, Dict]) -> "GffIndex":
+        """Build the index from gene data in the format of an expanded Ensembl lookup.
+
+        Args:
+            genes (Dict[str, Dict]): Gene data keyed by gene ID (see local_genome.read_gff_genes).
+
+        Returns:
+            GffIndex: The index of the canonical transcripts of the genes.
+        """
+        transcripts = [
+            (gene_id, gene_data["Transcript"][0]) for gene_id, gene_data in genes.items()
+        ]
+        transcripts.sort(key=lambda item: (item[1]["seq_region_name"], item[1]["start"]))
+
+        chromosomes = sorted({transcript["seq_region_name"] for _, transcript in transcripts})
+        chromosome_numbers = {name: number for number, name in enumerate(chromosomes)}
+
+        part_types, part_starts, part_ends, part_offsets = [], [], [], [0]
+        for _, transcript in transcripts:
+            parts = [(0, exon["start"], exon["end"]) for exon in transcript.get("Exon", [])]
+            parts += [
+                (PART_TYPES.index(utr["type"].replace("utr", "UTR")), utr["start"], utr["end"])
+                for utr in transcript.get("UTR", [])
+            ]
+            for part_type, start, end in parts:
+                part_types.append(part_type)
+                part_starts.append(start)
+                part_ends.append(end)
+            part_offsets.append(len(part_types))
+
+        chromosome_indices = np.array(
+            [chromosome_numbers[t["seq_region_name"]] for _, t in transcripts], dtype=np.int32
+        )
+        gene_ids = np.array([gene_id for gene_id, _ in transcripts], dtype=str)
+
+        return cls(
+            {
+                "chromosomes": np.array(chromosomes, dtype=str),
+                "chromosome_offsets": np.searchsorted(
+                    chromosome_indices, np.arange(len(chromosomes) + 1)
+                ).astype(np.int64),
+                "gene_ids": gene_ids,
+                "transcript_ids": np.array([t["id"] for _, t in transcripts], dtype=str),
+                "chromosome_indices": chromosome_indices,
+                "starts": np.array([t["start"] for _, t in transcripts], dtype=np.int64),
+                "ends": np.array([t["end"] for _, t in transcripts], dtype=np.int64),
+                "strands": np.array([t["strand"] for _, t in transcripts], dtype=np.int8),
+                # Non-coding transcripts have no translation (stored as 0)
+                "translation_starts": np.array(
+                    [t.get("Translation", {}).get("start", 0) for _, t in transcripts],
+                    dtype=np.int64,
+                ),
+                "translation_ends": np.array(
+                    [t.get("Translation", {}).get("end", 0) for _, t in transcripts],
+                    dtype=np.int64,
+                ),
+                "part_offsets": np.array(part_offsets, dtype=np.int64),
+                "part_types": np.array(part_types, dtype=np.uint8),
+                "part_starts": np.array(part_starts, dtype=np.int64),
+                "part_ends": np.array(part_ends, dtype=np.int64),
+                "gene_order": np.argsort(gene_ids, kind="stable"),
+            }
+        )
+
+    @classmethod
+    def load(cls, index_path: str) -> "GffIndex":
+        """Load an index saved with save.
+
+        Args:
+            index_path (str): Path to the .npz index file.
+
+        Returns:
+            GffIndex: The loaded index.
+
+        Raises:
+            ValueError: If the index was saved with another version of the index format.
+        """
+        with np.load(index_path, allow_pickle=False) as arrays:
+            if (
+                "format_version" not in arrays
+                or int(arrays["format_version"]) != cls.FORMAT_VERSION
+            ):
+                raise ValueError(f"{index_path} was saved with another version of the index.")
+            return cls({name: arrays[name] for name in cls.ARRAY_NAMES})
+
+    def save(self, index_path: str) -> None:
+        """Save the index to a .npz file.
+
+        Args:
+            index_path (str): Path to the .npz index file.
+        """
+        with open(index_path, "wb") as file:
+            np.savez(
+                file,
+                format_version=np.array(self.FORMAT_VERSION),
+                **{name: getattr(self, name) for name in self.ARRAY_NAMES},
+            )
+
+    def __len__(self) -> int:
+        return len(self.gene_ids)
+
+    def find_gene(self, gene_id: str) -> Optional[int]:
+        """Find the position of a gene in the index arrays.
+
+        Args:
+            gene_id (str): Ensembl gene ID.
+
+        Returns:
+            Optional[int]: Position of the gene, or None if it is not in the index.
+        """
+        position = np.searchsorted(self.sorted_gene_ids, gene_id)
+        if position == len(self) or self.sorted_gene_ids[position] != gene_id:
+            return None
+        return int(self.gene_order[position])
+
+    def get_gene_data(self, gene_id: str) -> Optional[Dict]:
+        """Get the canonical transcript of a gene in the format of an expanded Ensembl lookup.
+
+        Args:
+            gene_id (str): Ensembl gene ID.
+
+        Returns:
+            Optional[Dict]: Gene data that can be passed to ensembl_api.derive_component_coordinates,
+                            or None if the gene is not in the index.
+        """
+        index = self.find_gene(gene_id)
+        if index is None:
+            return None
+
+        chromosome = str(self.chromosomes[self.chromosome_indices[index]])
+        transcript = {
+            "id": str(self.transcript_ids[index]),
+            "seq_region_name": chromosome,
+            "start": int(self.starts[index]),
+            "end": int(self.ends[index]),
+            "strand": int(self.strands[index]),
+        }
+
+        parts = slice(self.part_offsets[index], self.part_offsets[index + 1])
+        part_intervals = list(
+            zip(
+                self.part_types[parts].tolist(),
+                self.part_starts[parts].tolist(),
+                self.part_ends[parts].tolist(),
+            )
+        )
+        transcript["Exon"] = [
+            {"start": start, "end": end} for part_type, start, end in part_intervals if part_type == 0
+        ]
+        if self.translation_starts[index]:
+            transcript["Translation"] = {
+                "start": int(self.translation_starts[index]),
+                "end": int(self.translation_ends[index]),
+            }
+        transcript["UTR"] = [
+            {
+                "type": PART_TYPES[part_type].lower(),
+                "start": start,
+                "end": end,
+                "seq_region_name": chromosome,
+            }
+            for part_type, start, end in part_intervals
+            if part_type > 0
+        ]
+
+        return {"id": gene_id, "canonical_transcript": transcript["id"], "Transcript": [transcript]}
+
+    def find_genes_in_region(self, chromosome: str, start: int, end: int) -> List[str]:
+        """Find the genes whose canonical transcript overlaps a genomic region.
+
+        Args:
+            chromosome (str): Chromosome name.
+            start (int): Start position of the region (1-based, inclusive).
+            end (int): End position of the region (1-based, inclusive).
+
+        Returns:
+            List[str]: IDs of the overlapping genes, sorted by start position.
+        """
+        chromosome_number = np.searchsorted(self.chromosomes, chromosome)
+        if (
+            chromosome_number == len(self.chromosomes)
+            or self.chromosomes[chromosome_number] != chromosome
+        ):
+            return []
+
+        first = self.chromosome_offsets[chromosome_number]
+        last = self.chromosome_offsets[chromosome_number + 1]
+        starts = self.starts[first:last]
+
+        # Only transcripts starting less than the longest transcript before the region can overlap it
+        low = first + np.searchsorted(starts, start - self.max_transcript_length, side="left")
+        high = first + np.searchsorted(starts, end, side="right")
+        overlapping = low + np.nonzero(self.ends[low:high] >= start)[0]
+
+        return self.gene_ids[overlapping].tolist()
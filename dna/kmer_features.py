@@ -0,0 +1,250 @@
+import os
+import tempfile
+from itertools import product
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+import numpy as np
+
+# Sequence columns whose k-mers are counted, in the order of their columns in the k-mer matrix
+KMER_REGIONS = ("promoter", "utr5", "utr3", "terminator")
+
+# Sizes of the counted k-mers
+DEFAULT_KMER_SIZES = (1, 2, 3, 4, 5, 6)
+MAX_KMER_SIZE = 8
+
+# Largest number of counters allocated to count k-mers with one bincount, beyond which the
+# k-mers are counted by sorting them
+MAX_BINCOUNT_SIZE = 2**23
+
+
+class KmerMatrix(NamedTuple):
+    """K-mer counts of the genes of a feature table, as a CSR sparse matrix.
+
+    Row i holds the counts of gene i of the table in columns, the counts of row i being
+    data[indptr[i]:indptr[i + 1]] in the columns indices[indptr[i]:indptr[i + 1]].
+    """
+
+    data: np.ndarray
+    indices: np.ndarray
+    indptr: np.ndarray
+    shape: Tuple[int, int]
+    columns: np.ndarray
+    transcript_ids: np.ndarray
+    row_hashes: np.ndarray
+    kmer_sizes: np.ndarray
+
+    def toarray(self) -> np.ndarray:
+        """Get the counts as a dense array (for small matrices).
+
+        Returns:
+            np.ndarray: Array of shape self.shape with the k-mer counts.
+        """
+        array = np.zeros(self.shape, dtype=self.data.dtype)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        array[rows, self.indices] = self.data
+        return array
+
+
+def check_kmer_sizes(kmer_sizes: Sequence[int]) -> List[int]:
+    """Check the sizes of the k-mers to count.
+
+    Args:
+        kmer_sizes (Sequence[int]): Sizes of the k-mers.
+
+    Returns:
+        List[int]: The distinct sizes, sorted.
+
+    Raises:
+        ValueError: If there is no size or a size is not between 1 and MAX_KMER_SIZE.
+    """
+    sizes = sorted(set(kmer_sizes))
+    if not sizes or sizes[0] < 1 or sizes[-1] > MAX_KMER_SIZE:
+        raise ValueError(f"K-mer sizes must be between 1 and {MAX_KMER_SIZE}, got {kmer_sizes}.")
+    return sizes
+
+
+def get_kmer_columns(kmer_sizes: Sequence[int]) -> List[str]:
+    """Get the names of the columns of the k-mer matrix.
+
+    Columns are ordered by region (KMER_REGIONS), then by k-mer size, then by k-mer in the
+    order of product("ACGT", repeat=k), e.g. "promoter_A", ..., "terminator_TTTTTT".
+
+    Args:
+        kmer_sizes (Sequence[int]): Sizes of the k-mers (see check_kmer_sizes).
+
+    Returns:
+        List[str]: Names of the columns.
+    """
+    return [
+        f"{region}_{''.join(kmer)}"
+        for region in KMER_REGIONS
+        for k in kmer_sizes
+        for kmer in product("ACGT", repeat=k)
+    ]
+
+
+def count_kmers(
+    codes: np.ndarray, offsets: np.ndarray, kmer_sizes: Sequence[int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Count the k-mers of encoded sequences.
+
+    The k-mers are indexed with a rolling hash: the index of the k-mer starting at each
+    position is 4 times the index of the (k - 1)-mer starting there plus the code of its
+    last nucleotide, so the k-mers of all sizes are indexed with one pass over the codes
+    per size. K-mers containing a character other than A, C, G or T are not counted.
+
+    Args:
+        codes (np.ndarray): Nucleotide codes of the sequences (A, C, G, T coded 0 to 3 and
+                            any other character coded 4), one sequence after the other.
+        offsets (np.ndarray): Offsets of the sequences in the codes (sequence i is
+                              codes[offsets[i]:offsets[i + 1]]).
+        kmer_sizes (Sequence[int]): Sizes of the k-mers, sorted (see check_kmer_sizes).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The sequence, column and count of every
+        k-mer found, sorted by sequence then column. Columns are numbered by k-mer size then
+        by k-mer (see get_kmer_columns).
+    """
+    sequence_count = len(offsets) - 1
+    sequence_ids = np.repeat(np.arange(sequence_count, dtype=np.int32), np.diff(offsets))
+
+    # K-mers of up to MAX_KMER_SIZE nucleotides have indices below 4**8
+    kmer_indices = codes.astype(np.int32)
+    ambiguous = codes > 3
+    column_offset = 0
+    blocks = []
+    for k in range(1, kmer_sizes[-1] + 1):
+        if k > 1:
+            kmer_indices = 4 * kmer_indices[:-1] + codes[k - 1 :]
+            ambiguous = ambiguous[:-1] | (codes[k - 1 :] > 3)
+        if k not in kmer_sizes:
+            continue
+
+        # K-mers must not span two sequences
+        valid = ~ambiguous & (sequence_ids[: len(ambiguous)] == sequence_ids[k - 1 :])
+        kmer_count = 4**k
+        keys = sequence_ids[: len(valid)][valid].astype(np.int64) * kmer_count
+        keys += kmer_indices[valid]
+
+        if sequence_count * kmer_count <= MAX_BINCOUNT_SIZE:
+            counts = np.bincount(keys, minlength=sequence_count * kmer_count)
+            keys = np.flatnonzero(counts)
+            counts = counts[keys]
+        else:
+            keys, counts = np.unique(keys, return_counts=True)
+
+        blocks.append(
+            (
+                (keys // kmer_count).astype(np.int32),
+                (column_offset + keys % kmer_count).astype(np.int32),
+                counts.astype(np.int32),
+            )
+        )
+        column_offset += kmer_count
+
+    rows, columns, counts = (np.concatenate(arrays) for arrays in zip(*blocks))
+    # The blocks are sorted by column, so a stable sort by sequence keeps columns sorted
+    order = np.argsort(rows, kind="stable")
+    return rows[order], columns[order], counts[order]
+
+
+class KmerMatrixWriter:
+    """Writer of a k-mer matrix to a .npz file, one chunk of rows at a time.
+
+    The counts and column indices are appended to temporary files as chunks are written,
+    so the memory used does not depend on the number of genes. The .npz file has the
+    layout of scipy.sparse.save_npz, and can be opened with scipy.sparse.load_npz as well
+    as with load_kmer_matrix.
+    """
+
+    def __init__(self, matrix_path: str, kmer_sizes: Sequence[int]):
+        """Start writing a k-mer matrix.
+
+        Args:
+            matrix_path (str): Path to the .npz file.
+            kmer_sizes (Sequence[int]): Sizes of the k-mers (see check_kmer_sizes).
+        """
+        self.matrix_path = matrix_path
+        self.kmer_sizes = list(kmer_sizes)
+        self.columns = get_kmer_columns(self.kmer_sizes)
+        directory = os.path.dirname(os.path.abspath(matrix_path))
+        self.data_file = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+        self.indices_file = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+        self.row_lengths: List[np.ndarray] = []
+        self.value_count = 0
+
+    def write(self, data: np.ndarray, indices: np.ndarray, row_lengths: np.ndarray) -> None:
+        """Append rows to the matrix (see count_region_kmers).
+
+        Args:
+            data (np.ndarray): int32 counts of the rows.
+            indices (np.ndarray): int32 column indices of the counts.
+            row_lengths (np.ndarray): Number of counts of each row.
+        """
+        data.tofile(self.data_file)
+        indices.tofile(self.indices_file)
+        self.row_lengths.append(row_lengths)
+        self.value_count += len(data)
+
+    def close(self, transcript_ids: List[str], row_hashes: List[str]) -> None:
+        """Write the .npz file once all rows are written.
+
+        Args:
+            transcript_ids (List[str]): Transcript ID of each row.
+            row_hashes (List[str]): Hash of the sequences of each row (see feature_manifest.hash_row).
+        """
+        try:
+            self.data_file.close()
+            self.indices_file.close()
+            indptr = np.zeros(len(transcript_ids) + 1, dtype=np.int64)
+            if self.row_lengths:
+                np.cumsum(np.concatenate(self.row_lengths), out=indptr[1:])
+
+            # The arrays are copied from the temporary files to the .npz file by blocks
+            arrays = {}
+            for name, temp_file in (("data", self.data_file), ("indices", self.indices_file)):
+                arrays[name] = (
+                    np.memmap(temp_file.name, dtype=np.int32, mode="r")
+                    if self.value_count
+                    else np.zeros(0, dtype=np.int32)
+                )
+
+            temp_path = self.matrix_path + ".tmp.npz"
+            with open(temp_path, "wb") as matrix_file:
+                np.savez(
+                    matrix_file,
+                    format=np.array(b"csr"),
+                    shape=np.array([len(transcript_ids), len(self.columns)], dtype=np.int64),
+                    indptr=indptr,
+                    columns=np.array(self.columns, dtype=str),
+                    transcript_ids=np.array(transcript_ids, dtype=str),
+                    row_hashes=np.array(row_hashes, dtype=str),
+                    kmer_sizes=np.array(self.kmer_sizes, dtype=np.int64),
+                    **arrays,
+                )
+            del arrays
+            os.replace(temp_path, self.matrix_path)
+        finally:
+            os.remove(self.data_file.name)
+            os.remove(self.indices_file.name)
+
+
+def load_kmer_matrix(matrix_path: str) -> KmerMatrix:
+    """Load a k-mer matrix written by KmerMatrixWriter.
+
+    Args:
+        matrix_path (str): Path to the .npz file.
+
+    Returns:
+        KmerMatrix: The k-mer counts with the names of their columns and rows.
+    """
+    with np.load(matrix_path, allow_pickle=False) as arrays:
+        return KmerMatrix(
+            data=arrays["data"],
+            indices=arrays["indices"],
+            indptr=arrays["indptr"],
+            shape=tuple(arrays["shape"].tolist()),
+            columns=arrays["columns"],
+            transcript_ids=arrays["transcript_ids"],
+            row_hashes=arrays["row_hashes"],
+            kmer_sizes=arrays["kmer_sizes"],
+        )
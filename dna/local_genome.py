@@ -0,0 +1,373 @@
+import os
+import csv
+import gzip
+from typing import Optional, List, Tuple, Dict, TextIO
+from urllib.parse import unquote
+from dna import ensembl_api
+from dna.fasta_index import IndexedFasta
+from dna.gene_id_loader import check_gene_ids
+from dna.gff_index import GffIndex
+
+# Extensions of the genome FASTA and GFF3 files (e.g. as downloaded from the Ensembl FTP site)
+FASTA_EXTENSIONS = (".fa", ".fa.gz", ".fasta", ".fasta.gz")
+GFF_EXTENSIONS = (".gff3", ".gff3.gz", ".gff", ".gff.gz")
+
+# GFF3 feature types of the parts of a transcript
+TRANSCRIPT_PART_TYPES = ("exon", "CDS", "five_prime_UTR", "three_prime_UTR")
+
+
+def open_text_file(file_path: str) -> TextIO:
+    """Opens a text file, decompressing it on the fly if it is gzipped.
+
+    Args:
+        file_path (str): Path to the (optionally gzipped) file.
+
+    Returns:
+        TextIO: The opened file.
+    """
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rt", encoding="utf-8")
+    return open(file_path, "r", encoding="utf-8")
+
+
+def find_fasta_file(genome_directory: str, species_name: str) -> Optional[str]:
+    """Finds the genome FASTA file of a species (see find_genome_files).
+
+    Args:
+        genome_directory (str): Directory containing the genome files.
+        species_name (str): Species name, e.g. "homo_sapiens".
+
+    Returns:
+        Optional[str]: Path to the genome FASTA file, or None if it is missing.
+    """
+    fasta_files = sorted(
+        filename
+        for filename in os.listdir(genome_directory)
+        if filename.lower().startswith(species_name.lower() + ".")
+        and filename.lower().endswith(FASTA_EXTENSIONS)
+    )
+    if not fasta_files:
+        return None
+
+    # Prefer the unmasked genome over other FASTA files (e.g. cDNA or peptides)
+    fasta_files.sort(key=lambda filename: ".dna." not in filename.lower())
+    return os.path.join(genome_directory, fasta_files[0])
+
+
+def find_genome_files(genome_directory: str, species_name: str) -> Tuple[str, str]:
+    """Finds the genome FASTA and GFF3 files of a species.
+
+    Files are expected to be named as on the Ensembl FTP site, starting with the species
+    name, e.g. "Homo_sapiens.GRCh38.dna.toplevel.fa.gz" and "Homo_sapiens.GRCh38.110.gff3.gz".
+
+    Args:
+        genome_directory (str): Directory containing the genome files.
+        species_name (str): Species name, e.g. "homo_sapiens".
+
+    Returns:
+        Tuple[str, str]: Paths to the genome FASTA file and to the GFF3 file.
+
+    Raises:
+        FileNotFoundError: If the FASTA or the GFF3 file of the species is missing.
+    """
+    fasta_path = find_fasta_file(genome_directory, species_name)
+    gff_files = sorted(
+        filename
+        for filename in os.listdir(genome_directory)
+        if filename.lower().startswith(species_name.lower() + ".")
+        and filename.lower().endswith(GFF_EXTENSIONS)
+    )
+
+    if fasta_path is None or not gff_files:
+        raise FileNotFoundError(
+            f"Genome FASTA and GFF3 files of {species_name} not found in {genome_directory}."
+        )
+
+    return fasta_path, os.path.join(genome_directory, gff_files[0])
+
+
+def parse_gff_attributes(attributes: str) -> Dict[str, str]:
+    """Parses the attributes column of a GFF3 line.
+
+    Args:
+        attributes (str): Attributes column, e.g. "ID=gene:ENSG0001;biotype=protein_coding".
+
+    Returns:
+        Dict[str, str]: Attribute values keyed by attribute name.
+    """
+    parsed_attributes = {}
+    for attribute in attributes.strip().split(";"):
+        if "=" in attribute:
+            name, value = attribute.split("=", 1)
+            parsed_attributes[name] = unquote(value)
+    return parsed_attributes
+
+
+def is_canonical_transcript(attributes: Dict[str, str]) -> bool:
+    """Checks whether a GFF3 transcript is tagged as the canonical transcript of its gene.
+
+    Args:
+        attributes (Dict[str, str]): Parsed attributes of the transcript.
+
+    Returns:
+        bool: True if the transcript has the Ensembl_canonical tag (or is_canonical=1).
+    """
+    tags = attributes.get("tag", "").split(",")
+    return "Ensembl_canonical" in tags or attributes.get("is_canonical") == "1"
+
+
+def read_gff_genes(gff_path: str) -> Dict[str, Dict]:
+    """Reads the canonical transcript of each gene from a GFF3 file.
+
+    The genes are returned in the format of an expanded Ensembl gene lookup
+    (expand=1, utr=1), so they can be passed to ensembl_api.derive_component_coordinates.
+
+    Args:
+        gff_path (str): Path to the (optionally gzipped) GFF3 file.
+
+    Returns:
+        Dict[str, Dict]: Gene data keyed by gene ID, for the genes with a canonical transcript.
+    """
+    gene_ids = {}  # GFF3 ID of the gene -> gene ID
+    canonical_transcripts = {}  # GFF3 ID of the transcript -> transcript data
+    transcript_parents = {}  # GFF3 ID of the transcript -> GFF3 ID of the gene
+    transcript_parts: Dict[str, List[Tuple[str, int, int]]] = {}
+
+    with open_text_file(gff_path) as file:
+        for line in file:
+            if line.startswith("##FASTA"):
+                break
+            if line.startswith("#") or not line.strip():
+                continue
+
+            columns = line.rstrip("\n").split("\t")
+            if len(columns) != 9:
+                continue
+            seqid, _, feature_type, start, end, _, strand, _, attribute_column = columns
+            attributes = parse_gff_attributes(attribute_column)
+
+            if feature_type in TRANSCRIPT_PART_TYPES:
+                for parent in attributes.get("Parent", "").split(","):
+                    transcript_parts.setdefault(parent, []).append(
+                        (feature_type, int(start), int(end))
+                    )
+            elif "ID" in attributes and "Parent" not in attributes:
+                gene_ids[attributes["ID"]] = attributes.get(
+                    "gene_id", attributes["ID"].replace("gene:", "", 1)
+                )
+            elif "ID" in attributes and is_canonical_transcript(attributes):
+                canonical_transcripts[attributes["ID"]] = {
+                    "id": attributes.get(
+                        "transcript_id", attributes["ID"].replace("transcript:", "", 1)
+                    ),
+                    "seq_region_name": seqid,
+                    "start": int(start),
+                    "end": int(end),
+                    "strand": 1 if strand == "+" else -1,
+                }
+                transcript_parents[attributes["ID"]] = attributes["Parent"].split(",")[0]
+
+    genes = {}
+    for gff_id, transcript in canonical_transcripts.items():
+        gene_id = gene_ids.get(transcript_parents[gff_id])
+        if gene_id is None:
+            continue
+
+        # Parts are listed in transcript order, as in the Ensembl lookup
+        parts = sorted(
+            transcript_parts.get(gff_id, []),
+            key=lambda part: part[1],
+            reverse=transcript["strand"] == -1,
+        )
+        transcript["Exon"] = [
+            {"start": start, "end": end} for part_type, start, end in parts if part_type == "exon"
+        ]
+        cds_parts = [(start, end) for part_type, start, end in parts if part_type == "CDS"]
+        if cds_parts:
+            transcript["Translation"] = {
+                "start": min(start for start, _ in cds_parts),
+                "end": max(end for _, end in cds_parts),
+            }
+        transcript["UTR"] = [
+            {
+                "type": part_type.lower(),
+                "start": start,
+                "end": end,
+                "seq_region_name": transcript["seq_region_name"],
+            }
+            for part_type, start, end in parts
+            if part_type in ("five_prime_UTR", "three_prime_UTR")
+        ]
+
+        genes[gene_id] = {
+            "id": gene_id,
+            "canonical_transcript": transcript["id"],
+            "Transcript": [transcript],
+        }
+
+    return genes
+
+
+def load_gff_index(gff_path: str) -> GffIndex:
+    """Loads the index of a GFF3 file, building it on first use.
+
+    The index is saved next to the GFF3 file, with a .index.npz extension.
+
+    Args:
+        gff_path (str): Path to the (optionally gzipped) GFF3 file.
+
+    Returns:
+        GffIndex: Index of the canonical transcript of each gene.
+    """
+    index_path = gff_path + ".index.npz"
+
+    # (Re)build the index if it is missing, older than the GFF3 file or in an older format
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(
+        gff_path
+    ):
+        try:
+            return GffIndex.load(index_path)
+        except ValueError as e:
+            print(e)
+
+    print(f"Indexing {gff_path}.")
+    gff_index = GffIndex.from_genes(read_gff_genes(gff_path))
+    gff_index.save(index_path)
+    return gff_index
+
+
+class LocalGenome:
+    """Genome sequence and canonical transcripts of a species, read from local files.
+
+    Builds the same rows as the Ensembl REST queries of ensembl_api without any request.
+    """
+
+    def __init__(self, fasta_path: str, gff_path: str):
+        """Open the genome FASTA file for random access and load the index of the GFF3 file.
+
+        Args:
+            fasta_path (str): Path to the genome FASTA file.
+            gff_path (str): Path to the GFF3 annotation of the genome.
+        """
+        self.fasta = IndexedFasta(fasta_path)
+        self.gff_index = load_gff_index(gff_path)
+
+    def __enter__(self) -> "LocalGenome":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the memory-mapped genome FASTA file."""
+        self.fasta.close()
+
+    def get_region(self, chromosome: str, start: int, end: int, strand: int) -> str:
+        """Gets the sequence of a genomic region, like the Ensembl sequence/region endpoint.
+
+        Args:
+            chromosome (str): Chromosome name.
+            start (int): Start position of the region (1-based, inclusive).
+            end (int): End position of the region (1-based, inclusive).
+            strand (int): 1 for the forward strand, -1 for the reverse strand.
+
+        Returns:
+            str: The sequence of the region on the given strand.
+        """
+        return self.fasta.fetch(chromosome, start, end, strand)
+
+    def get_gene_row(self, gene_id: str) -> Optional[List[str]]:
+        """Builds the DNA components of one gene.
+
+        Args:
+            gene_id (str): Ensembl gene ID.
+
+        Returns:
+            Optional[List[str]]: Row of the CSV file (see ensembl_api.CSV_HEADER), or None if
+                                 the gene has no coding canonical transcript in the annotation.
+        """
+        gene_data = self.gff_index.get_gene_data(gene_id)
+        if gene_data is None:
+            print(f"Gene ID {gene_id} not found in the annotation.")
+            return None
+
+        coordinates = ensembl_api.derive_component_coordinates(gene_data)
+        if not coordinates or coordinates["chromosome"] not in self.fasta.index:
+            return None
+
+        # The flanks cannot reach past the end of the chromosome
+        coordinates["region_end"] = min(
+            coordinates["region_end"], self.fasta.get_length(coordinates["chromosome"])
+        )
+        region_sequence = self.get_region(
+            coordinates["chromosome"],
+            coordinates["region_start"],
+            coordinates["region_end"],
+            coordinates["strand"],
+        )
+
+        promoter, utr5, cds, utr3, terminator = ensembl_api.slice_components(
+            region_sequence, coordinates
+        )
+        if cds == "":
+            return None
+
+        return [gene_id, coordinates["transcript_id"], promoter, utr5, cds, utr3, terminator]
+
+
+def get_data_as_csv_local(
+    file_paths: List[str],
+    output_directory: str,
+    genome_directory: str,
+    resume: bool = False,
+    update: bool = False,
+) -> None:
+    """Builds the DNA components of the gene IDs from local genome files and saves them as CSV files.
+
+    Args:
+        file_paths (List[str]): List of file paths containing gene IDs.
+        output_directory (str): Directory where CSV files will be saved.
+        genome_directory (str): Directory containing the genome FASTA and GFF3 file of each
+                                species (see find_genome_files).
+        resume (bool): Whether to checkpoint the extraction and continue interrupted ones.
+        update (bool): Whether to append to existing CSV files only the genes they have no row for.
+
+    Returns:
+        None: This function does not return a value but outputs files to the specified directory.
+    """
+    # Create the directory if it doesn't exist
+    os.makedirs(output_directory, exist_ok=True)
+
+    for file_path in file_paths:
+        species_name = ensembl_api.get_species_name(file_path)
+        gene_id_list = check_gene_ids(
+            ensembl_api.read_gene_ids_from_file(file_path), species_name, f"'{file_path}'"
+        )
+        species = " ".join(species_name.split("_"))
+
+        print(f"Starting data extraction for {species}.")
+
+        try:
+            fasta_path, gff_path = find_genome_files(genome_directory, species_name)
+        except FileNotFoundError as e:
+            print(e)
+            continue
+        # The CSV file is only opened once the genome files are loaded
+        with LocalGenome(fasta_path, gff_path) as genome:
+            filename = os.path.join(output_directory, f"ensembl_data_{species_name}.csv")
+            csv_file, checkpoint, gene_ids = ensembl_api.open_csv_file(
+                filename, gene_id_list, resume, update
+            )
+
+            with csv_file:
+                csv_writer = csv.writer(csv_file)
+                for gene_id in gene_ids:
+                    row = genome.get_gene_row(gene_id)
+                    if row is not None:
+                        csv_writer.writerow(row)
+                    if checkpoint is not None:
+                        checkpoint.record([gene_id], csv_file)
+        if checkpoint is not None:
+            checkpoint.remove()
+
+        print(f"Data extraction for {species} is now complete.")
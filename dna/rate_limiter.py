@@ -0,0 +1,197 @@
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Mapping, Optional
+import ensembl_rest
+import requests
+
+# Ensembl REST API allows an average of 15 requests per second per client
+DEFAULT_REQUESTS_PER_SECOND = 15.0
+DEFAULT_BURST = 15
+
+# HTTP status codes of the errors worth retrying (rate limit and transient server errors)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+
+# Delays of the exponential backoff, when the server does not send a Retry-After header
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Parse the value of a Retry-After header.
+
+    Args:
+        value (Any): Number of seconds, or HTTP date, after which to retry.
+
+    Returns:
+        Optional[float]: Number of seconds to wait, or None if the value is missing or invalid.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_date = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """Token bucket shared by all the requests made to Ensembl, from any thread.
+
+    Each request takes a token, and tokens are refilled at the allowed request rate up
+    to the burst size, so requests run at the maximum allowed rate without exceeding it.
+    The rate is seeded from the X-RateLimit-* headers of the responses: the remaining
+    requests of the rate limit period are spread over the time left until its reset.
+    Rate limit errors pause all requests for the Retry-After delay of the response, or
+    for an exponential backoff with jitter, before the request is retried.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = MAX_RETRIES,
+    ):
+        """Create a rate limiter with a full bucket.
+
+        Args:
+            requests_per_second (float): Request rate until the headers of a response
+                                         give the allowed rate.
+            burst (int): Maximum number of requests made at once after an idle period.
+            max_retries (int): Maximum number of retries of a request.
+        """
+        self.rate = requests_per_second
+        self.capacity = float(burst)
+        self.max_retries = max_retries
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, possibly before it is refilled.
+
+        Returns:
+            float: Number of seconds to wait before making the request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            # No tokens are refilled while requests are paused
+            self.tokens = min(
+                self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate
+            )
+            self.updated = max(now, self.updated)
+            self.tokens -= 1
+            # Tokens taken in advance are refilled in order, so waiting requests queue up
+            return max(0.0, self.updated - now - self.tokens / self.rate)
+
+    def acquire(self) -> None:
+        """Wait until a request can be made."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hold all requests, e.g. after a rate limit error.
+
+        Args:
+            seconds (float): Number of seconds to wait before the next request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now + seconds > self.updated:
+                # One request is made when the pause ends, the next ones at the request rate,
+                # after the requests already waiting for a token
+                self.tokens = (
+                    min(self.tokens + max(0.0, now - self.updated) * self.rate, 0.0) + 1.0
+                )
+                self.updated = now + seconds
+
+    def update_rate(self, headers: Mapping[str, str]) -> None:
+        """Adjust the request rate to the X-RateLimit-* headers of a response.
+
+        Args:
+            headers (Mapping[str, str]): Headers of the response.
+        """
+        try:
+            limit = float(headers["X-RateLimit-Limit"])
+            period = float(headers["X-RateLimit-Period"])
+            remaining = float(headers["X-RateLimit-Remaining"])
+            reset = float(headers["X-RateLimit-Reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        if remaining < 1:
+            # No request left until the end of the period
+            self.pause(reset)
+        elif period > 0:
+            with self.lock:
+                self.rate = min(limit / period, remaining / max(reset, 1.0))
+
+    def record_response(self, response: requests.Response, *args, **kwargs) -> None:
+        """Response hook of requests sessions, adjusting the rate to each response.
+
+        Args:
+            response (requests.Response): Response of an Ensembl request.
+            *args: Other arguments passed by requests to its hooks.
+            **kwargs: Keyword arguments passed by requests to its hooks.
+        """
+        self.update_rate(response.headers)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Get the delay before retrying a request, when the server gives none.
+
+        Args:
+            attempt (int): Number of the retry, starting from 0.
+
+        Returns:
+            float: Exponential delay with jitter, between half and all of
+                   BASE_BACKOFF_SECONDS * 2**attempt (at most MAX_BACKOFF_SECONDS).
+        """
+        delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+    def call(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """Make an Ensembl request within the rate limit, retrying it after transient errors.
+
+        Args:
+            function (Callable[..., Any]): Function making one request, raising an
+                                           ensembl_rest or requests HTTPError on error.
+            *args: Positional arguments passed to the function.
+            **kwargs: Keyword arguments passed to the function.
+
+        Returns:
+            Any: The value returned by the function.
+
+        Raises:
+            ensembl_rest.core.restclient.HTTPError, requests.exceptions.HTTPError: If the
+                request fails with another error, or still fails after max_retries retries.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return function(*args, **kwargs)
+            except (
+                ensembl_rest.core.restclient.HTTPError,
+                requests.exceptions.HTTPError,
+            ) as e:
+                response = e.response
+                if (
+                    response is None
+                    or response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    raise
+
+                if response.status_code == 429:  # Check for rate limit exceeded error
+                    print("Rate limit exceeded. Waiting before retrying...")
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                self.pause(self.backoff_delay(attempt) if delay is None else delay)
+                attempt += 1
@@ -0,0 +1,395 @@
+import os
+import json
+import shutil
+import tempfile
+from itertools import chain
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+
+# Translation table to the codes of the nucleotides in encoded sequences (A, C, G, T -> 0-3),
+# any other character is coded 4
+NUCLEOTIDE_CODES = bytes(b"ACGT".find(character) % 5 for character in range(256))
+
+# Sequence columns of the DNA components CSV files held in sequence stores
+STORE_REGIONS = ("promoter", "utr5", "cds", "utr3", "terminator")
+
+# Sequences start at multiples of 12 nucleotides, so that each sequence starts on a byte of
+# the packed array (4 nucleotides) and its codons line up with the codons of the store (3)
+SEQUENCE_ALIGNMENT = 12
+
+# Padding of sequences to a multiple of SEQUENCE_ALIGNMENT nucleotides, by padding length
+SEQUENCE_PADDING = tuple("A" * length for length in range(SEQUENCE_ALIGNMENT))
+
+
+# Codes of the 4 nucleotides of every packed byte, as the 4 bytes of a uint32 to look them
+# up at once
+UNPACKED_CODES = (
+    ((np.arange(256)[:, np.newaxis] >> np.array([0, 2, 4, 6])) & 3)
+    .astype(np.uint8)
+    .view(np.uint32)
+    .ravel()
+)
+
+
+def get_packed_gc_counts() -> np.ndarray:
+    """Get the GC counts of the nucleotides of every packed byte (see PackedSequences).
+
+    Returns:
+        np.ndarray: uint32 array of shape (3, 256) with the GC counts at codon positions 1, 2
+        and 3 of the 4 nucleotides of a byte in the first 3 bytes of each uint32, by the
+        position of the byte modulo 3 (byte b holds nucleotides 4b to 4b + 3) and by byte
+        value.
+    """
+    # C is coded 1 and G is coded 2
+    nucleotides = UNPACKED_CODES.view(np.uint8).reshape(256, 4)
+    is_gc = ((nucleotides == 1) | (nucleotides == 2)).astype(np.uint8)
+    # Codon position of the 4 nucleotides of a byte, by the position of the byte modulo 3
+    codon_positions = (np.arange(3)[:, np.newaxis] + np.arange(4)) % 3
+    in_codon_position = (codon_positions[..., np.newaxis] == np.arange(3)).astype(np.uint8)
+
+    counts = np.zeros((3, 256, 4), dtype=np.uint8)
+    counts[..., :3] = np.einsum("vn,pnq->pvq", is_gc, in_codon_position)
+    return counts.view(np.uint32).reshape(3, 256)
+
+
+PACKED_GC_COUNTS = get_packed_gc_counts()
+
+
+class PackedSequences(NamedTuple):
+    """DNA sequences packed with 2 bits per nucleotide.
+
+    Nucleotide i of the packed sequences is in bits 2 * (i % 4) of byte i // 4, with A, C,
+    G and T coded 0 to 3. Sequence j is made of the lengths[j] nucleotides starting at
+    offsets[j], padded to offsets[j + 1], a multiple of SEQUENCE_ALIGNMENT. Any character
+    other than A, C, G or T (e.g. N) is packed as A and recorded in a run of identical
+    characters: run k is run_lengths[k] times the character run_characters[k], starting at
+    nucleotide run_starts[k]. Runs do not span two sequences.
+    """
+
+    packed: np.ndarray
+    offsets: np.ndarray
+    lengths: np.ndarray
+    run_starts: np.ndarray
+    run_lengths: np.ndarray
+    run_characters: np.ndarray
+
+    def slice(self, start: int, stop: int) -> "PackedSequences":
+        """Get sequences start to stop - 1 without copying their packed nucleotides.
+
+        Args:
+            start (int): Index of the first sequence.
+            stop (int): Index after the last sequence.
+
+        Returns:
+            PackedSequences: The sequences, whose packed nucleotides, lengths, run lengths and
+            run characters are views of these sequences.
+        """
+        first_nucleotide, last_nucleotide = self.offsets[start], self.offsets[stop]
+        first_run, last_run = np.searchsorted(self.run_starts, [first_nucleotide, last_nucleotide])
+        return PackedSequences(
+            packed=self.packed[first_nucleotide // 4 : last_nucleotide // 4],
+            offsets=self.offsets[start : stop + 1] - first_nucleotide,
+            lengths=self.lengths[start:stop],
+            run_starts=self.run_starts[first_run:last_run] - first_nucleotide,
+            run_lengths=self.run_lengths[first_run:last_run],
+            run_characters=self.run_characters[first_run:last_run],
+        )
+
+    def codes(self) -> np.ndarray:
+        """Unpack the nucleotide codes of the sequences.
+
+        Returns:
+            np.ndarray: uint8 codes of the sequences, aligned with the offsets, with A, C, G
+            and T coded 0 to 3 and any other character and the padding coded 4 (see
+            dna_feature_extraction.encode_sequences).
+        """
+        codes = UNPACKED_CODES.take(self.packed).view(np.uint8)
+        codes[self.run_nucleotides()] = 4
+
+        # Sequences are padded with fewer than SEQUENCE_ALIGNMENT nucleotides
+        padding_starts = self.offsets[:-1] + self.lengths
+        for position in range(SEQUENCE_ALIGNMENT - 1):
+            padding = padding_starts + position
+            codes[padding[padding < self.offsets[1:]]] = 4
+        return codes
+
+    def run_nucleotides(self) -> np.ndarray:
+        """Get the positions of the nucleotides of the runs.
+
+        Returns:
+            np.ndarray: Positions of the nucleotides of each run, one run after the other.
+        """
+        run_offsets = np.cumsum(self.run_lengths) - self.run_lengths
+        run_nucleotides = np.repeat(self.run_starts - run_offsets, self.run_lengths)
+        run_nucleotides += np.arange(len(run_nucleotides))
+        return run_nucleotides
+
+    def gc_counts(self) -> np.ndarray:
+        """Count the G and C nucleotides at each codon position of the sequences.
+
+        The nucleotides are counted on the packed bytes, 12 at a time, with PACKED_GC_COUNTS.
+        Runs and padding are packed as A, so they are not counted.
+
+        Returns:
+            np.ndarray: Array of shape (number of sequences, 3) with the GC counts at codon
+            positions 1, 2 and 3 of each sequence.
+        """
+        # Each sequence is made of groups of 3 bytes, whose nucleotides start a codon
+        # The counts of a group are at most 4 per codon position, so they add up bytewise
+        byte_groups = self.packed.reshape(-1, 3)
+        group_counts = (
+            PACKED_GC_COUNTS[0].take(byte_groups[:, 0])
+            + PACKED_GC_COUNTS[1].take(byte_groups[:, 1])
+            + PACKED_GC_COUNTS[2].take(byte_groups[:, 2])
+        )
+        group_counts = group_counts.view(np.uint8).reshape(-1, 4)[:, :3]
+
+        group_offsets = self.offsets // SEQUENCE_ALIGNMENT
+        starts = group_offsets[:-1]
+        non_empty = group_offsets[1:] > starts
+        counts = np.zeros((len(starts), 3), dtype=np.int64)
+        if non_empty.any():
+            # Empty sequences end where the next one starts, so they can be left out
+            counts[non_empty] = np.add.reduceat(
+                group_counts, starts[non_empty], axis=0, dtype=np.int64
+            )
+        return counts
+
+    def sequences(self) -> List[str]:
+        """Decode the sequences.
+
+        Returns:
+            List[str]: The sequences, as they were packed.
+        """
+        codes = UNPACKED_CODES.take(self.packed).view(np.uint8)
+        characters = np.frombuffer(b"ACGT", dtype=np.uint8)[codes]
+        characters[self.run_nucleotides()] = np.repeat(self.run_characters, self.run_lengths)
+
+        text = characters.tobytes().decode("ascii")
+        return [
+            text[offset : offset + length]
+            for offset, length in zip(self.offsets[:-1].tolist(), self.lengths.tolist())
+        ]
+
+
+class SequenceStore(NamedTuple):
+    """Sequences of the genes of a DNA components table, packed by region (see PackedSequences)."""
+
+    gene_ids: List[str]
+    transcript_ids: List[str]
+    regions: Dict[str, PackedSequences]
+
+    def slice(self, start: int, stop: int) -> "SequenceStore":
+        """Get genes start to stop - 1 without copying their packed sequences.
+
+        Args:
+            start (int): Index of the first gene.
+            stop (int): Index after the last gene.
+
+        Returns:
+            SequenceStore: The genes.
+        """
+        return SequenceStore(
+            gene_ids=self.gene_ids[start:stop],
+            transcript_ids=self.transcript_ids[start:stop],
+            regions={
+                region: sequences.slice(start, stop) for region, sequences in self.regions.items()
+            },
+        )
+
+
+def pack_sequences(sequences: Sequence[str]) -> PackedSequences:
+    """Pack DNA sequences with 2 bits per nucleotide (see PackedSequences).
+
+    Args:
+        sequences (Sequence[str]): DNA sequences.
+
+    Returns:
+        PackedSequences: The packed sequences.
+    """
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    padding = -lengths % SEQUENCE_ALIGNMENT
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(lengths + padding, out=offsets[1:])
+
+    padding_sequences = [SEQUENCE_PADDING[pad] for pad in padding.tolist()]
+    text = "".join(chain.from_iterable(zip(sequences, padding_sequences))).encode(
+        "ascii", errors="replace"
+    )
+    characters = np.frombuffer(text, dtype=np.uint8)
+    codes = np.frombuffer(text.translate(NUCLEOTIDE_CODES), dtype=np.uint8)
+
+    # Runs of identical ambiguous characters, starting again at the start of each sequence
+    ambiguous_nucleotides = np.flatnonzero(codes == 4)
+    sequence_starts = np.zeros(len(codes) + 1, dtype=bool)
+    sequence_starts[offsets[:-1]] = True
+    run_first = np.ones(len(ambiguous_nucleotides), dtype=bool)
+    run_first[1:] = (
+        (np.diff(ambiguous_nucleotides) != 1)
+        | (characters[ambiguous_nucleotides[1:]] != characters[ambiguous_nucleotides[:-1]])
+        | sequence_starts[ambiguous_nucleotides[1:]]
+    )
+    run_starts = ambiguous_nucleotides[run_first]
+    run_lengths = np.diff(np.append(np.flatnonzero(run_first), len(ambiguous_nucleotides)))
+
+    # The 2 bits of each of the 4 bytes of a little-endian uint32 are shifted into its first byte
+    nucleotides = (codes & 3).view("<u4")
+    packed = (
+        nucleotides | (nucleotides >> 6) | (nucleotides >> 12) | (nucleotides >> 18)
+    ).astype(np.uint8)
+
+    return PackedSequences(
+        packed=packed,
+        offsets=offsets,
+        lengths=lengths,
+        run_starts=run_starts.astype(np.int64),
+        run_lengths=run_lengths.astype(np.int64),
+        run_characters=characters[run_starts],
+    )
+
+
+def pack_sequence_store(
+    gene_ids: List[str], transcript_ids: List[str], region_sequences: Dict[str, List[str]]
+) -> SequenceStore:
+    """Pack the sequences of genes into a sequence store.
+
+    Args:
+        gene_ids (List[str]): Ensembl gene ID of each gene.
+        transcript_ids (List[str]): Transcript ID of each gene.
+        region_sequences (Dict[str, List[str]]): Sequences of each of STORE_REGIONS.
+
+    Returns:
+        SequenceStore: The packed genes.
+    """
+    return SequenceStore(
+        gene_ids=list(gene_ids),
+        transcript_ids=list(transcript_ids),
+        regions={region: pack_sequences(region_sequences[region]) for region in STORE_REGIONS},
+    )
+
+
+class SequenceStoreWriter:
+    """Writer of a sequence store to a directory, one chunk of genes at a time.
+
+    Each array of each region is appended to a raw file of the directory as chunks are
+    written, so the memory used does not depend on the number of genes. Genes are listed
+    in a store.json file with the hashes of their rows (see feature_manifest.hash_row).
+    """
+
+    ARRAY_TYPES = {
+        "packed": np.uint8,
+        "lengths": np.int64,
+        "run_starts": np.int64,
+        "run_lengths": np.int64,
+        "run_characters": np.uint8,
+    }
+
+    def __init__(self, store_path: str):
+        """Start writing a sequence store.
+
+        Args:
+            store_path (str): Path to the store directory.
+        """
+        self.store_path = store_path
+        parent_directory = os.path.dirname(os.path.abspath(store_path))
+        self.temp_directory = tempfile.mkdtemp(dir=parent_directory)
+        self.gene_ids: List[str] = []
+        self.transcript_ids: List[str] = []
+        self.nucleotide_counts = {region: 0 for region in STORE_REGIONS}
+        for region in STORE_REGIONS:
+            for name in self.ARRAY_TYPES:
+                open(os.path.join(self.temp_directory, f"{region}.{name}"), "wb").close()
+
+    def write(self, store: SequenceStore) -> None:
+        """Append the genes of a packed chunk to the store.
+
+        Args:
+            store (SequenceStore): Packed chunk of genes (see pack_sequence_store).
+        """
+        self.gene_ids += store.gene_ids
+        self.transcript_ids += store.transcript_ids
+        for region in STORE_REGIONS:
+            sequences = store.regions[region]
+            arrays = sequences._replace(
+                run_starts=sequences.run_starts + self.nucleotide_counts[region]
+            )._asdict()
+            for name in self.ARRAY_TYPES:
+                with open(os.path.join(self.temp_directory, f"{region}.{name}"), "ab") as array_file:
+                    arrays[name].tofile(array_file)
+            self.nucleotide_counts[region] += int(sequences.offsets[-1])
+
+    def close(self, row_hashes: List[str]) -> None:
+        """Move the store into place once all genes are written.
+
+        Args:
+            row_hashes (List[str]): Hash of the sequences of each gene.
+        """
+        try:
+            with open(
+                os.path.join(self.temp_directory, "store.json"), "w", encoding="utf-8"
+            ) as store_file:
+                json.dump(
+                    {
+                        "regions": list(STORE_REGIONS),
+                        "gene_ids": self.gene_ids,
+                        "transcript_ids": self.transcript_ids,
+                        "rows": row_hashes,
+                    },
+                    store_file,
+                )
+            if os.path.isdir(self.store_path):
+                shutil.rmtree(self.store_path)
+            os.replace(self.temp_directory, self.store_path)
+        finally:
+            if os.path.isdir(self.temp_directory):
+                shutil.rmtree(self.temp_directory)
+
+
+def load_sequence_store(store_path: str) -> SequenceStore:
+    """Load a sequence store written by SequenceStoreWriter.
+
+    The arrays are memory-mapped, so the packed sequences are only read from disk as they
+    are used.
+
+    Args:
+        store_path (str): Path to the store directory.
+
+    Returns:
+        SequenceStore: The packed genes.
+    """
+    with open(os.path.join(store_path, "store.json"), "r", encoding="utf-8") as store_file:
+        metadata = json.load(store_file)
+
+    regions = {}
+    for region in metadata["regions"]:
+        arrays = {}
+        for name, dtype in SequenceStoreWriter.ARRAY_TYPES.items():
+            array_path = os.path.join(store_path, f"{region}.{name}")
+            arrays[name] = (
+                np.memmap(array_path, dtype=dtype, mode="r")
+                if os.path.getsize(array_path)
+                else np.zeros(0, dtype=dtype)
+            )
+        offsets = np.zeros(len(arrays["lengths"]) + 1, dtype=np.int64)
+        np.cumsum(
+            arrays["lengths"] + -arrays["lengths"] % SEQUENCE_ALIGNMENT, out=offsets[1:]
+        )
+        regions[region] = PackedSequences(offsets=offsets, **arrays)
+
+    return SequenceStore(metadata["gene_ids"], metadata["transcript_ids"], regions)
+
+
+def read_store_row_hashes(store_path: str) -> Optional[List[str]]:
+    """Read the hashes of the rows of the genes of a sequence store.
+
+    Args:
+        store_path (str): Path to the store directory.
+
+    Returns:
+        Optional[List[str]]: Hash of each gene, or None if the store does not exist.
+    """
+    metadata_path = os.path.join(store_path, "store.json")
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path, "r", encoding="utf-8") as store_file:
+        return json.load(store_file)["rows"]
@@ -2,6 +2,7 @@
 
 import argparse
 from dna.dna_extraction import extract_dna_data
+from dna.ensembl_api import DEFAULT_POOL_SIZE
 from rna.rna_extraction import download_rna_data, process_rna_expression_data
 from dataset_integration import import_species_data, merge_datasets
 
@@ -15,10 +16,103 @@ def run_pipeline() -> None:
     subparsers = parser.add_subparsers(dest="command", help="sub-command help")
 
     # Adding sub-commands
-    subparsers.add_parser(
+    parser_extract_dna = subparsers.add_parser(
         "extract_dna_data",
         help="Query genomic sequences from Ensembl and extract DNA features.",
     )
+    parser_extract_dna.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Number of genes fetched concurrently per species. "
+        "Defaults to fetching one gene at a time.",
+    )
+    parser_extract_dna.add_argument(
+        "--fetch-mode",
+        choices=["sequential", "batched", "single_lookup"],
+        default="sequential",
+        help="Query Ensembl gene by gene (sequential), with POST batch requests (batched), "
+        "or with one expanded lookup and one region request per gene (single_lookup). "
+        "--max-in-flight fetches genes concurrently in the sequential mode only.",
+    )
+    parser_extract_dna.add_argument(
+        "--cache-path",
+        type=str,
+        default=None,
+        help="Path to a local SQLite cache of Ensembl responses, reused across runs.",
+    )
+    parser_extract_dna.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve Ensembl responses only from the cache (requires --cache-path).",
+    )
+    parser_extract_dna.add_argument(
+        "--resume",
+        action="store_true",
+        help="Checkpoint the extraction and continue an interrupted one "
+        "without fetching the genes already extracted.",
+    )
+    parser_extract_dna.add_argument(
+        "--pool-size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help="Number of connections to Ensembl kept alive and reused across requests, at "
+        f"least the number of genes fetched concurrently. Defaults to {DEFAULT_POOL_SIZE}.",
+    )
+    parser_extract_dna.add_argument(
+        "--update",
+        action="store_true",
+        help="Append to the extracted CSV files only the genes they have no row for, "
+        "e.g. after genes were added to the gene lists.",
+    )
+    parser_extract_dna.add_argument(
+        "--genome-dir",
+        type=str,
+        default=None,
+        help="Directory containing the genome FASTA and GFF3 files of each species. "
+        "If set, sequences are extracted locally instead of being queried from Ensembl.",
+    )
+    parser_extract_dna.add_argument(
+        "--fasta-dir",
+        type=str,
+        default=None,
+        help="Directory containing the genome FASTA file of each species. If set, genes "
+        "are looked up in Ensembl, but their promoters, terminators and UTRs are read from "
+        "the local genome (sequential fetch mode only).",
+    )
+    parser_extract_dna.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes computing the DNA features. Defaults to 1.",
+    )
+    parser_extract_dna.add_argument(
+        "--output-format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Add the DNA features to the CSV files (csv), or write them with the "
+        "sequences to Parquet files next to the CSV files (parquet).",
+    )
+    parser_extract_dna.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse the DNA features already computed and only compute the features "
+        "of new genes and new features.",
+    )
+    parser_extract_dna.add_argument(
+        "--kmer-sizes",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Count the k-mers of these sizes in the promoter, UTRs and terminator of each "
+        "gene into a sparse matrix next to each feature table, e.g. --kmer-sizes 1 2 3 4 5 6.",
+    )
+    parser_extract_dna.add_argument(
+        "--sequence-store",
+        action="store_true",
+        help="Pack the sequences of each CSV file with 2 bits per nucleotide into a sequence "
+        "store next to it, and compute the DNA features on the packed sequences.",
+    )
     parser_download_rna = subparsers.add_parser(
         "download_rna_data",
         help="Download fastq files containing mRNA expression data from NCBI SRA.",
@@ -33,24 +127,87 @@ def run_pipeline() -> None:
         type=int,
         help="Max number of files to download. Defaults to 10.",
     )
-    subparsers.add_parser(
+    parser_process_rna = subparsers.add_parser(
         "process_rna_expression",
         help="Process raw transcriptomic data to filter genes and "
         "obtain median expression of each gene.",
     )
-    subparsers.add_parser(
+    parser_process_rna.add_argument(
+        "--convert-quant-files",
+        action="store_true",
+        help="Also convert the quant.sf files to csv files (the expression matrices are "
+        "created from the quant.sf files directly).",
+    )
+    parser_process_rna.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes reading the quant files of each species. Defaults to 1.",
+    )
+    parser_process_rna.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="Store the expression matrices on disk by blocks of samples and process them "
+        "by chunks of transcripts, so that the memory used does not depend on the number "
+        "of samples.",
+    )
+    parser_process_rna.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only add the samples of new quant files to the expression matrices stored "
+        "on disk (see --out-of-core), instead of creating them again.",
+    )
+    parser_merge = subparsers.add_parser(
         "merge_datasets",
         help="Merge processed genomic and transcriptomic data to obtain final dataset.",
     )
+    parser_merge.add_argument(
+        "--dna-format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Format of the DNA feature tables (see extract_dna_data --output-format).",
+    )
 
     args = parser.parse_args()
 
+    if args.command == "extract_dna_data" and args.offline and args.cache_path is None:
+        parser.error("--offline requires --cache-path, the cache to serve the responses from.")
+    if (
+        args.command == "extract_dna_data"
+        and args.max_in_flight is not None
+        and args.fetch_mode != "sequential"
+    ):
+        parser.error(f"--max-in-flight cannot be used with the {args.fetch_mode} fetch mode.")
+    if args.command == "extract_dna_data" and args.fasta_dir is not None:
+        if args.genome_dir is not None:
+            parser.error(
+                "--fasta-dir cannot be used with --genome-dir, which reads the genome "
+                "FASTA files too."
+            )
+        if args.fetch_mode != "sequential":
+            parser.error("--fasta-dir can only be used with the sequential fetch mode.")
+
     # Load species data from csv (dict species names:tax IDs)
     species = import_species_data("species_ids.csv")
 
     if args.command == "extract_dna_data":
         # Query genomic sequences from Ensembl and extract DNA features.
-        extract_dna_data()
+        extract_dna_data(
+            max_in_flight=args.max_in_flight,
+            fetch_mode=args.fetch_mode,
+            cache_path=args.cache_path,
+            offline=args.offline,
+            resume=args.resume,
+            genome_directory=args.genome_dir,
+            workers=args.workers,
+            output_format=args.output_format,
+            incremental=args.incremental,
+            kmer_sizes=args.kmer_sizes,
+            sequence_store=args.sequence_store,
+            update=args.update,
+            pool_size=args.pool_size,
+            fasta_directory=args.fasta_dir,
+        )
     elif args.command == "download_rna_data":
         # Download fastq files containing mRNA expression data from NCBI SRA.
         if not args.output_directory:
@@ -71,13 +228,18 @@ def run_pipeline() -> None:
             )
     elif args.command == "process_rna_expression":
         # Process raw quant.sf files from the nf-core/rnaseq pipeline to obtain median expression for each gene
-        process_rna_expression_data()
+        process_rna_expression_data(
+            convert_quant_files=args.convert_quant_files,
+            workers=args.workers,
+            out_of_core=args.out_of_core,
+            incremental=args.incremental,
+        )
     elif args.command == "merge_datasets":
         # Merge processed genomic and transcriptomic data to obtain final dataset.
         species_names = list(species.keys())
         for species_name in species_names:
             species_name = "_".join(species_name.lower().split(" "))
-            merge_datasets(species_name=species_name)
+            merge_datasets(species_name=species_name, dna_format=args.dna_format)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,31 @@
 import os
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pa_csv
+from rna.data_conversion_helper_functions.expression_matrix_store import (
+    DEFAULT_CHUNK_MEMORY,
+    STORE_SUFFIX,
+    ExpressionMatrixStore,
+)
+
+# Columns of the quant files read into the expression matrices, with their types
+QUANT_COLUMN_TYPES = {
+    "Name": pa.string(),
+    "EffectiveLength": pa.float64(),
+    "TPM": pa.float64(),
+    "NumReads": pa.float64(),
+}
+
+# Folders of the quant files of a species, with their extension and delimiter, in order of
+# preference: Salmon quant.sf files (TSV), then their CSV copies (see convert_quantsf_to_csv)
+QUANT_FILE_FOLDERS = (("sf_files", ".sf", "\t"), ("csv_files", ".csv", ","))
 
 
 def get_length_scaled_tpm_matrix(
@@ -41,12 +67,387 @@ import os
 import pandas as pd
 
 
-def create_expression_matrix(raw_data_path: str, processed_data_path: str) -> None:
+def find_quant_files(species_path: str) -> List[str]:
+    """Find the quant files of a species.
+
+    The quant.sf files are read directly when there are any, so converting them to CSV
+    files first (see convert_quantsf_to_csv) is optional.
+
+    Args:
+        species_path (str): Path to the raw quant files folder of the species.
+
+    Returns:
+        List[str]: Paths to the quant files, sorted by name (empty if there are none).
+    """
+    for folder, extension, _ in QUANT_FILE_FOLDERS:
+        folder_path = os.path.join(species_path, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        quant_files = sorted(
+            filename for filename in os.listdir(folder_path) if filename.endswith(extension)
+        )
+        if quant_files:
+            return [os.path.join(folder_path, filename) for filename in quant_files]
+    return []
+
+
+def get_run_id(file_path: str) -> str:
+    """Get the run ID of a quant file, e.g. "DRR513083" for "quant_DRR513083.sf".
+
+    Args:
+        file_path (str): Path to the quant file.
+
+    Returns:
+        str: The run ID.
+    """
+    return os.path.splitext(os.path.basename(file_path))[0].split("_")[1]
+
+
+def read_quant_file(file_path: str, use_threads: bool = True) -> pa.Table:
+    """Read the transcript IDs, effective lengths, TPM and read counts of a quant file.
+
+    The file is read once with the pyarrow CSV reader, parsing only the needed columns with
+    their types.
+
+    Args:
+        file_path (str): Path to a quant.sf file or its CSV copy.
+        use_threads (bool): Whether to parse blocks of the file in parallel threads.
+
+    Returns:
+        pa.Table: Name, EffectiveLength, TPM and NumReads columns of the file.
+    """
+    delimiter = next(
+        delimiter
+        for _, extension, delimiter in QUANT_FILE_FOLDERS
+        if file_path.endswith(extension)
+    )
+    return pa_csv.read_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(use_threads=use_threads),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(QUANT_COLUMN_TYPES), column_types=QUANT_COLUMN_TYPES
+        ),
+    )
+
+
+def read_quant_file_buffer(file_path: str) -> pa.Buffer:
+    """Read a quant file in a worker process, into an Arrow IPC stream.
+
+    Args:
+        file_path (str): Path to a quant.sf file or its CSV copy.
+
+    Returns:
+        pa.Buffer: The table of the file (see read_quant_file), serialized in one buffer
+                   that is sent back to the parent process and read there without copies.
+    """
+    # Each worker reads one file, the files being read in parallel by the workers
+    table = read_quant_file(file_path, use_threads=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def read_quant_files(
+    quant_files: List[str], executor: Optional[Executor] = None
+) -> List[pa.Table]:
+    """Read the quant files of a species, in parallel worker processes if given.
+
+    Args:
+        quant_files (List[str]): Paths to the quant files.
+        executor (Optional[Executor]): Process pool reading the files, which are read in
+                                       this process by default.
+
+    Returns:
+        List[pa.Table]: The table of each file (see read_quant_file), in the order of the files.
+    """
+    if executor is None:
+        return [read_quant_file(file_path) for file_path in quant_files]
+    return [
+        pa.ipc.open_stream(buffer).read_all()
+        for buffer in executor.map(read_quant_file_buffer, quant_files)
+    ]
+
+
+class ExpressionMatrices(NamedTuple):
+    """Read counts, abundances and effective lengths of the samples of a species."""
+
+    # Transcript IDs of the rows, in order of first appearance in the quant files
+    transcript_ids: pd.Index
+    # Run IDs of the columns
+    run_ids: List[str]
+    # Matrices of transcripts x samples, NaN for transcripts missing from a sample
+    counts: np.ndarray
+    abundances: np.ndarray
+    lengths: np.ndarray
+
+    def to_frames(self) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Wrap the matrices in DataFrames, without copying them.
+
+        Returns:
+            Tuple[DataFrame, DataFrame, DataFrame]: The counts, abundance and length matrices
+                                                    (see get_length_scaled_tpm_matrix).
+        """
+        return tuple(
+            pd.DataFrame(matrix, index=self.transcript_ids, columns=self.run_ids, copy=False)
+            for matrix in (self.counts, self.abundances, self.lengths)
+        )
+
+
+def index_transcripts(
+    quant_tables: List[pa.Table], index_ids: Optional[pa.Array] = None
+) -> Tuple[pd.Index, List[Optional[np.ndarray]]]:
+    """Build the transcript index shared by the samples of a species.
+
+    Args:
+        quant_tables (List[pa.Table]): Tables of the quant files (see read_quant_file).
+        index_ids (Optional[pa.Array]): Transcript IDs of the first rows of the index, e.g.
+                                        the rows of the samples of an expression matrix
+                                        store. The index starts empty by default.
+
+    Returns:
+        Tuple[pd.Index, List[Optional[np.ndarray]]]: Union of the transcript IDs of the
+            samples, in order of first appearance, and the row of each transcript of each
+            sample, with -1 for duplicates of a transcript ID in the sample. The rows are
+            None for the samples listing the first transcripts of the index in its order.
+    """
+    if index_ids is None:
+        index_ids = pa.array([], type=pa.string())
+    sample_positions: List[Optional[np.ndarray]] = []
+    previous_ids = None
+    for table in quant_tables:
+        transcript_ids = table.column("Name").combine_chunks()
+        # Salmon lists all the transcripts of its index, in the same order for all samples
+        if previous_ids is not None and transcript_ids.equals(previous_ids):
+            sample_positions.append(sample_positions[-1])
+            continue
+        previous_ids = transcript_ids
+
+        positions = pc.index_in(transcript_ids, value_set=index_ids)
+        if positions.null_count:
+            new_ids = transcript_ids.filter(positions.is_null()).unique()
+            index_ids = pa.concat_arrays([index_ids, new_ids])
+            positions = pc.index_in(transcript_ids, value_set=index_ids)
+        positions = positions.to_numpy()
+
+        if np.bincount(positions, minlength=len(index_ids)).max(initial=0) > 1:
+            # Keep the first row of duplicated transcript IDs
+            positions = np.where(pd.Index(positions).duplicated(keep="first"), -1, positions)
+        elif np.array_equal(positions, np.arange(len(positions))):
+            positions = None
+        sample_positions.append(positions)
+
+    transcript_index = pd.Index(
+        index_ids.to_numpy(zero_copy_only=False), dtype=object, name="Name"
+    )
+    return transcript_index, sample_positions
+
+
+def assemble_expression_matrices(
+    quant_tables: List[pa.Table],
+    run_ids: List[str],
+    dtype: np.dtype = np.float64,
+    index_ids: Optional[pa.Array] = None,
+) -> ExpressionMatrices:
+    """Assemble the quant files of a species into count, abundance and length matrices.
+
+    The transcript index is built up front, then the columns of each sample are copied into
+    preallocated matrices, so assembling the matrices is linear in the number of samples.
+    The tables are released as they are copied, and each matrix is stored by column, so that
+    its memory is only used as its columns are filled: peak memory stays close to the size
+    of the matrices.
+
+    Args:
+        quant_tables (List[pa.Table]): Tables of the quant files (see read_quant_file). The
+                                       list is emptied.
+        run_ids (List[str]): Run ID of each quant file.
+        dtype (np.dtype): Type of the matrix values, e.g. np.float32 to halve their memory.
+        index_ids (Optional[pa.Array]): Transcript IDs of the first rows of the matrices
+                                        (see index_transcripts).
+
+    Returns:
+        ExpressionMatrices: The matrices of the samples, with a column per run ID.
+    """
+    transcript_index, sample_positions = index_transcripts(quant_tables, index_ids)
+    shape = (len(transcript_index), len(run_ids))
+    matrices = ExpressionMatrices(
+        transcript_index,
+        list(run_ids),
+        *(np.empty(shape, dtype=dtype, order="F") for _ in range(3)),
+    )
+
+    # Reversed, so that each table is released once copied
+    quant_tables.reverse()
+    for column_number, positions in enumerate(sample_positions):
+        table = quant_tables.pop()
+        for matrix, column in zip(
+            (matrices.counts, matrices.abundances, matrices.lengths),
+            ("NumReads", "TPM", "EffectiveLength"),
+        ):
+            values = table.column(column).to_numpy()
+            matrix_column = matrix[:, column_number]
+            if positions is None:
+                matrix_column[: len(values)] = values
+                matrix_column[len(values) :] = np.nan
+            else:
+                matrix_column.fill(np.nan)
+                kept = positions >= 0
+                matrix_column[positions[kept]] = values[kept]
+
+    return matrices
+
+
+def append_quant_files(
+    store: ExpressionMatrixStore,
+    quant_files: List[str],
+    executor: Optional[Executor] = None,
+    dtype: np.dtype = np.float64,
+    chunk_memory: int = DEFAULT_CHUNK_MEMORY,
+) -> None:
+    """Append the samples of quant files to an expression matrix store.
+
+    The quant files are read by batches, whose matrices take about chunk_memory bytes, and
+    each batch is written as a block of the store, so the memory used does not depend on
+    the number of samples. The first batch fills up the last block of the store.
+
+    Args:
+        store (ExpressionMatrixStore): Store of the species, saved by the caller.
+        quant_files (List[str]): Paths to the quant files of the new samples.
+        executor (Optional[Executor]): Process pool reading the files (see read_quant_files).
+        dtype (np.dtype): Type of the values of the blocks.
+        chunk_memory (int): Number of bytes of the matrices of each batch.
+    """
+    position = 0
+    while position < len(quant_files):
+        # The first batch holds a single sample if the number of transcripts is not known yet
+        sample_memory = 3 * np.dtype(dtype).itemsize * len(store.transcript_ids)
+        block_size = max(1, chunk_memory // sample_memory) if sample_memory else 1
+        batch_size = block_size
+        if len(store.block_sizes) and store.block_sizes[-1] < block_size:
+            batch_size -= store.block_sizes[-1]
+        batch_files = quant_files[position : position + batch_size]
+        matrices = assemble_expression_matrices(
+            read_quant_files(batch_files, executor),
+            [get_run_id(file_path) for file_path in batch_files],
+            dtype,
+            pa.array(store.transcript_ids, type=pa.string()),
+        )
+        store.append(
+            matrices.transcript_ids,
+            matrices.run_ids,
+            matrices.counts,
+            matrices.abundances,
+            matrices.lengths,
+            block_size,
+        )
+        position += len(batch_files)
+
+
+def create_expression_matrix_store(
+    quant_files: List[str],
+    store_path: str,
+    executor: Optional[Executor] = None,
+    dtype: np.dtype = np.float64,
+    chunk_memory: int = DEFAULT_CHUNK_MEMORY,
+) -> None:
+    """Create the expression matrix store of a species, replacing any existing store.
+
+    Args:
+        quant_files (List[str]): Paths to the quant files of the species.
+        store_path (str): Path to the store directory (see ExpressionMatrixStore).
+        executor (Optional[Executor]): Process pool reading the files (see read_quant_files).
+        dtype (np.dtype): Type of the values of the blocks.
+        chunk_memory (int): Number of bytes of the matrices of each batch of samples.
+    """
+    parent_directory = os.path.dirname(os.path.abspath(store_path))
+    temp_directory = tempfile.mkdtemp(dir=parent_directory)
+    try:
+        store = ExpressionMatrixStore(temp_directory)
+        append_quant_files(store, quant_files, executor, dtype, chunk_memory)
+        store.save()
+        if os.path.isdir(store_path):
+            shutil.rmtree(store_path)
+        os.replace(temp_directory, store_path)
+    finally:
+        if os.path.isdir(temp_directory):
+            shutil.rmtree(temp_directory)
+
+
+def update_expression_matrix_store(
+    quant_files: List[str],
+    store_path: str,
+    executor: Optional[Executor] = None,
+    dtype: np.dtype = np.float64,
+    chunk_memory: int = DEFAULT_CHUNK_MEMORY,
+) -> int:
+    """Add the samples of new quant files to the expression matrix store of a species.
+
+    Only the quant files whose run IDs are missing from the store are read, and their
+    samples appended to it (see append_quant_files), so updating the store costs the same
+    whatever the number of samples already in it. The store is created if it does not
+    exist, and rebuilt if runs were removed from the quant files.
+
+    Args:
+        quant_files (List[str]): Paths to the quant files of the species.
+        store_path (str): Path to the store directory (see ExpressionMatrixStore).
+        executor (Optional[Executor]): Process pool reading the files (see read_quant_files).
+        dtype (np.dtype): Type of the values of the new blocks.
+        chunk_memory (int): Number of bytes of the matrices of each batch of samples.
+
+    Returns:
+        int: Number of samples added to the store.
+    """
+    store = ExpressionMatrixStore(store_path)
+    run_ids = [get_run_id(file_path) for file_path in quant_files]
+    removed_run_ids = np.setdiff1d(store.run_ids, run_ids)
+    if len(removed_run_ids):
+        print(
+            f"Rebuilding {store_path}, as {len(removed_run_ids)} runs no longer have "
+            f"quant files: {', '.join(removed_run_ids[:5])}"
+        )
+        create_expression_matrix_store(quant_files, store_path, executor, dtype, chunk_memory)
+        return len(quant_files)
+
+    ingested_run_ids = set(store.run_ids.tolist())
+    new_quant_files = [
+        file_path
+        for file_path, run_id in zip(quant_files, run_ids)
+        if run_id not in ingested_run_ids
+    ]
+    if new_quant_files:
+        append_quant_files(store, new_quant_files, executor, dtype, chunk_memory)
+        store.save()
+    return len(new_quant_files)
+
+
+def create_expression_matrix(
+    raw_data_path: str,
+    processed_data_path: str,
+    dtype: np.dtype = np.float64,
+    workers: int = 1,
+    out_of_core: bool = False,
+    chunk_memory: int = DEFAULT_CHUNK_MEMORY,
+    incremental: bool = False,
+) -> None:
     """Create the expression matrices for all species.
 
+    In out-of-core mode, the matrix of each species is written to an expression matrix
+    store (see ExpressionMatrixStore) instead of a csv file, without holding the matrices
+    of all the samples in memory. In incremental mode, the samples of new quant files are
+    added to the existing stores instead of rebuilding them (see
+    update_expression_matrix_store).
+
     Args:
         raw_data_path (str): Path to the folder containing raw quant files.
         processed_data_path (str): Path to store the processed expression matrix csv files.
+        dtype (np.dtype): Type of the values of the matrices (see assemble_expression_matrices).
+        workers (int): Number of processes reading the quant files of each species.
+        out_of_core (bool): Whether to write expression matrix stores.
+        chunk_memory (int): Number of bytes of the matrices of each batch of samples in
+                            out-of-core mode.
+        incremental (bool): Whether to only add the new samples to the expression matrix
+                            stores, which implies out-of-core mode.
 
     Returns:
         None: This function does not return a value but outputs files to the specified directory.
@@ -54,43 +455,57 @@ def create_expression_matrix(raw_data_path: str, processed_data_path: str) -> No
     if not os.path.isdir(raw_data_path):
         print(f"The provided path {raw_data_path} is not a directory.")
         return
-    for species in os.listdir(raw_data_path):
-        raw_csv_data_path = os.path.join(raw_data_path, species, "csv_files")
-        if not os.path.isdir(raw_csv_data_path):
-            continue
-        if not os.listdir(raw_csv_data_path):
-            continue
-        abundance_mat = pd.DataFrame()
-        length_mat = pd.DataFrame()
-        counts_mat = pd.DataFrame()
-        for quant_file in os.listdir(raw_csv_data_path):
-            file_path = os.path.join(raw_csv_data_path, quant_file)
-            abundance_df = pd.read_csv(file_path, usecols=["Name", "TPM"]).set_index(
-                "Name"
-            )
-            length_df = pd.read_csv(
-                file_path, usecols=["Name", "EffectiveLength"]
-            ).set_index("Name")
-            counts_df = pd.read_csv(file_path, usecols=["Name", "NumReads"]).set_index(
-                "Name"
-            )
-            run_id = quant_file.split("_")[1][:-4]
-            abundance_df.rename(columns={"TPM": run_id}, inplace=True)
-            length_df.rename(columns={"EffectiveLength": run_id}, inplace=True)
-            counts_df.rename(columns={"NumReads": run_id}, inplace=True)
-            abundance_df = abundance_df[~abundance_df.index.duplicated(keep="first")]
-            length_df = length_df[~length_df.index.duplicated(keep="first")]
-            counts_df = counts_df[~counts_df.index.duplicated(keep="first")]
-            abundance_mat = pd.concat([abundance_mat, abundance_df], axis=1, sort=False)
-            length_mat = pd.concat([length_mat, length_df], axis=1, sort=False)
-            counts_mat = pd.concat([counts_mat, counts_df], axis=1, sort=False)
-
-        length_scaled_tpm_mat = get_length_scaled_tpm_matrix(
-            counts_mat, abundance_mat, length_mat
+
+    # Workers are spawned rather than forked, as forking a multi-threaded process is unsafe.
+    executor = (
+        ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
         )
-        expression_matrix_path = os.path.join(processed_data_path, f"{species}.csv")
-        length_scaled_tpm_mat.to_csv(expression_matrix_path)
-        print(f"\nExpression matrix for {species} created successfully.")
+        if workers > 1
+        else None
+    )
+    try:
+        for species in os.listdir(raw_data_path):
+            quant_files = find_quant_files(os.path.join(raw_data_path, species))
+            if not quant_files:
+                continue
+            expression_matrix_path = os.path.join(processed_data_path, f"{species}.csv")
+            store_path = os.path.join(processed_data_path, f"{species}{STORE_SUFFIX}")
+
+            if incremental or out_of_core:
+                if incremental:
+                    added_sample_count = update_expression_matrix_store(
+                        quant_files, store_path, executor, dtype, chunk_memory
+                    )
+                else:
+                    create_expression_matrix_store(
+                        quant_files, store_path, executor, dtype, chunk_memory
+                    )
+                # Only the latest matrix of the species is processed
+                if os.path.exists(expression_matrix_path):
+                    os.remove(expression_matrix_path)
+            else:
+                # Each quant file is read once
+                quant_tables = read_quant_files(quant_files, executor)
+                matrices = assemble_expression_matrices(
+                    quant_tables, [get_run_id(file_path) for file_path in quant_files], dtype
+                )
+
+                length_scaled_tpm_mat = get_length_scaled_tpm_matrix(*matrices.to_frames())
+                length_scaled_tpm_mat.to_csv(expression_matrix_path)
+                if os.path.isdir(store_path):
+                    shutil.rmtree(store_path)
+
+            if incremental:
+                print(
+                    f"\nAdded {added_sample_count} new samples to the expression matrix "
+                    f"for {species}."
+                )
+            else:
+                print(f"\nExpression matrix for {species} created successfully.")
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
 
 if __name__ == "__main__":  # pragma: no cover, create expression matrix
@@ -0,0 +1,245 @@
+import os
+from typing import Iterator, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+# Suffix of the expression matrix store directories, written instead of the expression
+# matrix csv files in out-of-core mode
+STORE_SUFFIX = ".matrix"
+
+# Number of bytes of matrix values held in memory at once when writing or reading a store
+DEFAULT_CHUNK_MEMORY = 64 * 2**20
+
+
+class ExpressionMatrixStore:
+    """Expression matrix of a species, stored on disk by blocks of samples.
+
+    The length scaled TPM matrix (see get_length_scaled_tpm_matrix) only depends on the read
+    counts through the library size of each sample, and on the effective lengths through
+    their mean for each transcript. The store thus keeps the TPM matrix of the samples in
+    column-major .npy blocks of samples, with the library sizes and the sums and counts of
+    the effective lengths, and the length scaled TPM are computed from them in streaming
+    passes over the memory-mapped blocks (see scaling_factors and read_row_chunks). The
+    memory used depends on the chunk size, but not on the number of samples.
+
+    Each block holds the transcripts indexed when it was written: the transcripts added to
+    the index by later blocks are missing (NaN) from the samples of earlier blocks.
+
+    The run IDs of the samples are the manifest of the store: new samples are appended as
+    new blocks, or merged into a small last block, and the stored sums are updated with
+    theirs, so adding samples to the store does not rewrite the other blocks.
+    """
+
+    def __init__(self, store_path: str):
+        """Open a store, empty if its directory holds none yet.
+
+        Args:
+            store_path (str): Path to the store directory.
+        """
+        self.store_path = store_path
+        self.metadata_path = os.path.join(store_path, "store.npz")
+        self.transcript_ids = np.array([], dtype=str)
+        self.run_ids = np.array([], dtype=str)
+        # Name of the .npy file and number of samples of each block
+        self.block_files = np.array([], dtype=str)
+        self.block_sizes = np.array([], dtype=np.int64)
+        # Sum of the read counts of each sample
+        self.library_sizes = np.array([], dtype=np.float64)
+        # Sum and number of the effective lengths of each transcript over the samples
+        self.length_sums = np.array([], dtype=np.float64)
+        self.length_counts = np.array([], dtype=np.int64)
+
+        if os.path.exists(self.metadata_path):
+            with np.load(self.metadata_path, allow_pickle=False) as arrays:
+                for name in (
+                    "transcript_ids",
+                    "run_ids",
+                    "block_files",
+                    "block_sizes",
+                    "library_sizes",
+                    "length_sums",
+                    "length_counts",
+                ):
+                    setattr(self, name, arrays[name])
+
+    def block_path(self, block_number: int) -> str:
+        """Get the path to the TPM matrix of a block.
+
+        Args:
+            block_number (int): Number of the block, from 0.
+
+        Returns:
+            str: Path to the .npy file of the block.
+        """
+        return os.path.join(self.store_path, self.block_files[block_number])
+
+    def load_block(self, block_number: int) -> np.ndarray:
+        """Memory-map the TPM matrix of a block.
+
+        Args:
+            block_number (int): Number of the block, from 0.
+
+        Returns:
+            np.ndarray: Read-only transcripts x samples matrix of the block, by column.
+        """
+        return np.load(self.block_path(block_number), mmap_mode="r")
+
+    def append(
+        self,
+        transcript_ids: Sequence[str],
+        run_ids: Sequence[str],
+        counts: np.ndarray,
+        abundances: np.ndarray,
+        lengths: np.ndarray,
+        block_size: Optional[int] = None,
+    ) -> None:
+        """Write the matrices of new samples as a new block (see assemble_expression_matrices).
+
+        The block is only listed in the store once it is saved. If the last block of the
+        store holds few samples, e.g. after an update of the store with a small batch of
+        samples, it is rewritten with the new samples instead, so that the number of blocks
+        stays small.
+
+        Args:
+            transcript_ids (Sequence[str]): Transcript IDs of the rows of the matrices,
+                                            starting with the transcripts of the store.
+            run_ids (Sequence[str]): Run IDs of the columns of the matrices.
+            counts (np.ndarray): Read counts of the samples, NaN for missing transcripts.
+            abundances (np.ndarray): TPM of the samples.
+            lengths (np.ndarray): Effective lengths of the samples.
+            block_size (Optional[int]): Largest number of samples of the last block for the
+                                        new samples to be merged into it. New samples are
+                                        written to a new block by default.
+        """
+        os.makedirs(self.store_path, exist_ok=True)
+        block = np.asfortranarray(abundances)
+        block_start = len(self.run_ids)
+        if (
+            block_size is not None
+            and len(self.block_sizes)
+            and self.block_sizes[-1] + len(run_ids) <= block_size
+        ):
+            # Transcripts added to the index by the new samples are missing from the last block
+            last_block = self.load_block(-1)
+            block = np.full(
+                (len(transcript_ids), last_block.shape[1] + len(run_ids)),
+                np.nan,
+                dtype=block.dtype,
+                order="F",
+            )
+            block[: last_block.shape[0], : last_block.shape[1]] = last_block
+            block[:, last_block.shape[1] :] = abundances
+            block_start -= last_block.shape[1]
+            self.block_files = self.block_files[:-1]
+            self.block_sizes = self.block_sizes[:-1]
+
+        # Blocks are named after their samples, so a block is never overwritten while listed
+        block_file = f"abundances_{block_start}_{len(self.run_ids) + len(run_ids)}.npy"
+        np.save(os.path.join(self.store_path, block_file), block)
+        self.block_files = np.append(self.block_files, block_file)
+        self.block_sizes = np.append(self.block_sizes, block.shape[1])
+
+        new_transcript_count = len(transcript_ids) - len(self.transcript_ids)
+        self.transcript_ids = np.array(transcript_ids, dtype=str)
+        self.run_ids = np.concatenate([self.run_ids, np.array(run_ids, dtype=str)])
+        self.library_sizes = np.concatenate(
+            [self.library_sizes, np.nansum(counts, axis=0, dtype=np.float64)]
+        )
+        self.length_sums = np.concatenate(
+            [self.length_sums, np.zeros(new_transcript_count)]
+        ) + np.nansum(lengths, axis=1, dtype=np.float64)
+        self.length_counts = np.concatenate(
+            [self.length_counts, np.zeros(new_transcript_count, dtype=np.int64)]
+        ) + np.count_nonzero(~np.isnan(lengths), axis=1)
+
+    def save(self) -> None:
+        """Record the blocks appended to the store, replacing its metadata at once.
+
+        The files of the blocks no longer listed in the store, e.g. merged into another
+        block, are then removed.
+        """
+        os.makedirs(self.store_path, exist_ok=True)
+        temp_path = self.metadata_path + ".tmp.npz"
+        with open(temp_path, "wb") as metadata_file:
+            np.savez(
+                metadata_file,
+                transcript_ids=self.transcript_ids,
+                run_ids=self.run_ids,
+                block_files=self.block_files,
+                block_sizes=self.block_sizes,
+                library_sizes=self.library_sizes,
+                length_sums=self.length_sums,
+                length_counts=self.length_counts,
+            )
+        os.replace(temp_path, self.metadata_path)
+
+        for filename in os.listdir(self.store_path):
+            if filename.endswith(".npy") and filename not in self.block_files:
+                os.remove(os.path.join(self.store_path, filename))
+
+    def length_means(self) -> np.ndarray:
+        """Get the mean effective length of each transcript over the samples.
+
+        Returns:
+            np.ndarray: Mean effective length of each transcript.
+        """
+        return self.length_sums / np.where(self.length_counts > 0, self.length_counts, np.nan)
+
+    def scaling_factors(self) -> np.ndarray:
+        """Compute the factor scaling the length scaled TPM of each sample to its library size.
+
+        The TPM of each sample are read from its block one column at a time.
+
+        Returns:
+            np.ndarray: Library size of each sample over the sum of its TPM multiplied by the
+                        mean effective lengths of the transcripts.
+        """
+        length_means = self.length_means()
+        length_tpm_sums: List[float] = []
+        for block_number in range(len(self.block_sizes)):
+            block = self.load_block(block_number)
+            block_length_means = length_means[: block.shape[0]]
+            for column_number in range(block.shape[1]):
+                length_tpm_sums.append(
+                    np.nansum(block[:, column_number] * block_length_means)
+                )
+        return self.library_sizes / np.array(length_tpm_sums, dtype=np.float64)
+
+    def read_row_chunks(
+        self, chunk_memory: int = DEFAULT_CHUNK_MEMORY
+    ) -> Iterator[pd.DataFrame]:
+        """Read the length scaled TPM matrix by chunks of transcripts.
+
+        Args:
+            chunk_memory (int): Number of bytes of the values of each chunk, which sets the
+                                number of transcripts of the chunks.
+
+        Returns:
+            Iterator[DataFrame]: Length scaled TPM of chunks of transcripts, indexed by
+                                 transcript ID, with a column per run ID.
+        """
+        length_means = self.length_means()
+        scaling_factors = self.scaling_factors()
+        blocks = [self.load_block(number) for number in range(len(self.block_sizes))]
+        block_starts = np.concatenate([[0], np.cumsum(self.block_sizes)])
+        chunk_size = max(1, chunk_memory // (8 * max(1, len(self.run_ids))))
+
+        for start in range(0, len(self.transcript_ids), chunk_size):
+            stop = min(start + chunk_size, len(self.transcript_ids))
+            abundances = np.full((stop - start, len(self.run_ids)), np.nan)
+            for block, block_start, block_stop in zip(
+                blocks, block_starts[:-1], block_starts[1:]
+            ):
+                # Transcripts indexed after the block was written are missing from its samples
+                block_rows = min(stop, block.shape[0]) - start
+                if block_rows > 0:
+                    abundances[:block_rows, block_start:block_stop] = block[
+                        start : start + block_rows
+                    ]
+
+            length_tpm = abundances * length_means[start:stop, np.newaxis]
+            yield pd.DataFrame(
+                length_tpm * scaling_factors,
+                index=pd.Index(self.transcript_ids[start:stop], name="Name"),
+                columns=self.run_ids,
+            )
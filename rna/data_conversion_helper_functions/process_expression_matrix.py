@@ -1,5 +1,10 @@
 import os
 import pandas as pd
+from rna.data_conversion_helper_functions.expression_matrix_store import (
+    DEFAULT_CHUNK_MEMORY,
+    STORE_SUFFIX,
+    ExpressionMatrixStore,
+)
 
 
 def calculate_rsd(expression_matrix: pd.DataFrame) -> pd.DataFrame:
@@ -49,14 +54,54 @@ def calculate_median_expression(
     return median_expression_df
 
 
-def process_expression_matrix(file_path: str, output_file_path: str) -> None:
+def process_expression_matrix_store(
+    store_path: str,
+    median_expression_path: str,
+    chunk_memory: int = DEFAULT_CHUNK_MEMORY,
+) -> None:
+    """Process an expression matrix store by chunks of transcripts.
+
+    The RSD and median expression of each transcript only depend on its row, so the rows
+    are filtered and their median expression written one chunk at a time.
+
+    Args:
+        store_path (str): Path to the expression matrix store (see ExpressionMatrixStore).
+        median_expression_path (str): Path to the median expression csv file.
+        chunk_memory (int): Number of bytes of the length scaled TPM of each chunk.
+    """
+    store = ExpressionMatrixStore(store_path)
+    # Header of the file if the store holds no transcript
+    pd.DataFrame(columns=["transcript_id", "median_exp"]).to_csv(
+        median_expression_path, index=False
+    )
+    for chunk_number, chunk in enumerate(store.read_row_chunks(chunk_memory)):
+        expression_matrix_df = chunk.reset_index().rename(columns={"Name": "transcript_id"})
+        matrix_expression_rsd = calculate_rsd(expression_matrix_df.copy())
+        filtered_expression_matrix = expression_matrix_df[
+            matrix_expression_rsd["rsd"] < 2
+        ]
+        median_expression_df = calculate_median_expression(filtered_expression_matrix)
+        median_expression_df.to_csv(
+            median_expression_path,
+            index=False,
+            mode="w" if chunk_number == 0 else "a",
+            header=chunk_number == 0,
+        )
+
+
+def process_expression_matrix(
+    file_path: str, output_file_path: str, chunk_memory: int = DEFAULT_CHUNK_MEMORY
+) -> None:
     """Process expression matrices for each species.
 
-    Filter for genes with RSD < 2 and calculate median expression.
+    Filter for genes with RSD < 2 and calculate median expression. Expression matrix stores
+    (see ExpressionMatrixStore) are processed by chunks of transcripts.
 
     Args:
         file_path (str): Path to processed expression matrix files.
         output_file_path (str): Path to store median expression csv files.
+        chunk_memory (int): Number of bytes of the length scaled TPM of each chunk of
+                            transcripts of the expression matrix stores.
 
     Returns:
         None: This function does not return a value but outputs files to the specified directory.
@@ -66,6 +111,16 @@ def process_expression_matrix(file_path: str, output_file_path: str) -> None:
         if species == ".gitignore" or species == "sample_homo_sapiens.csv":
             continue
         expression_matrix_path = os.path.join(file_path, species)
+        if species.endswith(STORE_SUFFIX):
+            process_expression_matrix_store(
+                expression_matrix_path,
+                os.path.join(
+                    output_file_path,
+                    f"rna_expression_{species[: -len(STORE_SUFFIX)]}.csv",
+                ),
+                chunk_memory,
+            )
+            continue
 
         # Read the csv file into a DataFrame
         expression_matrix_df = pd.read_csv(expression_matrix_path)
@@ -16,18 +16,42 @@ from rna.rna_download_logic.query_and_csv_production import (
 from rna.rna_download_logic.mRNA_fastq_download import download_sra_data
 
 
-def process_rna_expression_data() -> None:
-    """Process raw transcriptomic data to filter genes and obtain median expression of each gene."""
+def process_rna_expression_data(
+    convert_quant_files: bool = False,
+    workers: int = 1,
+    out_of_core: bool = False,
+    incremental: bool = False,
+) -> None:
+    """Process raw transcriptomic data to filter genes and obtain median expression of each gene.
+
+    Args:
+        convert_quant_files (bool): Whether to also convert the quant.sf files to csv files.
+                                    The expression matrices are created from the quant.sf
+                                    files directly either way.
+        workers (int): Number of processes reading the quant files of each species.
+        out_of_core (bool): Whether to store the expression matrices on disk by blocks of
+                            samples, for cohorts too large for the memory (see
+                            ExpressionMatrixStore).
+        incremental (bool): Whether to only add the samples of new quant files to the stored
+                            expression matrices, instead of creating them again.
+    """
 
     print("\nProcessing RNA expression data.\n")
 
-    # Convert raw quant.sf files (output of nf-core rna-seq pipeline) to csv files.
     raw_data_path = "rna/quant_files/raw"  # path to raw quant files folder
-    convert_all_species_files(raw_data_path)
+    if convert_quant_files:
+        # Convert raw quant.sf files (output of nf-core rna-seq pipeline) to csv files.
+        convert_all_species_files(raw_data_path)
 
     # Create expression matrices of length scaled TPM values, indexed by transcript ID.
     processed_data_path = "rna/quant_files/processed"
-    create_expression_matrix(raw_data_path, processed_data_path)
+    create_expression_matrix(
+        raw_data_path,
+        processed_data_path,
+        workers=workers,
+        out_of_core=out_of_core,
+        incremental=incremental,
+    )
 
     # Process expression matrices to filter for transcript with RSD < 2 and calculate median expression
     median_expression_path = "rna/median_expression_files"
@@ -100,4 +100,17 @@ def utr_data():
     expected_chromosome = 'chr1'
     expected_strand = '+'
 
-    return data, expected_utr5, expected_utr3, expected_chromosome, expected_strand
\ No newline at end of file
+    return data, expected_utr5, expected_utr3, expected_chromosome, expected_strand
+
+
+@pytest.fixture
+def write_quant_sf():
+    # Writes a Salmon quant.sf file from rows of Name, Length, EffectiveLength, TPM, NumReads
+    def write(path, rows):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            "Name\tLength\tEffectiveLength\tTPM\tNumReads\n"
+            + "".join("\t".join(map(str, row)) + "\n" for row in rows)
+        )
+
+    return write
@@ -46,3 +46,29 @@ def test_merge_datasets():
         mock_to_csv.assert_called_once_with(
             "merged_csv_files/merged_homo_sapiens_data.csv", index=False
         )
+
+
+def test_merge_datasets_parquet():
+    mock_dna_data = pd.DataFrame(
+        {"transcript_id": ["tx1", "tx2"], "cds_gc": pd.Series([0.5, 0.25], dtype="float32")}
+    )
+    mock_rna_data = pd.DataFrame(
+        {"transcript_id": ["tx2", "tx3"], "expression": [7.2, 1.0]}
+    )
+
+    with patch("os.path.exists", return_value=True), patch(
+        "pandas.read_parquet", return_value=mock_dna_data
+    ) as mock_read_parquet, patch(
+        "pandas.read_csv", return_value=mock_rna_data
+    ) as mock_read_csv, patch("pandas.DataFrame.to_csv"):
+
+        result = merge_datasets("homo_sapiens", dna_format="parquet")
+
+        mock_read_parquet.assert_called_once_with(
+            "dna/csv_files/ensembl_data_homo_sapiens.parquet"
+        )
+        mock_read_csv.assert_called_once_with(
+            "rna/median_expression_files/rna_expression_homo_sapiens.csv"
+        )
+        assert result["transcript_id"].tolist() == ["tx2"]
+        assert result["cds_gc"].dtype == "float32"
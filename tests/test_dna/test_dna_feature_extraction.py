@@ -4,13 +4,18 @@ import pytest  # Import pytest for automated testing
 import sys
 import os
 import csv
+import shutil
+import numpy as np
 import pandas as pd
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
 from itertools import product
 
 
 # Add the parent directory of `dna` to `sys.path`
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from dna import dna_feature_extraction
+from dna.feature_manifest import FeatureManifest, hash_row
 
 
 def test_compute_cds_codon_frequencies_standard_case():
@@ -54,6 +59,73 @@ def test_compute_cds_codon_frequencies_empty_case():
         )
 
 
+def test_compute_cds_codon_frequencies_batch_matches_per_row():
+    codons = ["".join(combination) for combination in product("ACGT", repeat=3)]
+    cds_sequences = ["AGTCAAAGTTAT", "", "A", "AG", "AGT", "TTTTGGGGCCCCAAAA", "ACGTACGTAC"]
+
+    codon_frequencies = dna_feature_extraction.compute_cds_codon_frequencies_batch(
+        cds_sequences, codons
+    )
+
+    assert codon_frequencies == [
+        dna_feature_extraction.compute_cds_codon_frequencies(cds, codons)
+        for cds in cds_sequences
+    ]
+    # Too short cds keep integer zero frequencies, as in the per-row function
+    assert type(codon_frequencies[1]["AAA"]) is int
+    assert type(codon_frequencies[0]["AAA"]) is float
+
+
+def test_compute_codon_counts_batch_ambiguous_codon():
+    codes, offsets = dna_feature_extraction.encode_sequences(["ATGNNNATGTA", "TAA"])
+
+    assert list(offsets) == [0, 12, 15]
+    counts = dna_feature_extraction.compute_codon_counts_batch(codes, offsets)
+
+    assert counts.shape == (2, 64)
+    # ATG is codon 16 * 0 + 4 * 3 + 2, TAA is codon 16 * 3
+    assert counts[0, 14] == 2 and counts[0].sum() == 2
+    assert counts[1, 48] == 1 and counts[1].sum() == 1
+
+
+def test_compute_dna_features_batch_matches_per_row():
+    genes = [
+        ("AAGTGC", "AGTCAAAGTTAT", "TATAAAGGGCCC"),
+        ("", "", ""),
+        ("GNC", "AG", "N"),
+        ("C", "AGTCGCAAATTTG", ""),
+    ]
+
+    features = dna_feature_extraction.compute_dna_features_batch(
+        utr5_sequences=[utr5 for utr5, _, _ in genes],
+        cds_sequences=[cds for _, cds, _ in genes],
+        utr3_sequences=[utr3 for _, _, utr3 in genes],
+    )
+
+    for index, (utr5, cds, utr3) in enumerate(genes):
+        expected_features = dna_feature_extraction.compute_cds_codon_frequencies(
+            cds, dna_feature_extraction.CODONS
+        )
+        expected_features.update(
+            dna_feature_extraction.compute_lengths(cds=cds, utr5=utr5, utr3=utr3)
+        )
+        expected_features.update(
+            dna_feature_extraction.compute_gc_content_sequence_components(
+                utr5=utr5, cds=cds, utr3=utr3
+            )
+        )
+        expected_features.update(
+            dna_feature_extraction.compute_gc_content_wobble_positions(cds)
+        )
+
+        row_features = {feature: values[index] for feature, values in features.items()}
+        assert row_features == expected_features
+        assert [type(value) for value in row_features.values()] == [
+            type(value) for value in expected_features.values()
+        ]
+        assert dna_feature_extraction.compute_dna_features(utr5, cds, utr3) == row_features
+
+
 def test_compute_lengths_standard_case():
     cds = "AGTCAAAGTTAT"
     utr5 = "AAA"
@@ -219,6 +291,185 @@ def test_extract_dna_features_standard():
         df.to_csv(extracted_features_filepath, index=False)
 
 
+def test_extract_dna_features_parallel_chunks(tmp_path):
+    input_folder_path = os.path.join(
+        os.path.dirname(__file__), "test_data/feature_extraction_csv_files"
+    )
+    sequential_folder_path = tmp_path / "sequential"
+    parallel_folder_path = tmp_path / "parallel"
+    shutil.copytree(input_folder_path, sequential_folder_path)
+    shutil.copytree(input_folder_path, parallel_folder_path)
+
+    dna_feature_extraction.extract_dna_features(str(sequential_folder_path))
+    dna_feature_extraction.extract_dna_features(
+        str(parallel_folder_path), workers=2, chunk_size=1
+    )
+
+    for filename in os.listdir(input_folder_path):
+        assert (sequential_folder_path / filename).read_bytes() == (
+            parallel_folder_path / filename
+        ).read_bytes()
+
+
+def test_map_pending_bounds_submitted_tasks():
+    read_tasks = []
+
+    def tasks():
+        for number in range(10):
+            read_tasks.append(number)
+            yield (number, 1)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = dna_feature_extraction.map_pending(executor, pow, tasks(), max_pending=3)
+        assert read_tasks == []
+        assert next(results) == 0
+        # Tasks are only read as results are consumed
+        assert len(read_tasks) <= 4
+        assert list(results) == list(range(1, 10))
+
+
+def test_read_row_chunks(tmp_path):
+    file_path = tmp_path / "ensembl_data_test.csv"
+    file_path.write_text("a,b\n1,2\n\n3,4\n5,6\n")
+
+    assert list(dna_feature_extraction.read_row_chunks(str(file_path), 2)) == [
+        [["1", "2"], ["3", "4"]],
+        [["5", "6"]],
+    ]
+
+
+def test_extract_dna_features_parquet(tmp_path):
+    input_folder_path = os.path.join(
+        os.path.dirname(__file__), "test_data/feature_extraction_csv_files"
+    )
+    csv_folder_path = tmp_path / "csv"
+    parquet_folder_path = tmp_path / "parquet"
+    shutil.copytree(input_folder_path, csv_folder_path)
+    shutil.copytree(input_folder_path, parquet_folder_path)
+
+    dna_feature_extraction.extract_dna_features(str(csv_folder_path))
+    dna_feature_extraction.extract_dna_features(
+        str(parquet_folder_path), chunk_size=2, output_format="parquet"
+    )
+
+    for filename in os.listdir(input_folder_path):
+        # The CSV files are left unchanged
+        with open(os.path.join(input_folder_path, filename), "rb") as file:
+            assert (parquet_folder_path / filename).read_bytes() == file.read()
+
+        features = pd.read_parquet(parquet_folder_path / filename.replace(".csv", ".parquet"))
+        expected_features = pd.read_csv(csv_folder_path / filename)
+        sequence_columns = list(features.columns[:7])
+        feature_columns = list(features.columns[7:])
+
+        assert list(features.columns) == list(expected_features.columns)
+        assert features["AAA"].dtype == "float32"
+        assert features["cds_gc"].dtype == "float32"
+        assert features["cds_length"].dtype == "int32"
+        assert (
+            features[sequence_columns].values
+            == expected_features[sequence_columns].fillna("").values
+        ).all()
+        assert np.allclose(
+            features[feature_columns].to_numpy(float),
+            expected_features[feature_columns].to_numpy(float),
+            rtol=1e-6,
+            equal_nan=True,
+        )
+
+    with pytest.raises(ValueError):
+        dna_feature_extraction.extract_dna_features(str(parquet_folder_path), output_format="tsv")
+
+
+def test_extract_dna_features_incremental(tmp_path):
+    input_folder_path = os.path.join(
+        os.path.dirname(__file__), "test_data/feature_extraction_csv_files"
+    )
+    filename = "ensembl_data_chlamydomonas_reinhardtii.csv"
+    shutil.copytree(input_folder_path, tmp_path / "full")
+    dna_feature_extraction.extract_dna_features(str(tmp_path / "full"))
+    expected_table = (tmp_path / "full" / filename).read_text()
+
+    # Feature table missing a feature, with a gene appended without its features
+    with open(tmp_path / "full" / filename, newline="") as file:
+        rows = list(csv.reader(file))
+    missing_column = rows[0].index("cds_wobble3_gc")
+    os.makedirs(tmp_path / "incremental")
+    with open(tmp_path / "incremental" / filename, "w", newline="") as file:
+        writer = csv.writer(file)
+        for row in rows[:-1]:
+            writer.writerow(row[:missing_column] + row[missing_column + 1 :])
+        writer.writerow(rows[-1][:7])
+    features = rows[0][7:]
+    features.remove("cds_wobble3_gc")
+    FeatureManifest(str(tmp_path / "incremental" / filename)).save(
+        features, [hash_row(row[:7]) for row in rows[1:-1]]
+    )
+
+    computed = []
+    original_compute_feature_rows = dna_feature_extraction.compute_feature_rows
+
+    def compute_feature_rows(rows, feature_names=None):
+        computed.append((len(rows), feature_names))
+        return original_compute_feature_rows(rows, feature_names)
+
+    with patch.object(dna_feature_extraction, "compute_feature_rows", compute_feature_rows):
+        dna_feature_extraction.extract_dna_features(
+            str(tmp_path / "incremental"), incremental=True
+        )
+
+    assert (tmp_path / "incremental" / filename).read_text() == expected_table
+    # Only the appended gene and the missing feature of the other genes are computed
+    assert (1, rows[0][7:]) in computed
+    assert (len(rows) - 2, ["cds_wobble3_gc"]) in computed
+    assert sum(count for count, _ in computed) == len(rows) - 1
+
+    # An up to date table is not rewritten
+    computed.clear()
+    with patch.object(dna_feature_extraction, "compute_feature_rows", compute_feature_rows):
+        dna_feature_extraction.extract_dna_features(
+            str(tmp_path / "incremental"), incremental=True
+        )
+    assert computed == []
+
+
+def test_extract_dna_features_incremental_parquet_appended_genes(tmp_path):
+    input_folder_path = os.path.join(
+        os.path.dirname(__file__), "test_data/feature_extraction_csv_files"
+    )
+    filename = "ensembl_data_chlamydomonas_reinhardtii.csv"
+    rows = []
+    for input_filename in sorted(os.listdir(input_folder_path)):
+        with open(os.path.join(input_folder_path, input_filename), newline="") as file:
+            rows += list(csv.reader(file))[len(rows) > 0 :]
+    for folder in ("full", "incremental"):
+        os.makedirs(tmp_path / folder)
+    with open(tmp_path / "full" / filename, "w", newline="") as file:
+        csv.writer(file).writerows(rows)
+    with open(tmp_path / "incremental" / filename, "w", newline="") as file:
+        csv.writer(file).writerows(rows[:2])
+
+    dna_feature_extraction.extract_dna_features(
+        str(tmp_path / "full"), chunk_size=1, output_format="parquet"
+    )
+    dna_feature_extraction.extract_dna_features(
+        str(tmp_path / "incremental"), chunk_size=1, output_format="parquet", incremental=True
+    )
+
+    # Genes appended to the CSV file, as with --update, fill chunks without reused rows
+    with open(tmp_path / "incremental" / filename, "a", newline="") as file:
+        csv.writer(file).writerows(rows[2:])
+    dna_feature_extraction.extract_dna_features(
+        str(tmp_path / "incremental"), chunk_size=1, output_format="parquet", incremental=True
+    )
+
+    parquet_filename = filename.replace(".csv", ".parquet")
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / "incremental" / parquet_filename),
+        pd.read_parquet(tmp_path / "full" / parquet_filename),
+    )
+
+
 def test_extract_dna_features_unexpected_input():
 
     input_folder_path = os.path.join(
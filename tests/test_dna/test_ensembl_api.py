@@ -10,6 +10,15 @@ from unittest.mock import patch, Mock, MagicMock
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 from dna import ensembl_api
 from dna.dna_extraction import query_dna_sequences_from_ensembl
+from dna.ensembl_cache import CacheMissError
+from dna.rate_limiter import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def rate_limiter():
+    # Requests paused by the rate limit errors of a test do not wait in the next tests
+    with patch.object(ensembl_api, "rate_limiter", RateLimiter()):
+        yield
 
 
 def test_get_cds_valid_id(sequence_PNW69574):
@@ -111,7 +120,8 @@ def test_get_utr_sequence_http_error(mock_sequence_region):
         {"seq": "ATGC"},
     ]
 
-    ensembl_api.get_utr_sequence(chromosome, strand, start, end, species)
+    with patch("time.sleep"):
+        utr_sequence = ensembl_api.get_utr_sequence(chromosome, strand, start, end, species)
 
     # Get the printed output
     printed_output = sys.stdout.getvalue()
@@ -121,6 +131,7 @@ def test_get_utr_sequence_http_error(mock_sequence_region):
 
     # Assert the exception message if needed
     assert printed_output == "Rate limit exceeded. Waiting before retrying...\n"
+    assert utr_sequence == "ATGC"
 
 
 @patch("ensembl_rest.sequence_region")
@@ -163,7 +174,7 @@ def test_request_with_retry(mock_lookup):
 
     mock_lookup.side_effect = [
         ensembl_rest.core.restclient.HTTPError(
-            response=MagicMock(status_code=429)
+            response=MagicMock(status_code=429, headers={"Retry-After": "1"})
         ),  # First call raises rate limit error
         mock_response,
     ]  # Second call returns response
@@ -179,10 +190,9 @@ def test_request_with_retry(mock_lookup):
         id=transcript_id, params={"expand": True, "utr": True}
     )
 
-    # Assert that time.sleep was called
-    mock_sleep.assert_called_once_with(
-        1
-    )  # Assuming sleep is called with a delay of 1 second
+    # Assert that time.sleep was called for the Retry-After delay of 1 second
+    mock_sleep.assert_called_once()
+    assert 0.9 < mock_sleep.call_args.args[0] <= 1
 
 
 @patch("ensembl_rest.lookup")
@@ -208,6 +218,42 @@ def test_request_with_retry_other_error(mock_lookup):
     assert transcript_data == expected_data
 
 
+@patch("ensembl_rest.lookup")
+def test_get_gene_row_lookup_error(mock_lookup):
+    mock_lookup.side_effect = ensembl_rest.core.restclient.HTTPError(
+        response=MagicMock(status_code=400)
+    )
+
+    # Genes that cannot be looked up are skipped
+    assert ensembl_api.get_gene_row("ENSG00000000001", "homo_sapiens") is None
+    assert mock_lookup.call_count == 1
+
+
+def test_configure_session():
+    ensembl_api.configure_session(4)
+    try:
+        adapter = ensembl_api.session.get_adapter(ensembl_api.ENSEMBL_REST_URL)
+
+        # The requests and ensembl_rest sessions share one pool of keep-alive connections
+        assert adapter._pool_maxsize == 4
+        assert (
+            ensembl_rest._default_client.rest_client.session.get_adapter(
+                ensembl_api.ENSEMBL_REST_URL
+            )
+            is adapter
+        )
+    finally:
+        ensembl_api.configure_session()
+
+
+@patch("dna.ensembl_api.session.get")
+def test_get_cds_uses_session(mock_get):
+    mock_get.return_value = MagicMock(text=">PNW69574\nATGC\nTAA\n")
+
+    assert ensembl_api.get_cds("PNW69574") == "ATGCTAA"
+    mock_get.assert_called_once()
+
+
 def test_read_gene_ids_from_file():
     filepath = os.path.join(
         os.path.dirname(__file__), "test_data/gene_lists/homo_sapiens_genes.txt"
@@ -302,8 +348,8 @@ def test_check_extracted_components_empty_cds(gene_ids, mock_lookup, mock_cds):
 
     mock_cds.return_value = ""
 
-    # Extract 1 filename of the txt files where the gene id lists are stored
-    species = os.listdir(gene_ids_folderpath)[0]
+    # Gene list of the species of the gene ID
+    species = "chlamydomonas_reinhardtii_genes.txt"
     # Extract DNA sequence components into csv files using ensembl_api
     gene_ids_filepath = os.path.join(gene_ids_folderpath, species)
     ensembl_api.get_data_as_csv([gene_ids_filepath], output_filepath)
@@ -338,8 +384,8 @@ def test_check_extracted_components_empty_transcript(
 
     mock_transcript_data.return_value = {}
 
-    # Extract 1 filename of the txt files where the gene id lists are stored
-    species = os.listdir(gene_ids_folderpath)[0]
+    # Gene list of the species of the gene ID
+    species = "chlamydomonas_reinhardtii_genes.txt"
     # Extract DNA sequence components into csv files using ensembl_api
     gene_ids_filepath = os.path.join(gene_ids_folderpath, species)
     ensembl_api.get_data_as_csv([gene_ids_filepath], output_filepath)
@@ -424,7 +470,334 @@ def test_query_dna_sequences_from_ensembl():
             "dna/gene_lists/homo_sapiens_genes_small.txt",
             "dna/gene_lists/mus_musculus_genes_small.txt",
         ]
-        mock_api_call.assert_called_once_with(expected_paths, "output_folder")
+        mock_api_call.assert_called_once_with(
+            expected_paths, "output_folder", fetch_mode="sequential", resume=False, update=False
+        )
 
         mock_listdir.assert_called_once_with("dna/gene_lists/")
         assert mock_isfile.call_count == len(mock_listdir.return_value)
+
+
+def test_split_into_batches():
+    batches = ensembl_api.split_into_batches(["a", "b", "c", "d", "e"], 2)
+    assert batches == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_parse_fasta_records():
+    raw_output = ">PNW69574.1 cds\nATGCC\nGGTAA\n>PNW87736\nATGNNN\nTTT\n"
+    sequences = ensembl_api.parse_fasta_records(raw_output)
+    assert sequences == {"PNW69574": "ATGCCGGTAA", "PNW87736": "ATGTTT"}
+
+
+@patch("dna.ensembl_api.session.post")
+def test_post_lookup_ids_batches_requests(mock_post):
+    gene_ids = [f"GENE{i}" for i in range(ensembl_api.LOOKUP_POST_MAX_IDS + 1)]
+    mock_post.return_value.json.side_effect = [
+        {"GENE0": {"canonical_transcript": "T0"}, "GENE1": None},
+        {gene_ids[-1]: {"canonical_transcript": "TLAST"}},
+    ]
+
+    lookups = ensembl_api.post_lookup_ids(gene_ids, species="homo sapiens")
+
+    assert mock_post.call_count == 2
+    assert lookups == {
+        "GENE0": {"canonical_transcript": "T0"},
+        gene_ids[-1]: {"canonical_transcript": "TLAST"},
+    }
+    first_body = mock_post.call_args_list[0].kwargs["json"]
+    assert len(first_body["ids"]) == ensembl_api.LOOKUP_POST_MAX_IDS
+    assert first_body["species"] == "homo sapiens"
+
+
+@patch("dna.ensembl_api.session.post")
+def test_post_sequence_ids_error(mock_post):
+    mock_post.side_effect = ensembl_api.requests.exceptions.RequestException("boom")
+    sequences = ensembl_api.post_sequence_ids(["PNW69574"], "cds")
+    assert sequences == {}
+
+
+@patch("dna.ensembl_api.post_sequence_regions")
+@patch("dna.ensembl_api.post_sequence_ids")
+@patch("dna.ensembl_api.post_lookup_ids")
+def test_get_rows_batched(mock_lookup, mock_sequences, mock_regions):
+    mock_lookup.side_effect = [
+        {
+            "GENE1": {"canonical_transcript": "T1.2"},
+            "GENE2": {"canonical_transcript": "T2.1"},
+        },
+        {
+            "T1": {
+                "UTR": [
+                    {"type": "five_prime_utr", "start": 1, "end": 3, "seq_region_name": "1"},
+                    {"type": "three_prime_utr", "start": 10, "end": 12, "seq_region_name": "1"},
+                ],
+                "strand": -1,
+            }
+        },
+    ]
+    mock_sequences.side_effect = [
+        {"T1": "ATGTAA", "T2": ""},
+        {"T1": "P" * 1000 + "ATGTAA" + "T" * 500},
+    ]
+    mock_regions.return_value = {"1:1..3:-1": "AAA", "1:10..12:-1": "CCC"}
+
+    rows = ensembl_api.get_rows_batched(["GENE1", "GENE2", "GENE3"], "homo_sapiens")
+
+    assert rows == [["GENE1", "T1", "P" * 1000, "AAA", "ATGTAA", "CCC", "T" * 500]]
+    mock_lookup.assert_any_call(["GENE1", "GENE2", "GENE3"], species="homo sapiens")
+    mock_lookup.assert_any_call(["T1"], expand=True, utr=True)
+    mock_regions.assert_called_once_with(["1:1..3:-1", "1:10..12:-1"], "homo_sapiens")
+
+
+@patch("dna.ensembl_api.get_rows_batched")
+def test_get_data_as_csv_batched(mock_rows, tmp_path):
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text("Gene stable ID\nENSG00000000001\nENSG00000000002\n")
+    mock_rows.return_value = [["ENSG00000000001", "T1", "P", "U5", "ATG", "U3", "T"]]
+
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), fetch_mode="batched")
+
+    mock_rows.assert_called_once_with(["ENSG00000000001", "ENSG00000000002"], "homo_sapiens")
+    with open(tmp_path / "ensembl_data_homo_sapiens.csv", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert rows == [ensembl_api.CSV_HEADER, ["ENSG00000000001", "T1", "P", "U5", "ATG", "U3", "T"]]
+
+
+@patch("time.sleep")
+@patch("dna.ensembl_api.get_gene_row")
+def test_get_data_as_csv_resume(mock_row, mock_sleep, tmp_path):
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text(
+        "Gene stable ID\nENSG00000000001\nENSG00000000002\nENSG00000000003\nENSG00000000004\n"
+    )
+    rows = {
+        "ENSG00000000001": ["ENSG00000000001", "T1", "P", "U5", "ATG", "U3", "T"],
+        "ENSG00000000002": None,
+        "ENSG00000000003": ["ENSG00000000003", "T3", "P", "U5", "ATGC", "U3", "T"],
+        "ENSG00000000004": ["ENSG00000000004", "T4", "P", "U5", "ATGCA", "U3", "T"],
+    }
+    output_file = tmp_path / "ensembl_data_homo_sapiens.csv"
+
+    # Uninterrupted run
+    mock_row.side_effect = lambda gene_id, species_name: rows[gene_id]
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), resume=True)
+    expected_output = output_file.read_bytes()
+    # The journal of a complete extraction is removed
+    assert not os.path.exists(str(output_file) + ".journal")
+
+    # Run interrupted while extracting the third gene, after a partial row was written
+    def interrupted_row(gene_id, species_name):
+        if gene_id == "ENSG00000000003":
+            with open(output_file, "a", encoding="utf-8") as file:
+                file.write("ENSG00000000003,T3,P")
+            raise KeyboardInterrupt
+        return rows[gene_id]
+
+    mock_row.side_effect = interrupted_row
+    with pytest.raises(KeyboardInterrupt):
+        ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), resume=True)
+
+    # Resumed run only fetches the missing genes
+    mock_row.reset_mock()
+    mock_row.side_effect = lambda gene_id, species_name: rows[gene_id]
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), resume=True)
+
+    assert [call.args[0] for call in mock_row.call_args_list] == [
+        "ENSG00000000003",
+        "ENSG00000000004",
+    ]
+    assert output_file.read_bytes() == expected_output
+
+
+@patch("time.sleep")
+@patch("dna.ensembl_api.get_gene_row")
+def test_get_data_as_csv_resume_after_plain_run(mock_row, mock_sleep, tmp_path):
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text("Gene stable ID\nENSG00000000001\nENSG00000000002\n")
+    output_file = tmp_path / "ensembl_data_homo_sapiens.csv"
+    journal_file = tmp_path / "ensembl_data_homo_sapiens.csv.journal"
+
+    # Resumable run interrupted after the first gene
+    def interrupted_row(gene_id, species_name):
+        if gene_id == "ENSG00000000002":
+            raise KeyboardInterrupt
+        return [gene_id, "T", "P" * 100, "U5", "ATG", "U3", "T"]
+
+    mock_row.side_effect = interrupted_row
+    with pytest.raises(KeyboardInterrupt):
+        ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), resume=True)
+    assert journal_file.exists()
+
+    # Run without checkpoints, writing a shorter file
+    mock_row.side_effect = lambda gene_id, species_name: [gene_id, "T", "P", "U5", "ATG", "U3", "T"]
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path))
+    expected_output = output_file.read_bytes()
+    assert not journal_file.exists()
+
+    # The resumed run does not trust the journal of the first run
+    mock_row.reset_mock()
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), resume=True)
+
+    assert [call.args[0] for call in mock_row.call_args_list] == [
+        "ENSG00000000001",
+        "ENSG00000000002",
+    ]
+    assert output_file.read_bytes() == expected_output
+    assert b"\0" not in expected_output
+
+
+@patch("time.sleep")
+@patch("dna.ensembl_api.get_gene_row")
+def test_get_data_as_csv_resume_after_cache_misses(mock_row, mock_sleep, tmp_path):
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text("Gene stable ID\nENSG00000000001\nENSG00000000002\n")
+
+    def offline_row(gene_id, species_name):
+        if gene_id == "ENSG00000000001":
+            raise CacheMissError(f"Offline mode: {gene_id} is not cached.")
+        return [gene_id, "T", "P", "U5", "ATG", "U3", "T"]
+
+    mock_row.side_effect = offline_row
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), resume=True)
+
+    # Only the gene missing from the cache is fetched again
+    mock_row.reset_mock()
+    mock_row.side_effect = lambda gene_id, species_name: [gene_id, "T", "P", "U5", "ATG", "U3", "T"]
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), resume=True)
+
+    assert [call.args[0] for call in mock_row.call_args_list] == ["ENSG00000000001"]
+    assert not os.path.exists(tmp_path / "ensembl_data_homo_sapiens.csv.journal")
+
+
+@patch("time.sleep")
+@patch("dna.ensembl_api.get_gene_row")
+def test_get_data_as_csv_update(mock_row, mock_sleep, tmp_path):
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text("Gene stable ID\nENSG00000000002\nENSG00000000001\n")
+    mock_row.side_effect = lambda gene_id, species_name: [gene_id, "T", "P", "U5", "ATG", "U3", "T"]
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), update=True)
+
+    # Genes added to the gene list, with a duplicate and an invalid gene ID
+    gene_list.write_text(
+        "Gene stable ID\nENSG00000000002\nENSG00000000004\nENSG00000000001\n"
+        "ENSG00000000003\nENSG00000000004\nGENE5\n"
+    )
+    mock_row.reset_mock()
+    ensembl_api.get_data_as_csv([str(gene_list)], str(tmp_path), update=True)
+
+    # Only the new genes are fetched, in the order of the gene list
+    assert [call.args[0] for call in mock_row.call_args_list] == [
+        "ENSG00000000004",
+        "ENSG00000000003",
+    ]
+    with open(tmp_path / "ensembl_data_homo_sapiens.csv", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ensembl_api.CSV_HEADER
+    assert [row[0] for row in rows[1:]] == [
+        "ENSG00000000002",
+        "ENSG00000000001",
+        "ENSG00000000004",
+        "ENSG00000000003",
+    ]
+
+
+def test_get_data_as_csv_unknown_fetch_mode():
+    with pytest.raises(ValueError):
+        ensembl_api.get_data_as_csv([], "output_folder", fetch_mode="unknown")
+
+
+def test_clean_fasta_sequence():
+    sequence = "ATGC" * 15 + "AANNTT" + "GGCC"
+    assert ensembl_api.clean_fasta_sequence(sequence) == "ATGC" * 15 + "AA"
+    assert ensembl_api.clean_fasta_sequence(sequence, line_width=4) == "ATGC" * 15 + "AATTGGCC"
+
+
+def _reverse_complement(sequence):
+    return sequence[::-1].translate(str.maketrans("ACGT", "TGCA"))
+
+
+def _expanded_gene(strand):
+    # Transcript 11..30 with exons 11..18 and 23..30, coding part 14..26
+    return {
+        "canonical_transcript": "T1.1",
+        "Transcript": [
+            {"id": "T0", "strand": strand, "start": 1, "end": 40, "seq_region_name": "1"},
+            {
+                "id": "T1",
+                "strand": strand,
+                "start": 11,
+                "end": 30,
+                "seq_region_name": "1",
+                "Exon": [{"start": 23, "end": 30}, {"start": 11, "end": 18}],
+                "Translation": {"start": 14, "end": 26},
+                "UTR": [
+                    {"type": "five_prime_utr", "start": 11, "end": 13, "seq_region_name": "1"},
+                    {"type": "three_prime_utr", "start": 27, "end": 30, "seq_region_name": "1"},
+                ]
+                if strand == 1
+                else [
+                    {"type": "three_prime_utr", "start": 11, "end": 13, "seq_region_name": "1"},
+                    {"type": "five_prime_utr", "start": 27, "end": 30, "seq_region_name": "1"},
+                ],
+            },
+        ],
+    }
+
+
+def test_derive_and_slice_components_forward_strand():
+    genome = "ACGTTGCAAC" * 5  # positions 1..50
+    coordinates = ensembl_api.derive_component_coordinates(
+        _expanded_gene(1), promoter_length=5, terminator_length=4
+    )
+
+    assert coordinates["transcript_id"] == "T1"
+    assert (coordinates["region_start"], coordinates["region_end"]) == (6, 34)
+    assert coordinates["cds"] == [(14, 18), (23, 26)]
+
+    region_sequence = genome[5:34]
+    promoter, utr5, cds, utr3, terminator = ensembl_api.slice_components(
+        region_sequence, coordinates, promoter_length=5, terminator_length=4
+    )
+    assert promoter == genome[5:10]
+    assert utr5 == genome[10:13]
+    assert cds == genome[13:18] + genome[22:26]
+    assert utr3 == genome[26:30]
+    assert terminator == genome[30:34]
+
+
+def test_derive_and_slice_components_reverse_strand():
+    genome = "ACGTTGCAAC" * 5  # positions 1..50
+    coordinates = ensembl_api.derive_component_coordinates(
+        _expanded_gene(-1), promoter_length=5, terminator_length=4
+    )
+
+    assert (coordinates["region_start"], coordinates["region_end"]) == (7, 35)
+    assert coordinates["cds"] == [(23, 26), (14, 18)]
+
+    region_sequence = _reverse_complement(genome[6:35])
+    promoter, utr5, cds, utr3, terminator = ensembl_api.slice_components(
+        region_sequence, coordinates, promoter_length=5, terminator_length=4
+    )
+    assert promoter == _reverse_complement(genome[30:35])
+    assert utr5 == _reverse_complement(genome[26:30])
+    assert cds == _reverse_complement(genome[13:18] + genome[22:26])
+    assert utr3 == _reverse_complement(genome[10:13])
+    assert terminator == _reverse_complement(genome[6:10])
+
+
+def test_derive_component_coordinates_non_coding():
+    gene_data = {"canonical_transcript": "T1", "Transcript": [{"id": "T1", "strand": 1}]}
+    assert ensembl_api.derive_component_coordinates(gene_data) == {}
+
+
+@patch("ensembl_rest.sequence_region")
+@patch("ensembl_rest.lookup")
+def test_get_gene_row_single_lookup(mock_lookup, mock_sequence_region):
+    mock_lookup.return_value = _expanded_gene(1)
+    mock_sequence_region.return_value = {"seq": "A" * 1010 + "C" * 20 + "G" * 500}
+
+    row = ensembl_api.get_gene_row_single_lookup("GENE1", "homo_sapiens")
+
+    assert mock_lookup.call_count == 1
+    mock_sequence_region.assert_called_once_with(region="1:1..530:1", species="homo_sapiens")
+    assert row[:2] == ["GENE1", "T1"]
@@ -0,0 +1,187 @@
+import sys
+import os
+import csv
+import asyncio
+import pytest
+import ensembl_rest
+from unittest.mock import patch, MagicMock
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import ensembl_api, ensembl_async
+from dna.ensembl_cache import CacheMissError
+from dna.rate_limiter import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def rate_limiter():
+    # Requests paused by the rate limit errors of a test do not wait in the next tests
+    with patch.object(ensembl_api, "rate_limiter", RateLimiter()):
+        yield
+
+
+def test_call_ensembl_retries_after_rate_limit():
+    rate_limited = ensembl_rest.core.restclient.HTTPError(
+        response=MagicMock(status_code=429, headers={"Retry-After": "0.01"})
+    )
+    fetch = MagicMock(side_effect=[rate_limited, "ATGC"])
+
+    result = asyncio.run(
+        ensembl_async.call_ensembl(
+            ensembl_api.cached_request, "sequence/id", {"id": "PNW87736"}, fetch
+        )
+    )
+
+    assert result == "ATGC"
+    assert fetch.call_count == 2
+
+
+@patch("ensembl_rest.data")
+def test_call_ensembl_cache_hit_not_rate_limited(mock_data, tmp_path):
+    mock_data.return_value = {"releases": [112]}
+    ensembl_api.configure_cache(str(tmp_path / "ensembl.sqlite"))
+    ensembl_api.response_cache.set("sequence/id", {"id": "PNW87736"}, "ATGC")
+
+    try:
+        # Cached responses are served without waiting for the rate limiter, online too
+        with patch.object(ensembl_api.rate_limiter, "acquire") as mock_acquire:
+            result = asyncio.run(
+                ensembl_async.call_ensembl(
+                    ensembl_api.cached_request, "sequence/id", {"id": "PNW87736"}, MagicMock()
+                )
+            )
+    finally:
+        ensembl_api.configure_cache(None)
+
+    assert result == "ATGC"
+    mock_acquire.assert_not_called()
+
+
+@patch("dna.ensembl_api.get_utr_sequence")
+@patch("dna.ensembl_api.request_with_retry")
+@patch("dna.ensembl_api.get_promoter_terminator")
+@patch("dna.ensembl_api.get_cds")
+@patch("ensembl_rest.lookup")
+def test_fetch_gene_row(mock_lookup, mock_cds, mock_flanks, mock_transcript, mock_utr):
+    mock_lookup.return_value = {"canonical_transcript": "PNW87736.1"}
+    mock_cds.return_value = "ATGTAA"
+    mock_flanks.return_value = ("CCC", "GGG")
+    mock_transcript.return_value = {
+        "UTR": [
+            {"type": "five_prime_utr", "start": 1, "end": 2, "seq_region_name": "1"},
+            {"type": "five_prime_utr", "start": 5, "end": 6, "seq_region_name": "1"},
+            {"type": "three_prime_utr", "start": 20, "end": 30, "seq_region_name": "1"},
+        ],
+        "strand": 1,
+    }
+    mock_utr.side_effect = lambda chromosome, strand, start, end, species: {
+        1: "AA",
+        5: "TT",
+        20: "GC",
+    }[start]
+
+    row = asyncio.run(
+        ensembl_async.fetch_gene_row("CHLRE_01g000017v5", "chlamydomonas_reinhardtii")
+    )
+
+    assert row == ["CHLRE_01g000017v5", "PNW87736", "CCC", "AATT", "ATGTAA", "GC", "GGG"]
+    mock_lookup.assert_called_once_with(
+        species="chlamydomonas reinhardtii", id="CHLRE_01g000017v5"
+    )
+
+
+@patch("dna.ensembl_api.get_cds")
+@patch("ensembl_rest.lookup")
+def test_fetch_gene_row_empty_cds(mock_lookup, mock_cds):
+    mock_lookup.return_value = {"canonical_transcript": "PNW87736"}
+    mock_cds.return_value = ""
+
+    row = asyncio.run(
+        ensembl_async.fetch_gene_row("CHLRE_01g000017v5", "chlamydomonas_reinhardtii")
+    )
+
+    assert row is None
+
+
+@patch("dna.ensembl_async.fetch_gene_row")
+def test_get_data_as_csv_async_keeps_gene_order(mock_fetch, tmp_path):
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text("Gene stable ID\nENSG00000000001\nENSG00000000002\nENSG00000000003\n")
+
+    async def fake_fetch(gene_id, species_name):
+        # Finish the genes in reverse order, skip the second gene
+        await asyncio.sleep({"ENSG00000000001": 0.03, "ENSG00000000002": 0.02, "ENSG00000000003": 0.01}[gene_id])
+        if gene_id == "ENSG00000000002":
+            return None
+        return [gene_id, f"{gene_id}_T", "P", "U5", "ATG", "U3", "T"]
+
+    mock_fetch.side_effect = fake_fetch
+
+    ensembl_async.get_data_as_csv_async([str(gene_list)], str(tmp_path), max_in_flight=3)
+
+    with open(tmp_path / "ensembl_data_homo_sapiens.csv", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+
+    assert rows[0] == ensembl_async.ensembl_api.CSV_HEADER
+    assert [row[0] for row in rows[1:]] == ["ENSG00000000001", "ENSG00000000003"]
+
+
+@patch("dna.ensembl_async.fetch_gene_row")
+def test_write_species_csv_bounds_scheduled_genes(mock_fetch, tmp_path):
+    gene_ids = [f"ENSG{number:011d}" for number in range(1, 21)]
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text("Gene stable ID\n" + "\n".join(gene_ids) + "\n")
+    started_gene_ids = []
+
+    async def fake_fetch(gene_id, species_name):
+        started_gene_ids.append(gene_id)
+        if gene_id == gene_ids[0]:
+            # The rows of the next genes wait for the slow first gene to be written
+            await asyncio.sleep(0.05)
+            assert len(started_gene_ids) <= 4
+        return [gene_id, f"{gene_id}_T", "P", "U5", "ATG", "U3", "T"]
+
+    mock_fetch.side_effect = fake_fetch
+
+    ensembl_async.get_data_as_csv_async([str(gene_list)], str(tmp_path), max_in_flight=2)
+
+    assert started_gene_ids == gene_ids
+    with open(tmp_path / "ensembl_data_homo_sapiens.csv", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert [row[0] for row in rows[1:]] == gene_ids
+
+
+@patch("dna.ensembl_async.fetch_gene_row")
+def test_write_species_csv_resume_after_cache_misses(mock_fetch, tmp_path):
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text("Gene stable ID\nENSG00000000001\nENSG00000000002\nENSG00000000003\n")
+    journal_file = tmp_path / "ensembl_data_homo_sapiens.csv.journal"
+
+    async def offline_fetch(gene_id, species_name):
+        if gene_id == "ENSG00000000002":
+            raise CacheMissError(f"Offline mode: {gene_id} is not cached.")
+        return [gene_id, f"{gene_id}_T", "P", "U5", "ATG", "U3", "T"]
+
+    mock_fetch.side_effect = offline_fetch
+    ensembl_async.get_data_as_csv_async([str(gene_list)], str(tmp_path), resume=True)
+
+    # The gene missing from the cache is not checkpointed, and the journal is kept
+    journaled_gene_ids = [line.split("\t")[0] for line in journal_file.read_text().splitlines()]
+    assert journaled_gene_ids == ["", "ENSG00000000001", "ENSG00000000003"]
+
+    async def online_fetch(gene_id, species_name):
+        return [gene_id, f"{gene_id}_T", "P", "U5", "ATG", "U3", "T"]
+
+    mock_fetch.reset_mock()
+    mock_fetch.side_effect = online_fetch
+    ensembl_async.get_data_as_csv_async([str(gene_list)], str(tmp_path), resume=True)
+
+    assert [call.args[0] for call in mock_fetch.call_args_list] == ["ENSG00000000002"]
+    assert not journal_file.exists()
+    with open(tmp_path / "ensembl_data_homo_sapiens.csv", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert sorted(row[0] for row in rows[1:]) == [
+        "ENSG00000000001",
+        "ENSG00000000002",
+        "ENSG00000000003",
+    ]
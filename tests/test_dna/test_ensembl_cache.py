@@ -0,0 +1,124 @@
+import sys
+import os
+import pytest
+from unittest.mock import patch
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import ensembl_api
+from dna.ensembl_cache import ResponseCache, CacheMissError
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    yield str(tmp_path / "cache" / "ensembl.sqlite")
+    # Disable the module level cache after each test
+    ensembl_api.configure_cache(None)
+
+
+def test_response_cache_set_and_get(cache_path):
+    cache = ResponseCache(cache_path, release="112")
+    cache.set("sequence/id", {"id": "PNW69574", "type": "cds"}, "ATGC")
+
+    assert cache.get("sequence/id", {"type": "cds", "id": "PNW69574"}) == "ATGC"
+    assert cache.get("sequence/id", {"id": "PNW69574", "type": "genomic"}) is None
+    cache.close()
+
+    # Responses persist on disk but are keyed by the Ensembl release
+    assert ResponseCache(cache_path, release="112").get(
+        "sequence/id", {"id": "PNW69574", "type": "cds"}
+    ) == "ATGC"
+    assert ResponseCache(cache_path, release="113").get(
+        "sequence/id", {"id": "PNW69574", "type": "cds"}
+    ) is None
+
+
+def test_response_cache_evicts_least_recently_used(cache_path):
+    cache = ResponseCache(cache_path, max_size_bytes=20, release="112")
+    cache.set("lookup/id", {"id": "A"}, "AAAAAA")  # 8 bytes once serialised
+    cache.set("lookup/id", {"id": "B"}, "BBBBBB")
+    cache.get("lookup/id", {"id": "A"})
+    cache.set("lookup/id", {"id": "C"}, "CCCCCC")
+
+    assert cache.get("lookup/id", {"id": "A"}) == "AAAAAA"
+    assert cache.get("lookup/id", {"id": "B"}) is None
+    assert cache.get("lookup/id", {"id": "C"}) == "CCCCCC"
+    assert cache.total_size <= 20
+
+
+def test_response_cache_buffers_access_times(cache_path):
+    cache = ResponseCache(cache_path, release="112")
+    cache.set("lookup/id", {"id": "A"}, "AAAAAA")
+    key = cache.make_key("lookup/id", {"id": "A"})
+    stored_access = cache.connection.execute(
+        "SELECT last_access FROM responses WHERE key = ?", (key,)
+    ).fetchone()[0]
+
+    # Cache hits do not write to the database until the access times are flushed
+    with patch("time.time", return_value=stored_access + 10):
+        cache.get("lookup/id", {"id": "A"})
+    assert cache.connection.execute(
+        "SELECT last_access FROM responses WHERE key = ?", (key,)
+    ).fetchone()[0] == stored_access
+    cache.close()
+
+    # Closing the cache writes them
+    cache = ResponseCache(cache_path, release="112")
+    assert cache.connection.execute(
+        "SELECT last_access FROM responses WHERE key = ?", (key,)
+    ).fetchone()[0] == stored_access + 10
+    cache.close()
+
+
+@patch("ensembl_rest.data")
+def test_response_cache_offline_reuses_last_release(mock_data, cache_path):
+    mock_data.return_value = {"releases": [112]}
+    ResponseCache(cache_path).close()
+
+    offline_cache = ResponseCache(cache_path, offline=True)
+
+    assert offline_cache.release == "112"
+    assert mock_data.call_count == 1
+
+
+@patch("ensembl_rest.data")
+@patch("dna.ensembl_api.request_fasta_sequence")
+def test_get_cds_served_from_cache(mock_request, mock_data, cache_path):
+    mock_data.return_value = {"releases": [112]}
+    mock_request.return_value = "ATGTAA"
+
+    ensembl_api.configure_cache(cache_path)
+    assert ensembl_api.get_cds("PNW69574") == "ATGTAA"
+
+    ensembl_api.configure_cache(cache_path, offline=True)
+    assert ensembl_api.get_cds("PNW69574") == "ATGTAA"
+    assert mock_request.call_count == 1
+
+
+@patch("ensembl_rest.data")
+def test_cached_request_offline_miss(mock_data, cache_path):
+    ensembl_api.configure_cache(cache_path, offline=True)
+
+    with pytest.raises(CacheMissError):
+        ensembl_api.cached_request("lookup/id", {"id": "GENE1"}, lambda: {})
+    mock_data.assert_not_called()
+
+
+@patch("ensembl_rest.data")
+@patch("dna.ensembl_api.session.post")
+def test_post_lookup_ids_uses_cache(mock_post, mock_data, cache_path):
+    mock_data.return_value = {"releases": [112]}
+    ensembl_api.configure_cache(cache_path)
+    ensembl_api.response_cache.set(
+        "lookup/id", {"id": "GENE1", "species": "homo sapiens"}, {"canonical_transcript": "T1"}
+    )
+    mock_post.return_value.json.return_value = {"GENE2": {"canonical_transcript": "T2"}}
+
+    lookups = ensembl_api.post_lookup_ids(["GENE1", "GENE2"], species="homo sapiens")
+
+    assert lookups == {
+        "GENE1": {"canonical_transcript": "T1"},
+        "GENE2": {"canonical_transcript": "T2"},
+    }
+    assert mock_post.call_args.kwargs["json"]["ids"] == ["GENE2"]
+    assert ensembl_api.lookup_gene("GENE2", "homo sapiens") == {"canonical_transcript": "T2"}
@@ -0,0 +1,132 @@
+import sys
+import os
+import pytest
+from unittest.mock import patch
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import ensembl_api
+from dna.dna_extraction import query_dna_sequences_from_ensembl
+from dna.fasta_index import IndexedFasta, build_fasta_index, read_fasta_index
+
+CHROMOSOME_1 = "ACGTTGCAAC" * 5 + "ACG"  # 53 bases
+CHROMOSOME_2 = "ttgaccatgg" * 2  # 20 bases, soft-masked
+
+
+def _reverse_complement(sequence):
+    return sequence[::-1].translate(str.maketrans("ACGT", "TGCA"))
+
+
+@pytest.fixture
+def fasta_path(tmp_path):
+    path = tmp_path / "genome.fa"
+    lines = [">1 dna:chromosome"]
+    lines += [CHROMOSOME_1[i : i + 12] for i in range(0, len(CHROMOSOME_1), 12)]
+    lines += [">2 dna:scaffold"]
+    lines += [CHROMOSOME_2[i : i + 12] for i in range(0, len(CHROMOSOME_2), 12)]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def local_fasta(fasta_path):
+    ensembl_api.configure_local_fasta("homo_sapiens", fasta_path)
+    yield
+    ensembl_api.configure_local_fasta("homo_sapiens", None)
+
+
+def test_build_fasta_index(fasta_path):
+    build_fasta_index(fasta_path, fasta_path + ".fai")
+
+    with open(fasta_path + ".fai", encoding="utf-8") as file:
+        assert file.read() == "1\t53\t18\t12\t13\n2\t20\t92\t12\t13\n"
+    assert read_fasta_index(fasta_path + ".fai")["2"].offset == 92
+
+
+def test_build_fasta_index_different_line_length(tmp_path):
+    path = tmp_path / "genome.fa"
+    path.write_text(">1\nACGT\nAC\nACGT\n")
+
+    with pytest.raises(ValueError):
+        build_fasta_index(str(path), str(path) + ".fai")
+
+
+def test_indexed_fasta_fetch(fasta_path):
+    fasta = IndexedFasta(fasta_path)
+
+    assert os.path.exists(fasta_path + ".fai")
+    assert fasta.get_length("1") == 53
+    # Regions spanning line breaks, on both strands
+    assert fasta.fetch("1", 10, 30) == CHROMOSOME_1[9:30]
+    assert fasta.fetch("1", 10, 30, -1) == _reverse_complement(CHROMOSOME_1[9:30])
+    # Regions are clipped to the sequence
+    assert fasta.fetch("1", 40, 100) == CHROMOSOME_1[39:]
+    assert fasta.fetch("1", 60, 100) == ""
+    # Soft-masked bases are returned in upper case
+    assert fasta.fetch("2", 1, 20) == CHROMOSOME_2.upper()
+    assert fasta.fetch_region("2:3..15:-1") == _reverse_complement(CHROMOSOME_2[2:15].upper())
+    assert fasta.fetch_region("1:1..5") == CHROMOSOME_1[:5]
+
+    fasta.close()
+
+
+@patch("ensembl_rest.sequence_region")
+def test_get_utr_sequence_local_fasta(mock_sequence_region, local_fasta):
+    utr_sequence = ensembl_api.get_utr_sequence("1", -1, 11, 20, "homo_sapiens")
+
+    assert utr_sequence == _reverse_complement(CHROMOSOME_1[10:20])
+    mock_sequence_region.assert_not_called()
+
+
+@patch("dna.ensembl_api.request_fasta_sequence")
+@patch("dna.ensembl_api.request_with_retry")
+def test_get_promoter_terminator_local_fasta(mock_transcript, mock_request, local_fasta):
+    mock_transcript.return_value = {"seq_region_name": "1", "start": 21, "end": 30, "strand": 1}
+
+    promoter, terminator = ensembl_api.get_promoter_terminator(
+        "T1", promoter_length=10, terminator_length=5, species="homo_sapiens"
+    )
+
+    assert promoter == CHROMOSOME_1[10:20]
+    assert terminator == CHROMOSOME_1[30:35]
+    mock_request.assert_not_called()
+
+
+@patch("dna.ensembl_api.request_fasta_sequence")
+@patch("dna.ensembl_api.request_with_retry")
+def test_get_promoter_terminator_local_fasta_chromosome_start(mock_transcript, mock_request, local_fasta):
+    mock_transcript.return_value = {"seq_region_name": "1", "start": 6, "end": 30, "strand": 1}
+
+    promoter, terminator = ensembl_api.get_promoter_terminator(
+        "T1", promoter_length=10, terminator_length=5, species="homo_sapiens"
+    )
+
+    assert promoter == CHROMOSOME_1[:5]
+    assert terminator == CHROMOSOME_1[30:35]
+    mock_request.assert_not_called()
+
+
+def test_query_dna_sequences_from_ensembl_local_fasta(fasta_path, tmp_path):
+    genome_directory = tmp_path / "genomes"
+    genome_directory.mkdir()
+    os.rename(fasta_path, genome_directory / "Homo_sapiens.GRCh38.dna.toplevel.fa")
+    listdir = os.listdir
+
+    def configured_fasta_files(file_paths, output_folder, **kwargs):
+        assert sorted(ensembl_api.local_fasta_files) == ["homo_sapiens"]
+
+    with patch(
+        "os.listdir",
+        side_effect=lambda path: (
+            ["homo_sapiens_genes.txt", "mus_musculus_genes.txt"]
+            if path == "dna/gene_lists/"
+            else listdir(path)
+        ),
+    ), patch("os.path.isfile", return_value=True), patch(
+        "dna.dna_extraction.ensembl_api.get_data_as_csv", side_effect=configured_fasta_files
+    ) as mock_api_call:
+        query_dna_sequences_from_ensembl("output_folder", fasta_directory=str(genome_directory))
+
+    # The genome of each species is only mapped during the extraction
+    mock_api_call.assert_called_once()
+    assert ensembl_api.local_fasta_files == {}
@@ -0,0 +1,29 @@
+import sys
+import os
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna.feature_manifest import FeatureManifest, hash_row
+
+ROW = ["GENE1", "T1", "ACGT", "AC", "ATGAAATGA", "", "TTT"]
+
+
+def test_hash_row():
+    assert hash_row(ROW) == hash_row(list(ROW))
+    assert len(hash_row(ROW)) == 32
+    # Values are separated, so moving a nucleotide to the next column changes the hash
+    assert hash_row(ROW) != hash_row(["GENE1", "T1", "ACG", "TAC", "ATGAAATGA", "", "TTT"])
+
+
+def test_feature_manifest(tmp_path):
+    table_path = str(tmp_path / "ensembl_data_homo_sapiens.csv")
+    manifest = FeatureManifest(table_path)
+
+    # Nothing can be reused without the table
+    manifest.save(["AAA", "cds_gc"], [hash_row(ROW)])
+    assert manifest.load() == ([], [])
+
+    with open(table_path, "w", encoding="utf-8"):
+        pass
+    assert manifest.exists()
+    assert manifest.load() == (["AAA", "cds_gc"], [hash_row(ROW)])
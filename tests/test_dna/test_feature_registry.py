@@ -0,0 +1,69 @@
+import sys
+import os
+import pytest
+import pyarrow as pa
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import dna_feature_extraction
+from dna.feature_registry import FeatureRegistry
+
+
+def test_feature_registry_plan():
+    registry = FeatureRegistry()
+    shared_computations = []
+
+    def count_a(batch):
+        shared_computations.append(len(batch["cds"]))
+        return [sequence.count("A") for sequence in batch["cds"]]
+
+    @registry.register("a_count", ["cds"], pa.schema([("cds_a_count", pa.int32())]))
+    def compute_a_count(batch):
+        return {"cds_a_count": batch.shared("a_counts", count_a)}
+
+    @registry.register(
+        "a_content",
+        ["cds", "utr5"],
+        pa.schema([("cds_a", pa.float32()), ("utr5_length", pa.int32())]),
+    )
+    def compute_a_content(batch):
+        return {
+            "cds_a": [
+                count / len(sequence)
+                for count, sequence in zip(batch.shared("a_counts", count_a), batch["cds"])
+            ],
+            "utr5_length": [len(sequence) for sequence in batch["utr5"]],
+        }
+
+    assert registry.output_columns() == ["cds_a_count", "cds_a", "utr5_length"]
+    assert registry.output_schema().field("cds_a").type == pa.float32()
+    assert [feature.name for feature in registry.plan(["cds_a"])] == ["a_content"]
+    assert registry.input_columns(["cds_a_count"]) == ["cds"]
+
+    features = registry.compute(
+        {"cds": ["AAT", "ACGA"], "utr5": ["", "TT"], "utr3": ["A", "G"]},
+        ["cds_a", "cds_a_count"],
+    )
+
+    assert features == {"cds_a": [2 / 3, 0.5], "cds_a_count": [2, 2]}
+    # The intermediate result is computed once for both features
+    assert shared_computations == [2]
+
+    with pytest.raises(KeyError):
+        registry.plan(["cds_gc"])
+    with pytest.raises(ValueError):
+        registry.register("a_count", ["cds"], pa.schema([("other", pa.int32())]))(compute_a_count)
+    with pytest.raises(ValueError):
+        registry.register("length", ["utr5"], pa.schema([("utr5_length", pa.int32())]))(len)
+
+
+def test_dna_feature_registry():
+    registry = dna_feature_extraction.FEATURE_REGISTRY
+
+    assert registry.output_columns() == (
+        dna_feature_extraction.CODONS + dna_feature_extraction.COMPONENT_FEATURES
+    )
+    assert registry.input_columns(["AAA", "cds_wobble3_gc"]) == ["cds"]
+    assert dna_feature_extraction.compute_feature_rows(
+        [["GENE1", "T1", "", "AC", "ATGCCCTAA", "", ""]], ["cds_gc", "CCC", "utr3_gc"]
+    ) == [[4 / 9, 1 / 3, ""]]
@@ -0,0 +1,58 @@
+import sys
+import os
+import numpy as np
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import ensembl_api
+from dna.gene_id_loader import check_gene_ids, load_gene_ids, read_extracted_gene_ids
+
+
+def test_check_gene_ids():
+    gene_id_list = check_gene_ids(
+        ["ENSG00000000003", "ENSG00000000001", "", "ENSG00000000003", "GENE1", "ENSG1"],
+        "homo_sapiens",
+    )
+
+    assert gene_id_list.gene_ids.tolist() == ["ENSG00000000001", "ENSG00000000003"]
+    assert gene_id_list.duplicate_count == 1
+    assert gene_id_list.invalid_ids == ["GENE1", "ENSG1"]
+    assert gene_id_list.in_list_order() == ["ENSG00000000003", "ENSG00000000001"]
+
+    # Gene IDs of species without a pattern are not checked
+    assert check_gene_ids(["GENE2", "GENE1"], "mus_musculus").in_list_order() == [
+        "GENE2",
+        "GENE1",
+    ]
+
+
+def test_exclude_gene_ids():
+    gene_id_list = check_gene_ids(["GENE3", "GENE1", "GENE4", "GENE2"])
+    new_gene_id_list = gene_id_list.exclude(np.array(["GENE1", "GENE4", "GENE5"]))
+
+    assert new_gene_id_list.gene_ids.tolist() == ["GENE2", "GENE3"]
+    assert new_gene_id_list.in_list_order() == ["GENE3", "GENE2"]
+
+
+def test_load_gene_ids():
+    gene_lists_folder = os.path.join(os.path.dirname(__file__), "test_data/gene_lists")
+
+    # The gene IDs of the gene lists all have the format of their species
+    for filename in os.listdir(gene_lists_folder):
+        file_path = os.path.join(gene_lists_folder, filename)
+        gene_id_list = load_gene_ids(file_path, ensembl_api.get_species_name(file_path))
+
+        assert gene_id_list.invalid_ids == []
+        assert gene_id_list.gene_ids.tolist() == sorted(
+            set(ensembl_api.read_gene_ids_from_file(file_path))
+        )
+
+
+def test_read_extracted_gene_ids(tmp_path):
+    csv_path = tmp_path / "ensembl_data_homo_sapiens.csv"
+    assert read_extracted_gene_ids(str(csv_path)).tolist() == []
+
+    csv_path.write_text(
+        ",".join(ensembl_api.CSV_HEADER) + "\nGENE2,T2,P,U5,ATG,U3,T\nGENE1,T1,P,U5,ATG,U3,T\n"
+    )
+    assert read_extracted_gene_ids(str(csv_path)).tolist() == ["GENE1", "GENE2"]
@@ -0,0 +1,93 @@
+import sys
+import os
+import numpy as np
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import local_genome
+from dna.gff_index import GffIndex
+
+
+def _transcript(transcript_id, chromosome, start, end, strand, coding=True):
+    transcript = {
+        "id": transcript_id,
+        "seq_region_name": chromosome,
+        "start": start,
+        "end": end,
+        "strand": strand,
+        "Exon": [{"start": start, "end": end}],
+        "UTR": [
+            {"type": "five_prime_utr", "start": start, "end": start + 1, "seq_region_name": chromosome},
+            {"type": "three_prime_utr", "start": end - 1, "end": end, "seq_region_name": chromosome},
+        ],
+    }
+    if coding:
+        transcript["Translation"] = {"start": start + 2, "end": end - 2}
+    return transcript
+
+
+GENES = {
+    gene_id: {"id": gene_id, "canonical_transcript": transcript["id"], "Transcript": [transcript]}
+    for gene_id, transcript in [
+        ("GENE3", _transcript("T3", "2", 50, 90, 1)),
+        ("GENE1", _transcript("T1", "1", 100, 500, -1)),
+        ("GENE2", _transcript("T2", "1", 20, 60, 1, coding=False)),
+        ("GENE4", _transcript("T4", "1", 300, 320, 1)),
+    ]
+}
+
+
+def test_gff_index_get_gene_data(tmp_path):
+    gff_index = GffIndex.from_genes(GENES)
+    gff_index.save(str(tmp_path / "genes.index.npz"))
+    loaded_index = GffIndex.load(str(tmp_path / "genes.index.npz"))
+
+    assert len(loaded_index) == 4
+    for gene_id, gene_data in GENES.items():
+        assert gff_index.get_gene_data(gene_id) == gene_data
+        assert loaded_index.get_gene_data(gene_id) == gene_data
+    assert loaded_index.get_gene_data("GENE0") is None
+    assert loaded_index.get_gene_data("GENE9") is None
+
+
+def test_gff_index_find_genes_in_region():
+    gff_index = GffIndex.from_genes(GENES)
+
+    assert list(gff_index.chromosomes) == ["1", "2"]
+    assert gff_index.find_genes_in_region("1", 50, 310) == ["GENE2", "GENE1", "GENE4"]
+    assert gff_index.find_genes_in_region("1", 400, 450) == ["GENE1"]
+    assert gff_index.find_genes_in_region("1", 1, 10) == []
+    assert gff_index.find_genes_in_region("2", 90, 95) == ["GENE3"]
+    assert gff_index.find_genes_in_region("X", 1, 1000) == []
+
+
+def test_load_gff_index(tmp_path):
+    gff_path = tmp_path / "Homo_sapiens.GRCh38.110.gff3"
+    gff_path.write_text(
+        "1\tEnsembl\tgene\t1\t9\t.\t+\t.\tID=gene:GENE1;gene_id=GENE1\n"
+        "1\tEnsembl\tmRNA\t1\t9\t.\t+\t.\tID=transcript:T1;Parent=gene:GENE1;"
+        "tag=Ensembl_canonical;transcript_id=T1\n"
+        "1\tEnsembl\texon\t1\t9\t.\t+\t.\tParent=transcript:T1\n"
+        "1\tEnsembl\tCDS\t1\t9\t.\t+\t0\tParent=transcript:T1\n"
+    )
+
+    gff_index = local_genome.load_gff_index(str(gff_path))
+
+    assert os.path.exists(str(gff_path) + ".index.npz")
+    assert gff_index.get_gene_data("GENE1")["Transcript"][0]["Translation"] == {"start": 1, "end": 9}
+    # The saved index is reused
+    assert local_genome.load_gff_index(str(gff_path)).get_gene_data("GENE1") == (
+        gff_index.get_gene_data("GENE1")
+    )
+
+    # An index saved in an older format is built again
+    index_path = str(gff_path) + ".index.npz"
+    with np.load(index_path) as arrays:
+        old_arrays = {name: arrays[name] for name in GffIndex.ARRAY_NAMES}
+    with open(index_path, "wb") as file:
+        np.savez(file, **old_arrays)
+    assert local_genome.load_gff_index(str(gff_path)).get_gene_data("GENE1") == (
+        gff_index.get_gene_data("GENE1")
+    )
+    with np.load(index_path) as arrays:
+        assert int(arrays["format_version"]) == GffIndex.FORMAT_VERSION
@@ -0,0 +1,94 @@
+import sys
+import os
+import shutil
+import numpy as np
+import pytest
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import dna_feature_extraction
+from dna.kmer_features import (
+    check_kmer_sizes,
+    count_kmers,
+    get_kmer_columns,
+    load_kmer_matrix,
+)
+
+
+def _count_kmers(sequence, kmer_sizes):
+    counts = {}
+    for k in kmer_sizes:
+        for start in range(len(sequence) - k + 1):
+            kmer = sequence[start : start + k]
+            if set(kmer) <= set("ACGT"):
+                counts[kmer] = counts.get(kmer, 0) + 1
+    return counts
+
+
+def test_get_kmer_columns():
+    columns = get_kmer_columns([1, 2])
+
+    assert len(columns) == 4 * (4 + 16)
+    assert columns[:5] == ["promoter_A", "promoter_C", "promoter_G", "promoter_T", "promoter_AA"]
+    assert columns[-1] == "terminator_TT"
+    assert check_kmer_sizes([3, 1, 3]) == [1, 3]
+    with pytest.raises(ValueError):
+        check_kmer_sizes([0, 2])
+    with pytest.raises(ValueError):
+        check_kmer_sizes([])
+
+
+def test_count_kmers():
+    sequences = ["ACGTAC", "", "GGNGG", "TA", "AAAAAAA"]
+    kmer_sizes = [1, 3]
+    codes = np.frombuffer(
+        "".join(sequences).encode().translate(dna_feature_extraction.NUCLEOTIDE_CODES),
+        dtype=np.uint8,
+    )
+    offsets = np.cumsum([0] + [len(sequence) for sequence in sequences])
+
+    rows, columns, counts = count_kmers(codes, offsets, kmer_sizes)
+
+    kmer_columns = [column.split("_")[1] for column in get_kmer_columns(kmer_sizes)[:68]]
+    for row, sequence in enumerate(sequences):
+        in_row = rows == row
+        # K-mers spanning two sequences or containing N are not counted
+        assert {
+            kmer_columns[column]: count
+            for column, count in zip(columns[in_row].tolist(), counts[in_row].tolist())
+        } == _count_kmers(sequence, kmer_sizes)
+        assert (np.diff(columns[in_row]) > 0).all()
+
+
+def test_extract_dna_features_kmers(tmp_path):
+    input_folder_path = os.path.join(
+        os.path.dirname(__file__), "test_data/feature_extraction_csv_files"
+    )
+    shutil.copytree(input_folder_path, tmp_path / "csv_files")
+    with open(tmp_path / "csv_files" / "ensembl_data_chlamydomonas_reinhardtii.csv") as file:
+        file.readline()
+        rows = [line.rstrip("\n").split(",") for line in file]
+
+    dna_feature_extraction.extract_dna_features(
+        str(tmp_path / "csv_files"), chunk_size=1, kmer_sizes=[2, 1]
+    )
+    matrix_path = tmp_path / "csv_files" / "ensembl_data_chlamydomonas_reinhardtii.kmers.npz"
+    matrix = load_kmer_matrix(str(matrix_path))
+
+    assert matrix.shape == (len(rows), 4 * 20)
+    assert matrix.columns.tolist() == get_kmer_columns([1, 2])
+    assert matrix.transcript_ids.tolist() == [row[1] for row in rows]
+    counts = matrix.toarray()
+    for row, gene_counts in zip(rows, counts):
+        for region, sequence in zip(("promoter", "utr5", "utr3", "terminator"), row[2:4] + row[5:]):
+            for kmer, count in _count_kmers(sequence, [1, 2]).items():
+                assert gene_counts[matrix.columns.tolist().index(f"{region}_{kmer}")] == count
+    # Only the k-mers found are stored
+    assert matrix.data.min() > 0
+
+    # The matrix of the same genes is kept in incremental mode
+    modified_time = os.path.getmtime(matrix_path)
+    dna_feature_extraction.extract_dna_features(
+        str(tmp_path / "csv_files"), incremental=True, kmer_sizes=[1, 2]
+    )
+    assert os.path.getmtime(matrix_path) == modified_time
@@ -0,0 +1,130 @@
+import sys
+import os
+import csv
+import gzip
+import pytest
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import local_genome
+
+GENOME = "ACGTTGCAAC" * 6  # positions 1..60 of chromosome 1
+
+GFF_LINES = [
+    "##gff-version 3",
+    "##sequence-region   1 1 60",
+    "1\tEnsembl\tchromosome\t1\t60\t.\t.\t.\tID=chromosome:1",
+    # Forward strand gene with a non-canonical and a canonical transcript
+    "1\tEnsembl\tgene\t5\t40\t.\t+\t.\tID=gene:ENSG00000000001;biotype=protein_coding;gene_id=ENSG00000000001",
+    "1\tEnsembl\tmRNA\t5\t40\t.\t+\t.\tID=transcript:T0;Parent=gene:ENSG00000000001;transcript_id=T0",
+    "1\tEnsembl\texon\t5\t40\t.\t+\t.\tParent=transcript:T0",
+    "1\tEnsembl\tCDS\t5\t40\t.\t+\t0\tID=CDS:P0;Parent=transcript:T0",
+    "1\tEnsembl\tmRNA\t11\t40\t.\t+\t.\tID=transcript:T1;Parent=gene:ENSG00000000001;"
+    "tag=basic,Ensembl_canonical;transcript_id=T1",
+    "1\tEnsembl\tfive_prime_UTR\t11\t13\t.\t+\t.\tParent=transcript:T1",
+    "1\tEnsembl\texon\t11\t20\t.\t+\t.\tParent=transcript:T1",
+    "1\tEnsembl\tCDS\t14\t20\t.\t+\t0\tID=CDS:P1;Parent=transcript:T1",
+    "1\tEnsembl\texon\t25\t40\t.\t+\t.\tParent=transcript:T1",
+    "1\tEnsembl\tCDS\t25\t35\t.\t+\t2\tID=CDS:P1;Parent=transcript:T1",
+    "1\tEnsembl\tthree_prime_UTR\t36\t40\t.\t+\t.\tParent=transcript:T1",
+    # Reverse strand gene
+    "1\tEnsembl\tgene\t21\t50\t.\t-\t.\tID=gene:ENSG00000000002;gene_id=ENSG00000000002",
+    "1\tEnsembl\tmRNA\t21\t50\t.\t-\t.\tID=transcript:T2;Parent=gene:ENSG00000000002;"
+    "tag=Ensembl_canonical;transcript_id=T2",
+    "1\tEnsembl\tfive_prime_UTR\t46\t50\t.\t-\t.\tParent=transcript:T2",
+    "1\tEnsembl\texon\t41\t50\t.\t-\t.\tParent=transcript:T2",
+    "1\tEnsembl\tCDS\t41\t45\t.\t-\t0\tID=CDS:P2;Parent=transcript:T2",
+    "1\tEnsembl\texon\t21\t30\t.\t-\t.\tParent=transcript:T2",
+    "1\tEnsembl\tCDS\t25\t30\t.\t-\t1\tID=CDS:P2;Parent=transcript:T2",
+    "1\tEnsembl\tthree_prime_UTR\t21\t24\t.\t-\t.\tParent=transcript:T2",
+    # Gene with a non-coding canonical transcript
+    "1\tEnsembl\tncRNA_gene\t1\t8\t.\t+\t.\tID=gene:ENSG00000000003;gene_id=ENSG00000000003",
+    "1\tEnsembl\tlnc_RNA\t1\t8\t.\t+\t.\tID=transcript:T3;Parent=gene:ENSG00000000003;"
+    "tag=Ensembl_canonical;transcript_id=T3",
+    "1\tEnsembl\texon\t1\t8\t.\t+\t.\tParent=transcript:T3",
+]
+
+
+def _reverse_complement(sequence):
+    return sequence[::-1].translate(str.maketrans("ACGT", "TGCA"))
+
+
+@pytest.fixture
+def genome_directory(tmp_path):
+    with gzip.open(tmp_path / "Homo_sapiens.GRCh38.dna.toplevel.fa.gz", "wt") as file:
+        file.write(">1 dna:chromosome chromosome:GRCh38:1:1:60:1 REF\n")
+        file.write(GENOME[:25].lower() + "\n" + GENOME[25:50] + "\n" + GENOME[50:] + "\n")
+    (tmp_path / "Homo_sapiens.GRCh38.cdna.all.fa").write_text(">T1\nACGT\n")
+    (tmp_path / "Homo_sapiens.GRCh38.110.gff3").write_text("\n".join(GFF_LINES) + "\n")
+    return tmp_path
+
+
+def test_find_genome_files(genome_directory):
+    fasta_path, gff_path = local_genome.find_genome_files(str(genome_directory), "homo_sapiens")
+
+    assert os.path.basename(fasta_path) == "Homo_sapiens.GRCh38.dna.toplevel.fa.gz"
+    assert os.path.basename(gff_path) == "Homo_sapiens.GRCh38.110.gff3"
+
+    with pytest.raises(FileNotFoundError):
+        local_genome.find_genome_files(str(genome_directory), "mus_musculus")
+
+
+def test_read_gff_genes(genome_directory):
+    genes = local_genome.read_gff_genes(str(genome_directory / "Homo_sapiens.GRCh38.110.gff3"))
+
+    assert sorted(genes) == ["ENSG00000000001", "ENSG00000000002", "ENSG00000000003"]
+    assert genes["ENSG00000000001"]["canonical_transcript"] == "T1"
+
+    transcript = genes["ENSG00000000002"]["Transcript"][0]
+    assert transcript["strand"] == -1
+    assert transcript["Translation"] == {"start": 25, "end": 45}
+    assert transcript["Exon"] == [{"start": 41, "end": 50}, {"start": 21, "end": 30}]
+    assert [utr["type"] for utr in transcript["UTR"]] == ["five_prime_utr", "three_prime_utr"]
+    assert "Translation" not in genes["ENSG00000000003"]["Transcript"][0]
+
+
+def test_local_genome_get_gene_row(genome_directory):
+    with local_genome.LocalGenome(
+        *local_genome.find_genome_files(str(genome_directory), "homo_sapiens")
+    ) as genome:
+        # Flanks are clipped to the chromosome, so the promoter and terminator only hold
+        # the bases between the transcript and the ends of the chromosome
+        assert genome.get_gene_row("ENSG00000000001") == [
+            "ENSG00000000001",
+            "T1",
+            GENOME[:10],
+            GENOME[10:13],
+            GENOME[13:20] + GENOME[24:35],
+            GENOME[35:40],
+            GENOME[40:],
+        ]
+        assert genome.get_gene_row("ENSG00000000002") == [
+            "ENSG00000000002",
+            "T2",
+            _reverse_complement(GENOME[50:]),
+            _reverse_complement(GENOME[45:50]),
+            _reverse_complement(GENOME[24:30] + GENOME[40:45]),
+            _reverse_complement(GENOME[20:24]),
+            _reverse_complement(GENOME[:20]),
+        ]
+        assert genome.get_gene_row("ENSG00000000003") is None
+        assert genome.get_gene_row("ENSG00000000004") is None
+
+    # The genome FASTA file is unmapped once the genome is closed
+    assert genome.fasta.mmap.closed
+
+
+def test_get_data_as_csv_local(genome_directory, tmp_path):
+    gene_list = tmp_path / "homo_sapiens_genes.txt"
+    gene_list.write_text("Gene stable ID\nENSG00000000002\nENSG00000000003\nENSG00000000001\n")
+    output_directory = tmp_path / "csv_files"
+
+    local_genome.get_data_as_csv_local(
+        [str(gene_list)], str(output_directory), str(genome_directory)
+    )
+
+    with open(output_directory / "ensembl_data_homo_sapiens.csv", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+
+    assert rows[0] == local_genome.ensembl_api.CSV_HEADER
+    assert [row[:2] for row in rows[1:]] == [["ENSG00000000002", "T2"], ["ENSG00000000001", "T1"]]
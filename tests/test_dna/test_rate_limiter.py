@@ -0,0 +1,108 @@
+import sys
+import os
+import pytest
+import requests
+import ensembl_rest
+from unittest.mock import patch, MagicMock
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna.rate_limiter import MAX_BACKOFF_SECONDS, RateLimiter, parse_retry_after
+
+
+def rate_limit_error(headers=None):
+    return ensembl_rest.core.restclient.HTTPError(
+        response=MagicMock(status_code=429, headers=headers or {})
+    )
+
+
+def test_rate_limiter_spaces_requests():
+    rate_limiter = RateLimiter(requests_per_second=4, burst=2)
+
+    delays = [rate_limiter.reserve() for _ in range(4)]
+
+    # The burst is immediate, the next requests wait for their tokens in turn
+    assert delays[:2] == [0, 0]
+    assert 0.2 < delays[2] <= 0.25
+    assert 0.45 < delays[3] <= 0.5
+
+
+def test_rate_limiter_pause():
+    with patch("time.monotonic", return_value=100.0):
+        rate_limiter = RateLimiter(requests_per_second=10, burst=1)
+        assert rate_limiter.reserve() == 0
+
+        # The bucket is empty, yet one request is made when the pause ends
+        rate_limiter.pause(2)
+        assert rate_limiter.reserve() == pytest.approx(2.0)
+        assert rate_limiter.reserve() == pytest.approx(2.1)
+
+        # Requests already waiting for a token keep their turn
+        rate_limiter.pause(3)
+        assert rate_limiter.reserve() == pytest.approx(3.1)
+
+
+def test_rate_limiter_update_rate():
+    rate_limiter = RateLimiter()
+    headers = {
+        "X-RateLimit-Limit": "55000",
+        "X-RateLimit-Period": "3600",
+        "X-RateLimit-Remaining": "54000",
+        "X-RateLimit-Reset": "3000",
+    }
+
+    rate_limiter.update_rate(headers)
+    assert rate_limiter.rate == pytest.approx(55000 / 3600)
+
+    # Few requests left: they are spread until the reset of the limit
+    rate_limiter.update_rate({**headers, "X-RateLimit-Remaining": "600"})
+    assert rate_limiter.rate == pytest.approx(0.2)
+
+    # No request left: requests are held until the reset
+    rate_limiter.update_rate({**headers, "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "5"})
+    assert 4.9 < rate_limiter.reserve() <= 10
+
+
+def test_rate_limiter_call_honors_retry_after():
+    rate_limiter = RateLimiter()
+    function = MagicMock(side_effect=[rate_limit_error({"Retry-After": "2.5"}), "ATGC"])
+
+    with patch("time.sleep") as mock_sleep:
+        assert rate_limiter.call(function, "PNW87736") == "ATGC"
+
+    function.assert_called_with("PNW87736")
+    mock_sleep.assert_called_once()
+    assert 2.4 < mock_sleep.call_args.args[0] <= 2.5
+
+
+def test_rate_limiter_call_backs_off():
+    rate_limiter = RateLimiter(max_retries=3)
+    server_error = requests.exceptions.HTTPError(response=MagicMock(status_code=503, headers={}))
+    function = MagicMock(side_effect=[rate_limit_error()] * 2 + [server_error] * 2)
+
+    with patch("time.sleep") as mock_sleep, pytest.raises(requests.exceptions.HTTPError):
+        rate_limiter.call(function)
+
+    # The request is retried 3 times, after exponential delays with jitter
+    assert function.call_count == 4
+    delays = [call.args[0] for call in mock_sleep.call_args_list]
+    assert len(delays) == 3
+    for attempt, delay in enumerate(delays):
+        assert 2**attempt / 2 - 0.1 < delay <= min(MAX_BACKOFF_SECONDS, 2**attempt)
+
+
+def test_rate_limiter_call_does_not_retry_other_errors():
+    rate_limiter = RateLimiter()
+    not_found = ensembl_rest.core.restclient.HTTPError(response=MagicMock(status_code=400))
+    function = MagicMock(side_effect=not_found)
+
+    with pytest.raises(ensembl_rest.core.restclient.HTTPError):
+        rate_limiter.call(function)
+    assert function.call_count == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
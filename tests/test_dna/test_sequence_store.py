@@ -0,0 +1,89 @@
+import sys
+import os
+import csv
+import shutil
+import numpy as np
+
+# Add the parent directory of `dna` to `sys.path`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from dna import dna_feature_extraction
+from dna.sequence_store import (
+    STORE_REGIONS,
+    load_sequence_store,
+    pack_sequence_store,
+    pack_sequences,
+)
+
+SEQUENCES = ["", "ACGT", "NNNNAC", "ATGNNCCCGGGTAA", "acgtRRNN", "N" * 12, "GATTACA" * 5]
+
+
+def test_pack_sequences():
+    packed = pack_sequences(SEQUENCES)
+
+    assert packed.sequences() == SEQUENCES
+    # 4 nucleotides per byte, sequences being padded to 12 nucleotides
+    assert packed.packed.nbytes == 3 * 9
+    # Characters other than A, C, G and T are kept as runs
+    assert packed.run_characters.tobytes() == b"NNacgtRNN"
+    assert packed.run_lengths.tolist() == [4, 2, 1, 1, 1, 1, 2, 2, 12]
+    # Sequences are sliced without copying their packed nucleotides
+    sliced = packed.slice(2, 5)
+    assert np.shares_memory(sliced.packed, packed.packed)
+    assert sliced.sequences() == SEQUENCES[2:5]
+
+    codes, offsets = dna_feature_extraction.encode_sequences(SEQUENCES[2:5])
+    assert np.array_equal(
+        sliced.gc_counts(),
+        dna_feature_extraction.sum_segments(
+            ((codes == 1) | (codes == 2)).reshape(-1, 3), offsets // 3
+        ),
+    )
+    assert np.array_equal(
+        dna_feature_extraction.compute_codon_counts_batch(sliced.codes(), sliced.offsets),
+        dna_feature_extraction.compute_codon_counts_batch(codes, offsets),
+    )
+
+
+def test_compute_store_features():
+    rows = [
+        [f"GENE{number}", f"T{number}"] + SEQUENCES[number:] + SEQUENCES[:number]
+        for number in range(len(SEQUENCES))
+    ]
+    store = pack_sequence_store(
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        {region: [row[2 + number] for row in rows] for number, region in enumerate(STORE_REGIONS)},
+    )
+
+    assert dna_feature_extraction.compute_store_features(store) == (
+        dna_feature_extraction.compute_feature_rows(rows)
+    )
+    assert dna_feature_extraction.compute_store_features(store.slice(1, 4), ["cds_gc", "AAA"]) == (
+        dna_feature_extraction.compute_feature_rows(rows[1:4], ["cds_gc", "AAA"])
+    )
+
+
+def test_extract_dna_features_sequence_store(tmp_path):
+    input_folder_path = os.path.join(
+        os.path.dirname(__file__), "test_data/feature_extraction_csv_files"
+    )
+    folder_path = tmp_path / "features"
+    store_folder_path = tmp_path / "store"
+    shutil.copytree(input_folder_path, folder_path)
+    shutil.copytree(input_folder_path, store_folder_path)
+
+    dna_feature_extraction.extract_dna_features(str(folder_path))
+    dna_feature_extraction.extract_dna_features(
+        str(store_folder_path), chunk_size=2, sequence_store=True
+    )
+
+    for filename in os.listdir(input_folder_path):
+        # The features computed on the packed sequences are the same
+        assert (folder_path / filename).read_bytes() == (store_folder_path / filename).read_bytes()
+
+        with open(folder_path / filename, "r", newline="", encoding="utf-8") as csv_file:
+            rows = [row for row in csv.reader(csv_file)][1:]
+        store = load_sequence_store(str(store_folder_path / filename.replace(".csv", ".seqstore")))
+        assert store.transcript_ids == [row[1] for row in rows]
+        for number, region in enumerate(STORE_REGIONS):
+            assert store.regions[region].sequences() == [row[2 + number] for row in rows]
@@ -1,7 +1,9 @@
 import pytest
 from unittest.mock import patch, MagicMock, mock_open, call
 import csv
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import os
 
 from rna.data_conversion_helper_functions.convert_quantsf_to_csv import (
@@ -9,6 +11,7 @@ from rna.data_conversion_helper_functions.convert_quantsf_to_csv import (
     convert_quant_output_to_csv,
 )
 from rna.data_conversion_helper_functions.create_expression_matrix import (
+    assemble_expression_matrices,
     create_expression_matrix,
     get_length_scaled_tpm_matrix,
 )
@@ -153,14 +156,16 @@ def test_create_expression_matrix_empty_directory(mock_to_csv, mock_isdir, mock_
 @patch("os.path.isdir")
 def test_create_expression_matrix_non_directory_skipped(mock_isdir, mock_listdir, mock_join):
     mock_listdir.return_value = ["species1", "species2"]
-    mock_isdir.side_effect = lambda x: False if "csv_files" in x else True
+    mock_isdir.side_effect = lambda x: False if "sf_files" in x or "csv_files" in x else True
     raw_data_path = "/fake/raw_data"
     processed_data_path = "/fake/processed_data"
     with patch("builtins.print") as mock_print:
         from rna.data_conversion_helper_functions.create_expression_matrix import create_expression_matrix
         create_expression_matrix(raw_data_path, processed_data_path)
     expected_calls = [
+        call("/fake/raw_data/species1/sf_files"),
         call("/fake/raw_data/species1/csv_files"),
+        call("/fake/raw_data/species2/sf_files"),
         call("/fake/raw_data/species2/csv_files")
     ]
     mock_isdir.assert_has_calls(expected_calls)
@@ -176,33 +181,104 @@ def test_create_expression_matrix_no_files():
         mock_to_csv.assert_not_called()
 
 
-@patch("os.listdir")
-@patch("os.path.isdir")
-@patch("pandas.DataFrame.to_csv")
-@patch("pandas.read_csv")
-def test_create_expression_matrix_single_file(mock_read_csv, mock_to_csv, mock_isdir, mock_listdir):
-    species = "species1"
-    quant_files = ["quant_DRR513083.csv"]  # Only one file for simplicity
-    mock_csv_content = {
-        "Name": ["Gene1", "Gene2"],
-        "EffectiveLength": [500, 800],
-        "TPM": [100, 200],
-        "NumReads": [50, 100],
-    }
-    mock_read_csv.return_value = pd.DataFrame(mock_csv_content)
-    mock_listdir.side_effect = lambda path: {
-        "raw_data_path": [species],
-        os.path.join("raw_data_path", species): ["csv_files"],
-        os.path.join("raw_data_path", species, "csv_files"): quant_files
-    }.get(path, [])
-    mock_isdir.return_value = True
-    create_expression_matrix("raw_data_path", "processed_data_path")
-    expected_read_csv_calls = [
-        call(os.path.join("raw_data_path", species, "csv_files", "quant_DRR513083.csv"), usecols=['Name', 'TPM']),
-        call(os.path.join("raw_data_path", species, "csv_files", "quant_DRR513083.csv"), usecols=['Name', 'EffectiveLength']),
-        call(os.path.join("raw_data_path", species, "csv_files", "quant_DRR513083.csv"), usecols=['Name', 'NumReads'])    ]
-    mock_read_csv.assert_has_calls(expected_read_csv_calls, any_order=True)
-    assert mock_to_csv.call_count == 1, "DataFrame.to_csv should have been called once to save the expression matrix."
+def test_create_expression_matrix_single_file(tmp_path, write_quant_sf):
+    raw_data_path = tmp_path / "raw"
+    processed_data_path = tmp_path / "processed"
+    processed_data_path.mkdir()
+    write_quant_sf(
+        raw_data_path / "species1" / "sf_files" / "quant_DRR513083.sf",
+        [("Gene1", 550, 500.0, 100, 50), ("Gene2", 850, 800.0, 200, 100)],
+    )
+    # quant.sf files are read directly, without converting them to csv files first
+    (raw_data_path / "species1" / "csv_files").mkdir()
+
+    create_expression_matrix(str(raw_data_path), str(processed_data_path))
+
+    expression_matrix = pd.read_csv(processed_data_path / "species1.csv", index_col=0)
+    assert list(expression_matrix.columns) == ["DRR513083"]
+    pd.testing.assert_frame_equal(
+        expression_matrix,
+        get_length_scaled_tpm_matrix(
+            pd.DataFrame({"DRR513083": [50.0, 100.0]}, index=["Gene1", "Gene2"]),
+            pd.DataFrame({"DRR513083": [100.0, 200.0]}, index=["Gene1", "Gene2"]),
+            pd.DataFrame({"DRR513083": [500.0, 800.0]}, index=["Gene1", "Gene2"]),
+        ),
+        check_names=False,
+    )
+
+
+def test_create_expression_matrix_reads_csv_files(tmp_path, write_quant_sf):
+    raw_data_path = tmp_path / "raw"
+    processed_data_path = tmp_path / "processed"
+    processed_data_path.mkdir()
+    sf_files_path = raw_data_path / "species1" / "sf_files"
+    write_quant_sf(sf_files_path / "quant_SRR2.sf", [("Gene2", 850, 800.0, 20, 10)])
+    write_quant_sf(
+        sf_files_path / "quant_SRR1.sf",
+        [("Gene1", 550, 500.0, 10, 5), ("Gene2", 850, 800.0, 30, 15)],
+    )
+    (raw_data_path / "species1" / "csv_files").mkdir()
+    convert_all_species_files(str(raw_data_path))
+    sf_expression_path = tmp_path / "sf_expression.csv"
+    create_expression_matrix(str(raw_data_path), str(processed_data_path))
+    os.rename(processed_data_path / "species1.csv", sf_expression_path)
+
+    # Without quant.sf files, their csv copies are read
+    for sf_file in sf_files_path.iterdir():
+        sf_file.unlink()
+    create_expression_matrix(str(raw_data_path), str(processed_data_path))
+
+    expression_matrix = pd.read_csv(processed_data_path / "species1.csv", index_col=0)
+    assert list(expression_matrix.columns) == ["SRR1", "SRR2"]
+    assert expression_matrix.index.tolist() == ["Gene1", "Gene2"]
+    # Transcripts missing from a sample have no value in its column
+    assert pd.isna(expression_matrix.loc["Gene1", "SRR2"])
+    assert (processed_data_path / "species1.csv").read_text() == sf_expression_path.read_text()
+
+
+def test_create_expression_matrix_workers(tmp_path, write_quant_sf):
+    raw_data_path = tmp_path / "raw"
+    for species in ["species1", "species2"]:
+        for run_number in range(3):
+            write_quant_sf(
+                raw_data_path / species / "sf_files" / f"quant_SRR{run_number}.sf",
+                [(f"Gene{gene_number}", 550, 500.0 + run_number, gene_number, 2 * gene_number + run_number)
+                 for gene_number in range(run_number, 6)],
+            )
+    serial_path = tmp_path / "serial"
+    parallel_path = tmp_path / "parallel"
+    serial_path.mkdir()
+    parallel_path.mkdir()
+
+    create_expression_matrix(str(raw_data_path), str(serial_path))
+    create_expression_matrix(str(raw_data_path), str(parallel_path), workers=2)
+
+    # The quant files read by the workers give the same matrices
+    for species in ["species1", "species2"]:
+        assert (parallel_path / f"{species}.csv").read_text() == (serial_path / f"{species}.csv").read_text()
+
+
+def test_assemble_expression_matrices():
+    quant_tables = [
+        pa.table({"Name": ["T1", "T2", "T3"], "EffectiveLength": [1.0, 2.0, 3.0], "TPM": [4.0, 5.0, 6.0], "NumReads": [7.0, 8.0, 9.0]}),
+        pa.table({"Name": ["T1", "T2", "T3"], "EffectiveLength": [1.5, 2.5, 3.5], "TPM": [4.5, 5.5, 6.5], "NumReads": [7.5, 8.5, 9.5]}),
+        # Permuted, with a missing, a new and a duplicated transcript
+        pa.table({"Name": ["T4", "T3", "T1", "T3"], "EffectiveLength": [10.0, 11.0, 12.0, 13.0], "TPM": [14.0, 15.0, 16.0, 17.0], "NumReads": [18.0, 19.0, 20.0, 21.0]}),
+    ]
+
+    matrices = assemble_expression_matrices(quant_tables, ["S1", "S2", "S3"], np.float32)
+
+    assert quant_tables == []
+    assert matrices.transcript_ids.tolist() == ["T1", "T2", "T3", "T4"]
+    nan = np.nan
+    np.testing.assert_array_equal(matrices.lengths, [[1.0, 1.5, 12.0], [2.0, 2.5, nan], [3.0, 3.5, 11.0], [nan, nan, 10.0]])
+    np.testing.assert_array_equal(matrices.abundances, [[4.0, 4.5, 16.0], [5.0, 5.5, nan], [6.0, 6.5, 15.0], [nan, nan, 14.0]])
+    np.testing.assert_array_equal(matrices.counts, [[7.0, 7.5, 20.0], [8.0, 8.5, nan], [9.0, 9.5, 19.0], [nan, nan, 18.0]])
+    assert matrices.counts.dtype == np.float32
+    counts_mat, abundance_mat, length_mat = matrices.to_frames()
+    assert list(counts_mat.columns) == ["S1", "S2", "S3"]
+    assert np.shares_memory(length_mat.to_numpy(), matrices.lengths)
+
 
 def test_get_length_scaled_tpm_matrix():
     counts_mat = pd.DataFrame(
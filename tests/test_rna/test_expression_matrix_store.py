@@ -0,0 +1,185 @@
+import os
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+
+from rna.data_conversion_helper_functions.create_expression_matrix import (
+    create_expression_matrix,
+    create_expression_matrix_store,
+    get_length_scaled_tpm_matrix,
+    read_quant_file,
+)
+from rna.data_conversion_helper_functions.expression_matrix_store import (
+    ExpressionMatrixStore,
+)
+from rna.data_conversion_helper_functions.process_expression_matrix import (
+    process_expression_matrix,
+)
+
+nan = np.nan
+COUNTS = np.array([[10.0, 20.0, 5.0], [30.0, nan, 15.0], [nan, nan, 25.0]])
+ABUNDANCES = np.array([[100.0, 300.0, 50.0], [200.0, nan, 70.0], [nan, nan, 90.0]])
+LENGTHS = np.array([[500.0, 520.0, 480.0], [800.0, nan, 850.0], [nan, nan, 1000.0]])
+
+
+def test_expression_matrix_store(tmp_path):
+    store = ExpressionMatrixStore(str(tmp_path / "species1.matrix"))
+    store.append(
+        ["T1", "T2"], ["S1", "S2"], COUNTS[:2, :2], ABUNDANCES[:2, :2], LENGTHS[:2, :2]
+    )
+    # The last sample adds a transcript, missing from the samples of the first block
+    store.append(
+        ["T1", "T2", "T3"], ["S3"], COUNTS[:, 2:], ABUNDANCES[:, 2:], LENGTHS[:, 2:]
+    )
+    store.save()
+
+    store = ExpressionMatrixStore(str(tmp_path / "species1.matrix"))
+    assert store.run_ids.tolist() == ["S1", "S2", "S3"]
+    assert store.block_sizes.tolist() == [2, 1]
+    np.testing.assert_array_equal(store.library_sizes, [40.0, 20.0, 45.0])
+    np.testing.assert_array_equal(store.length_means(), [500.0, 825.0, 1000.0])
+
+    expected = get_length_scaled_tpm_matrix(
+        *(
+            pd.DataFrame(matrix, index=["T1", "T2", "T3"], columns=["S1", "S2", "S3"])
+            for matrix in (COUNTS, ABUNDANCES, LENGTHS)
+        )
+    )
+    # Chunks of a single transcript
+    chunks = list(store.read_row_chunks(chunk_memory=1))
+    assert len(chunks) == 3
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks), expected, check_names=False, check_index_type=False
+    )
+
+
+def write_quant_files(write_quant_sf, sf_files_path, run_numbers):
+    # Random quant.sf files of 30 to 34 of 40 transcripts
+    for run_number in run_numbers:
+        rng = np.random.default_rng(run_number)
+        transcript_numbers = rng.permutation(40)[: 30 + run_number % 5]
+        write_quant_sf(
+            sf_files_path / f"quant_SRR{run_number}.sf",
+            [
+                (
+                    f"T{number}",
+                    1000,
+                    rng.uniform(400, 900),
+                    rng.uniform(0, 100),
+                    rng.uniform(0, 50),
+                )
+                for number in transcript_numbers
+            ],
+        )
+
+
+def test_process_rna_expression_out_of_core(tmp_path, write_quant_sf):
+    raw_data_path = tmp_path / "raw"
+    write_quant_files(write_quant_sf, raw_data_path / "species1" / "sf_files", range(5))
+
+    for out_of_core in (False, True):
+        processed_data_path = tmp_path / f"processed_{out_of_core}"
+        median_expression_path = tmp_path / f"median_{out_of_core}"
+        processed_data_path.mkdir()
+        median_expression_path.mkdir()
+        # Blocks of 2 samples, and chunks of 8 transcripts
+        create_expression_matrix(
+            str(raw_data_path),
+            str(processed_data_path),
+            out_of_core=out_of_core,
+            chunk_memory=2 * 3 * 8 * 40,
+        )
+        process_expression_matrix(
+            str(processed_data_path),
+            str(median_expression_path),
+            chunk_memory=8 * 8 * 5,
+        )
+
+    assert os.listdir(tmp_path / "processed_True") == ["species1.matrix"]
+    store = ExpressionMatrixStore(str(tmp_path / "processed_True" / "species1.matrix"))
+    # The first block, of a single sample, is filled up with the next batch
+    assert store.block_sizes.tolist() == [2, 2, 1]
+
+    median_expression = pd.read_csv(
+        tmp_path / "median_False" / "rna_expression_species1.csv"
+    )
+    out_of_core_median_expression = pd.read_csv(
+        tmp_path / "median_True" / "rna_expression_species1.csv"
+    )
+    assert len(median_expression) > 8
+    pd.testing.assert_frame_equal(
+        out_of_core_median_expression, median_expression, rtol=1e-12
+    )
+
+
+def test_create_expression_matrix_incremental(tmp_path, write_quant_sf):
+    raw_data_path = tmp_path / "raw"
+    sf_files_path = raw_data_path / "species1" / "sf_files"
+    processed_data_path = tmp_path / "processed"
+    processed_data_path.mkdir()
+    store_path = processed_data_path / "species1.matrix"
+    chunk_memory = 3 * 3 * 8 * 40
+
+    write_quant_files(write_quant_sf, sf_files_path, range(4))
+    create_expression_matrix(
+        str(raw_data_path),
+        str(processed_data_path),
+        incremental=True,
+        chunk_memory=chunk_memory,
+    )
+    first_block_files = ExpressionMatrixStore(str(store_path)).block_files.tolist()
+
+    # Only the new runs are read and appended to the store
+    write_quant_files(write_quant_sf, sf_files_path, range(4, 9))
+    with patch(
+        "rna.data_conversion_helper_functions.create_expression_matrix.read_quant_file",
+        side_effect=read_quant_file,
+    ) as mock_read_quant_file:
+        create_expression_matrix(
+            str(raw_data_path),
+            str(processed_data_path),
+            incremental=True,
+            chunk_memory=chunk_memory,
+        )
+    read_files = sorted(
+        os.path.basename(call.args[0]) for call in mock_read_quant_file.call_args_list
+    )
+    assert read_files == [f"quant_SRR{run_number}.sf" for run_number in range(4, 9)]
+
+    store = ExpressionMatrixStore(str(store_path))
+    assert store.run_ids.tolist() == [f"SRR{run_number}" for run_number in range(9)]
+    # Blocks of 3 samples once the 40 transcripts are indexed: the full block of the first
+    # runs is kept, and the new runs are appended as new blocks
+    assert store.block_files.tolist()[:1] == first_block_files
+    assert store.block_sizes.tolist() == [4, 3, 2]
+    assert sorted(os.listdir(store_path)) == sorted(
+        store.block_files.tolist() + ["store.npz"]
+    )
+
+    rebuilt_store_path = tmp_path / "rebuilt"
+    create_expression_matrix_store(
+        [str(sf_files_path / f"quant_SRR{run_number}.sf") for run_number in range(9)],
+        str(rebuilt_store_path),
+    )
+    rebuilt_store = ExpressionMatrixStore(str(rebuilt_store_path))
+    np.testing.assert_array_equal(store.transcript_ids, rebuilt_store.transcript_ids)
+    np.testing.assert_allclose(
+        store.library_sizes, rebuilt_store.library_sizes, rtol=1e-12
+    )
+    pd.testing.assert_frame_equal(
+        pd.concat(store.read_row_chunks()),
+        pd.concat(rebuilt_store.read_row_chunks()),
+        rtol=1e-12,
+    )
+
+    # Removing runs rebuilds the store
+    os.remove(sf_files_path / "quant_SRR0.sf")
+    create_expression_matrix(
+        str(raw_data_path),
+        str(processed_data_path),
+        incremental=True,
+        chunk_memory=chunk_memory,
+    )
+    assert ExpressionMatrixStore(str(store_path)).run_ids.tolist() == [
+        f"SRR{run_number}" for run_number in range(1, 9)
+    ]